@@ -0,0 +1,208 @@
+# core/audio_features.py
+
+import itertools
+import json
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from core.database import MS_PER_DAY, now_ms
+from core.rate_limit import call_rate_limited, spotify_bucket
+
+
+# Columns of track_audio_features, in insert order
+AUDIO_FEATURE_COLUMNS = (
+    "danceability",
+    "energy",
+    "valence",
+    "tempo",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "speechiness",
+)
+
+# Ids per audio-features request (the Web API maximum)
+AUDIO_FEATURES_BATCH = 100
+
+AUDIO_FEATURES_WORKERS = 4
+
+# Tracks without features are asked for again after this long
+AUDIO_FEATURES_MISS_RETRY_DAYS = 30
+
+# After a failed run the source is left alone for this long, doubling
+# with each further failure up to the cap
+AUDIO_FEATURES_FAILURE_BACKOFF_SECONDS = 15 * 60
+AUDIO_FEATURES_FAILURE_BACKOFF_CAP_SECONDS = 24 * 3600
+
+
+# =====================================================
+# SOURCES
+# =====================================================
+
+class AudioFeaturesSource(ABC):
+    """
+    Base for feature sources. Tracks consecutive failed runs so a
+    broken source (deprecated or forbidden endpoint) is skipped with
+    exponential backoff instead of being hit on every sync.
+    """
+
+    batch_size = AUDIO_FEATURES_BATCH
+
+    failures = 0
+    retry_at = 0.0
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.retry_at
+
+    def record_failure(self):
+        self.failures += 1
+        backoff = min(
+            AUDIO_FEATURES_FAILURE_BACKOFF_SECONDS * 2 ** (self.failures - 1),
+            AUDIO_FEATURES_FAILURE_BACKOFF_CAP_SECONDS
+        )
+        self.retry_at = time.monotonic() + backoff
+
+    def record_success(self):
+        self.failures = 0
+        self.retry_at = 0.0
+
+    @abstractmethod
+    def fetch(self, track_ids: list[str]) -> dict:
+        """
+        {track_id: features dict or None}
+        """
+
+
+class SpotifyAudioFeaturesSource(AudioFeaturesSource):
+    """
+    Audio features from the Web API, under the shared rate limit.
+    """
+
+    def __init__(self, sp):
+        self.sp = sp
+
+    def fetch(self, track_ids: list[str]) -> dict:
+        """
+        {track_id: features dict or None}
+        """
+        results = call_rate_limited(
+            spotify_bucket,
+            self.sp.audio_features,
+            tracks=track_ids
+        )
+
+        return {
+            track_id: features
+            for track_id, features in zip(track_ids, results or [])
+        }
+
+
+class FixtureAudioFeaturesSource(AudioFeaturesSource):
+    """
+    Audio features from a local JSON file, for offline runs. Accepts
+    the Web API response shape ({"audio_features": [...]}), a bare
+    list of feature objects, or {track_id: features}.
+    """
+
+    def __init__(self, path: str):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        if isinstance(data, dict) and "audio_features" in data:
+            data = data["audio_features"]
+
+        if isinstance(data, list):
+            data = {item["id"]: item for item in data if item}
+
+        self.features = data
+
+    def fetch(self, track_ids: list[str]) -> dict:
+        return {track_id: self.features.get(track_id) for track_id in track_ids}
+
+
+# =====================================================
+# INGESTION
+# =====================================================
+
+def ingest_audio_features(repo, source, max_workers: int = AUDIO_FEATURES_WORKERS) -> dict:
+    """
+    Fill track_audio_features for tracks that have no row yet.
+
+    Ids go to the source in batches of its batch_size, at most
+    max_workers batches in flight; each answer is bulk-written as it
+    arrives. Tracks the source has nothing for are recorded as misses
+    and skipped until AUDIO_FEATURES_MISS_RETRY_DAYS have passed.
+
+    The first failing batch stops the run: no further batches are
+    sent, the error is raised and the source backs off before it is
+    used again. A source in backoff is skipped.
+    """
+
+    if not source.available():
+        return {"requested": 0, "stored": 0, "missed": 0, "skipped": True}
+
+    track_ids = repo.get_track_ids_missing_audio_features(
+        retry_misses_before=now_ms() - AUDIO_FEATURES_MISS_RETRY_DAYS * MS_PER_DAY
+    )
+
+    stored = 0
+    missed = 0
+
+    if not track_ids:
+        return {"requested": 0, "stored": 0, "missed": 0}
+
+    batches = iter([
+        track_ids[i:i + source.batch_size]
+        for i in range(0, len(track_ids), source.batch_size)
+    ])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        # Submitted lazily so a failure leaves nothing queued
+        pending = {
+            pool.submit(source.fetch, batch)
+            for batch in itertools.islice(batches, max_workers)
+        }
+
+        while pending:
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+
+                try:
+                    result = future.result()
+                except Exception:
+                    for other in pending:
+                        other.cancel()
+
+                    source.record_failure()
+                    raise
+
+                rows = []
+                misses = []
+
+                for track_id, features in result.items():
+
+                    if features:
+                        rows.append((
+                            *(features.get(column) for column in AUDIO_FEATURE_COLUMNS),
+                            track_id
+                        ))
+                    else:
+                        misses.append(track_id)
+
+                repo.save_audio_features(rows, misses)
+
+                stored += len(rows)
+                missed += len(misses)
+
+                batch = next(batches, None)
+
+                if batch is not None:
+                    pending.add(pool.submit(source.fetch, batch))
+
+    source.record_success()
+
+    return {"requested": len(track_ids), "stored": stored, "missed": missed}
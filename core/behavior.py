@@ -1,48 +1,90 @@
 # core/behavior.py
 
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from core.database import PLAY_HISTORY_RETENTION_DAYS, to_epoch_ms
+from core.rate_limit import call_rate_limited, spotify_bucket
+
+
+# Pages of recently played fetched per call; Spotify keeps only
+# the last 50 plays, so more than one page is rare
+RECENTLY_PLAYED_MAX_PAGES = 5
 
 
 def ingest_recently_played(sp, repo, limit: int = 50) -> int:
-    results = sp.current_user_recently_played(limit=limit)
+    """
+    Store plays newer than the saved cursor. Plays of tracks outside
+    the library are skipped, and a play already stored is never
+    inserted twice. Events and the advanced cursor commit together.
+    Returns the number of plays inserted.
+    """
+    after = repo.get_recently_played_after()
+    library = repo.get_library_track_ids()
+
+    events = []
+    newest = after
+
+    for _ in range(RECENTLY_PLAYED_MAX_PAGES):
+
+        results = call_rate_limited(
+            spotify_bucket,
+            sp.current_user_recently_played,
+            limit=limit,
+            after=newest
+        )
 
-    inserted = 0
+        items = results.get("items", []) if results else []
+        page_newest = newest
 
-    for item in results.get("items", []):
-        track = item.get("track")
-        if not track:
-            continue
+        for item in items:
+            played_at = to_epoch_ms(item.get("played_at"))
 
-        track_id = track.get("id")
-        played_at = item.get("played_at")
+            if played_at is None:
+                continue
 
-        if not track_id or not played_at:
-            continue
+            if page_newest is None or played_at > page_newest:
+                page_newest = played_at
 
-        if not repo.track_exists(track_id):
-            continue
+            track = item.get("track")
+            track_id = track.get("id") if track else None
 
-        context = item.get("context")
-        context_type = None
-        context_id = None
+            if not track_id or track_id not in library:
+                continue
 
-        if context:
-            context_type = context.get("type")
-            context_uri = context.get("uri")
+            context = item.get("context")
+            context_type = None
+            context_id = None
 
-            if context_uri and ":" in context_uri:
-                context_id = context_uri.split(":")[-1]
+            if context:
+                context_type = context.get("type")
+                context_uri = context.get("uri")
 
-        repo.insert_play_event(
-            track_id=track_id,
-            played_at=played_at,
-            context_type=context_type,
-            context_id=context_id,
-            source="spotify_recent",
-            weight=1.0
-        )
+                if context_uri and ":" in context_uri:
+                    context_id = context_uri.split(":")[-1]
+
+            events.append((
+                track_id,
+                played_at,
+                context_type,
+                context_id,
+                "spotify_recent",
+                1.0
+            ))
+
+        if page_newest == newest:
+            break
+
+        newest = page_newest
 
-        inserted += 1
+        if len(items) < limit:
+            break
+
+    if newest == after:
+        return 0
+
+    with repo.transaction():
+        inserted = repo.insert_play_events(events)
+        repo.set_recently_played_after(newest)
 
     return inserted
 
@@ -67,11 +109,34 @@ def simulate_play_event(repo, track_id: str, played_at: str | None = None, weigh
 
 def simulate_bulk_behavior(repo, track_ids: list[str], plays_per_track: int = 5) -> int:
 
-    inserted = 0
+    now = datetime.utcnow()
+    library = repo.get_library_track_ids()
+    events = []
 
     for track_id in track_ids:
-        for _ in range(plays_per_track):
-            simulate_play_event(repo, track_id)
-            inserted += 1
 
-    return inserted
\ No newline at end of file
+        if track_id not in library:
+            continue
+
+        # A play is unique per (track, played_at): space repeats a second apart
+        for i in range(plays_per_track):
+            played_at = (now - timedelta(seconds=i)).isoformat()
+            events.append((track_id, played_at, None, None, "simulated", 1.0))
+
+    return repo.insert_play_events(events)
+
+
+def compact_play_history(repo, retention_days: int = PLAY_HISTORY_RETENTION_DAYS) -> int:
+    """
+    Retention policy for play_history: raw events from before the
+    horizon become per-track daily rollups, then freed pages are
+    vacuumed. Recency reads see raw and rolled-up plays together.
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).date().isoformat()
+
+    folded = repo.rollup_play_history(cutoff)
+
+    if folded:
+        repo.incremental_vacuum()
+
+    return folded
@@ -2,14 +2,18 @@ import os
 import sys
 from dotenv import load_dotenv
 
+from core.audio_features import FixtureAudioFeaturesSource, SpotifyAudioFeaturesSource
 from core.database import create_tables
-from core.db_session import DatabaseSession
+from core.db_session import get_database_session
+from core.profiler import QueryProfiler
 from core.repository import Repository
 from core.graph.builder import build_music_graph
 from core.semantic.embeddings import EmbeddingService
 from session.manager import SessionManager
 from core.semantic.pinecone_indexer import PineconeIndexer
 from core.semantic.semantic_service import SemanticService
+from core.http_cache import SpotifyResponseCache
+from core.spotify_transport import SpotifySession
 
 from spotipy import Spotify
 from spotipy.oauth2 import SpotifyOAuth
@@ -20,6 +24,7 @@ class AppContainer:
     def __init__(self):
         self.project_root = None
         self.db_session = None
+        self.profiler = None
         self.repo = None
         self.sp = None
         self.llm = None
@@ -47,13 +52,31 @@ def init_system():
     # 3. Initialize database
     db_path = os.path.join(project_root, "music_agent.db")
 
-    db_session = DatabaseSession(db_path)
+    # Opt-in SQL profiling: MUSIC_AGENT_SQL_PROFILE=1
+    if os.getenv("MUSIC_AGENT_SQL_PROFILE") == "1":
+        container.profiler = QueryProfiler(
+            slow_ms=float(os.getenv("MUSIC_AGENT_SQL_SLOW_MS", "50")),
+            slow_log_path=os.path.join(project_root, "slow_queries.jsonl")
+        )
+
+    db_session = get_database_session(db_path, profiler=container.profiler)
     create_tables(db_session.conn)
 
     container.db_session = db_session
     container.repo = Repository(db_session)
 
+    if container.repo.snapshot is None:
+        container.repo.refresh_snapshot()
+
     # 4. Initialize Spotify client
+    # One pooled transport with retries for every Spotify call, with
+    # reads cached on disk between runs
+    spotify_session = SpotifySession(
+        response_cache=SpotifyResponseCache(
+            os.path.join(project_root, "spotify_cache.db")
+        )
+    )
+
     sp = Spotify(
         auth_manager=SpotifyOAuth(
             scope=(
@@ -62,8 +85,10 @@ def init_system():
                 "playlist-read-private "
                 "user-read-recently-played "
                 "user-library-read"
-            )
-        )
+            ),
+            requests_session=spotify_session
+        ),
+        requests_session=spotify_session
     )
     container.sp = sp
 
@@ -105,13 +130,23 @@ def init_system():
     )
     container.graph = graph
 
-    # 10. Initialize session manager
+    # 10. Audio features source: a local fixture for offline runs
+    # (MUSIC_AGENT_AUDIO_FEATURES_FIXTURE=path.json), Spotify otherwise
+    fixture_path = os.getenv("MUSIC_AGENT_AUDIO_FEATURES_FIXTURE")
+
+    if fixture_path:
+        audio_features_source = FixtureAudioFeaturesSource(fixture_path)
+    else:
+        audio_features_source = SpotifyAudioFeaturesSource(container.sp)
+
+    # 11. Initialize session manager
     container.session = SessionManager(
         graph=container.graph,
         llm=container.llm,
         repo=container.repo,
         sp=container.sp,
-        semantic_service=container.semantic_service
+        semantic_service=container.semantic_service,
+        audio_features_source=audio_features_source
     )
 
     return container
\ No newline at end of file
@@ -26,6 +26,11 @@ def build_strategic_playlist(repo, semantic_service,  strategy: Dict) -> List[st
         filters = source.get("filters", {}) or {}
 
         limit = filters.get("limit")
+
+        # 0, None or anything but a positive int means no limit
+        if not isinstance(limit, int) or limit <= 0:
+            limit = None
+
         timeframe = filters.get("timeframe")
         name = filters.get("name")
 
@@ -43,25 +48,28 @@ def build_strategic_playlist(repo, semantic_service,  strategy: Dict) -> List[st
         elif source_type == "artist" and name:
             tracks = repo.get_tracks_by_artist(name)
 
+            if not tracks:
+                tracks = _resolve_fuzzy_tracks(repo, name, "artist")
+
         # -------------------------
         # ALBUM
         # -------------------------
         elif source_type == "album" and name:
             tracks = repo.get_tracks_by_album(name)
 
+            if not tracks:
+                tracks = _resolve_fuzzy_tracks(repo, name, "album")
+
         # -------------------------
         # TOP PLAYED
         # -------------------------
         elif source_type == "top_played":
-            rows = repo.get_play_history_aggregated(decay_days=30.0)
-
-            sorted_rows = sorted(
-                rows,
-                key=lambda r: r[1],  # recency_score
-                reverse=True
+            rows = repo.get_recency_scores(
+                limit=limit or -1,
+                decay_days=30.0
             )
 
-            tracks = [r[0] for r in sorted_rows]
+            tracks = [r[0] for r in rows]
 
         # -------------------------
         # RECENTLY ADDED
@@ -108,7 +116,7 @@ def build_strategic_playlist(repo, semantic_service,  strategy: Dict) -> List[st
         # -------------------------
         # Apply per-source limit
         # -------------------------
-        if limit and isinstance(limit, int):
+        if limit:
             tracks = tracks[:limit]
 
         all_tracks.extend(tracks)
@@ -134,4 +142,22 @@ def build_strategic_playlist(repo, semantic_service,  strategy: Dict) -> List[st
     if max_tracks and isinstance(max_tracks, int):
         all_tracks = all_tracks[:max_tracks]
 
-    return all_tracks
\ No newline at end of file
+    return all_tracks
+
+def _resolve_fuzzy_tracks(repo, name: str, kind: str) -> List[str]:
+    """
+    Fallback when the exact artist/album lookup is empty
+    (typos, missing accents, partial names from the LLM).
+    """
+
+    matches = repo.resolve_fuzzy(name, kinds=(kind,), limit=1)
+
+    if not matches:
+        return []
+
+    best = matches[0]["name"]
+
+    if kind == "artist":
+        return repo.get_tracks_by_artist(best)
+
+    return repo.get_tracks_by_album(best)
@@ -1,22 +1,164 @@
+import json
 import sqlite3
+import time
+import unicodedata
+from datetime import datetime, timezone
+from pathlib import Path
 
 
-def get_connection(db_path: str = "music_agent.db"):
-    conn = sqlite3.connect(db_path, check_same_thread=False)
+# Bumped whenever create_tables gains a migration step.
+SCHEMA_VERSION = 10
+
+# Decay constant of the materialized recency tables. Reads that ask for
+# a different decay fall back to scanning play_history.
+RECENCY_DECAY_DAYS = 30.0
+
+# Raw play events older than this are rolled up into per-track daily
+# rows (play_history_daily) by compact_play_history.
+PLAY_HISTORY_RETENTION_DAYS = 180
+
+# tracks.added_at, play_history.played_at and play_history_daily.day
+# are INTEGER milliseconds since the Unix epoch (UTC).
+MS_PER_DAY = 86_400_000
+
+
+# Pragmas applied to every connection. journal_mode and synchronous are
+# only applied to the writer; readers inherit WAL from the database file.
+PRAGMA_PROFILE = {
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+WRITER_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+}
+
+
+def apply_pragmas(conn, pragmas: dict):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value};")
+
+
+def _connect(database: str, profiler=None, **kwargs):
+    if profiler is None:
+        return sqlite3.connect(database, check_same_thread=False, **kwargs)
+
+    from core.profiler import ProfiledConnection
+
+    conn = sqlite3.connect(
+        database,
+        check_same_thread=False,
+        factory=ProfiledConnection,
+        **kwargs
+    )
+    conn.profiler = profiler
+    return conn
+
+
+def get_connection(db_path: str = "music_agent.db", profiler=None):
+    conn = _connect(db_path, profiler)
     conn.execute("PRAGMA foreign_keys = ON;")
+
+    if db_path != ":memory:":
+        apply_pragmas(conn, WRITER_PRAGMAS)
+
+    apply_pragmas(conn, PRAGMA_PROFILE)
+    return conn
+
+
+def get_read_connection(db_path: str = "music_agent.db", profiler=None):
+    """
+    Open a read-only connection.
+    The database file must already exist (created by the writer).
+    """
+    uri = Path(db_path).absolute().as_uri() + "?mode=ro"
+
+    conn = _connect(uri, profiler, uri=True)
+    conn.execute("PRAGMA query_only = ON;")
+    apply_pragmas(conn, PRAGMA_PROFILE)
     return conn
 
 
+def normalize_name(name: str | None) -> str | None:
+    """
+    Lookup key for names: casefolded, accents stripped, trimmed.
+    """
+    if name is None:
+        return None
+
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.strip()
+
+
+def to_epoch_ms(value) -> int | None:
+    """
+    UTC epoch milliseconds from an ISO-8601 string (Spotify's
+    "...Z" or datetime.isoformat()), a datetime or an epoch-ms int.
+    Naive times are taken as UTC.
+    """
+    if value is None or isinstance(value, int):
+        return value
+
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+
+    return round(value.timestamp() * 1000)
+
+
+def now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def id_set(ids) -> str:
+    """
+    Bind a list of ids as one parameter, expanded in SQL with
+    json_each(?). Keeps one query plan and one variable whatever the
+    list size; json_each's key column is the position in the list.
+    """
+    return json.dumps(list(ids))
+
+
 def create_tables(conn):
     cursor = conn.cursor()
 
+    # Only takes effect before the first table is created; existing
+    # databases are switched by a migration.
+    if not _table_exists(conn, "tracks"):
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+
+    # Bring tables of an existing database up to date before the
+    # CREATE statements below reference new columns.
+    migrate_schema(conn)
+
+    _create_tables(cursor)
+    _create_indexes(cursor)
+
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+    conn.commit()
+
+
+# Entities (tracks, artists, albums, playlists) carry an INTEGER *_key
+# surrogate. Link and history tables are keyed on those integers; the
+# Spotify ids live only on the entity tables.
+
+def _create_tables(cursor):
+
     # Core Domain
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS tracks (
-        track_id TEXT PRIMARY KEY,
+        track_key INTEGER PRIMARY KEY,
+        track_id TEXT NOT NULL UNIQUE,
         name TEXT NOT NULL,
-        added_at TEXT NOT NULL,
+        added_at INTEGER NOT NULL,
         duration_ms INTEGER,
         popularity INTEGER
     );
@@ -24,15 +166,19 @@ def create_tables(conn):
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS artists (
-        artist_id TEXT PRIMARY KEY,
-        name TEXT NOT NULL
+        artist_key INTEGER PRIMARY KEY,
+        artist_id TEXT NOT NULL UNIQUE,
+        name TEXT NOT NULL,
+        name_norm TEXT
     );
     """)
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS albums (
-        album_id TEXT PRIMARY KEY,
+        album_key INTEGER PRIMARY KEY,
+        album_id TEXT NOT NULL UNIQUE,
         name TEXT NOT NULL,
+        name_norm TEXT,
         release_date TEXT,
         total_tracks INTEGER,
         album_type TEXT
@@ -41,29 +187,30 @@ def create_tables(conn):
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS track_artists (
-        track_id TEXT NOT NULL,
-        artist_id TEXT NOT NULL,
-        PRIMARY KEY (track_id, artist_id),
-        FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE,
-        FOREIGN KEY (artist_id) REFERENCES artists(artist_id) ON DELETE CASCADE
-    );
+        track_key INTEGER NOT NULL,
+        artist_key INTEGER NOT NULL,
+        PRIMARY KEY (track_key, artist_key),
+        FOREIGN KEY (track_key) REFERENCES tracks(track_key) ON DELETE CASCADE,
+        FOREIGN KEY (artist_key) REFERENCES artists(artist_key) ON DELETE CASCADE
+    ) WITHOUT ROWID;
     """)
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS track_albums (
-        track_id TEXT NOT NULL,
-        album_id TEXT NOT NULL,
-        PRIMARY KEY (track_id, album_id),
-        FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE,
-        FOREIGN KEY (album_id) REFERENCES albums(album_id) ON DELETE CASCADE
-    );
+        track_key INTEGER NOT NULL,
+        album_key INTEGER NOT NULL,
+        PRIMARY KEY (track_key, album_key),
+        FOREIGN KEY (track_key) REFERENCES tracks(track_key) ON DELETE CASCADE,
+        FOREIGN KEY (album_key) REFERENCES albums(album_key) ON DELETE CASCADE
+    ) WITHOUT ROWID;
     """)
 
     # Playlists Domain
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS playlists (
-        playlist_id TEXT PRIMARY KEY,
+        playlist_key INTEGER PRIMARY KEY,
+        playlist_id TEXT NOT NULL UNIQUE,
         name TEXT NOT NULL,
         description TEXT,
         owner_id TEXT,
@@ -77,23 +224,36 @@ def create_tables(conn):
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS playlist_tracks (
-        playlist_id TEXT NOT NULL,
-        track_id TEXT NOT NULL,
+        playlist_key INTEGER NOT NULL,
+        track_key INTEGER NOT NULL,
         added_at TEXT,
         position INTEGER,
-        PRIMARY KEY (playlist_id, track_id),
-        FOREIGN KEY (playlist_id) REFERENCES playlists(playlist_id) ON DELETE CASCADE,
-        FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE
+        PRIMARY KEY (playlist_key, track_key),
+        FOREIGN KEY (playlist_key) REFERENCES playlists(playlist_key) ON DELETE CASCADE,
+        FOREIGN KEY (track_key) REFERENCES tracks(track_key) ON DELETE CASCADE
     );
     """)
 
+    # Every remote entry of a playlist in order, library or not, so
+    # tracks saved later can be linked without refetching it
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS playlist_entries (
+        playlist_key INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        track_id TEXT NOT NULL,
+        added_at TEXT,
+        PRIMARY KEY (playlist_key, position),
+        FOREIGN KEY (playlist_key) REFERENCES playlists(playlist_key) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    """)
+
     # Saved Albums
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS saved_albums (
-        album_id TEXT PRIMARY KEY,
+        album_key INTEGER PRIMARY KEY,
         added_at TEXT,
-        FOREIGN KEY (album_id) REFERENCES albums(album_id) ON DELETE CASCADE
+        FOREIGN KEY (album_key) REFERENCES albums(album_key) ON DELETE CASCADE
     );
     """)
 
@@ -101,7 +261,7 @@ def create_tables(conn):
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS track_audio_features (
-        track_id TEXT PRIMARY KEY,
+        track_key INTEGER PRIMARY KEY,
         danceability REAL,
         energy REAL,
         valence REAL,
@@ -110,7 +270,16 @@ def create_tables(conn):
         instrumentalness REAL,
         liveness REAL,
         speechiness REAL,
-        FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE
+        FOREIGN KEY (track_key) REFERENCES tracks(track_key) ON DELETE CASCADE
+    );
+    """)
+
+    # Tracks the features source had nothing for, with when it was asked
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS track_audio_features_misses (
+        track_key INTEGER PRIMARY KEY,
+        checked_at INTEGER NOT NULL,
+        FOREIGN KEY (track_key) REFERENCES tracks(track_key) ON DELETE CASCADE
     );
     """)
 
@@ -118,26 +287,26 @@ def create_tables(conn):
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS track_metrics (
-        track_id TEXT PRIMARY KEY,
+        track_key INTEGER PRIMARY KEY,
         playlist_count INTEGER DEFAULT 0,
         added_recency_score REAL DEFAULT 0,
         popularity INTEGER,
         engagement_score REAL DEFAULT 0,
         updated_at TEXT,
-        FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE
+        FOREIGN KEY (track_key) REFERENCES tracks(track_key) ON DELETE CASCADE
     );
     """)
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS playlist_metrics (
-        playlist_id TEXT PRIMARY KEY,
+        playlist_key INTEGER PRIMARY KEY,
         avg_energy REAL,
         avg_valence REAL,
         dominant_artist TEXT,
         overlap_score REAL,
         total_tracks INTEGER,
         updated_at TEXT,
-        FOREIGN KEY (playlist_id) REFERENCES playlists(playlist_id) ON DELETE CASCADE
+        FOREIGN KEY (playlist_key) REFERENCES playlists(playlist_key) ON DELETE CASCADE
     );
     """)
 
@@ -146,21 +315,89 @@ def create_tables(conn):
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS play_history (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        track_id TEXT NOT NULL,
-        played_at TEXT NOT NULL,
+        track_key INTEGER NOT NULL,
+        played_at INTEGER NOT NULL,
         context_type TEXT,
         context_id TEXT,
         source TEXT NOT NULL,
         weight REAL DEFAULT 1.0,
-        FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE
+        FOREIGN KEY (track_key) REFERENCES tracks(track_key) ON DELETE CASCADE
+    );
+    """)
+
+    # Plays older than the retention horizon, one row per track and UTC
+    # day (day = epoch ms of its midnight)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS play_history_daily (
+        track_key INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        plays INTEGER NOT NULL,
+        weight REAL NOT NULL,
+        PRIMARY KEY (track_key, day),
+        FOREIGN KEY (track_key) REFERENCES tracks(track_key) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    """)
+
+    # Raw and rolled-up plays as one stream. A daily row counts as
+    # `plays` events at noon of its day.
+    cursor.execute("""
+    CREATE VIEW IF NOT EXISTS play_events AS
+    SELECT
+        track_key,
+        played_at AS played_ms,
+        weight,
+        1 AS plays
+    FROM play_history
+    UNION ALL
+    SELECT
+        track_key,
+        day + 43200000 AS played_ms,
+        weight,
+        plays
+    FROM play_history_daily;
+    """)
+
+    # Materialized recency: score = SUM(weight * EXP((played - ref) / decay)),
+    # so the current score is score * EXP((ref - now) / decay) and ordering
+    # by the stored score is ordering by current score.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS recency_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        decay_days REAL NOT NULL,
+        ref_ms INTEGER NOT NULL
+    );
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS track_recency (
+        track_key INTEGER PRIMARY KEY,
+        score REAL NOT NULL,
+        plays INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (track_key) REFERENCES tracks(track_key) ON DELETE CASCADE
+    );
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS artist_recency (
+        artist_key INTEGER PRIMARY KEY,
+        score REAL NOT NULL,
+        plays INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (artist_key) REFERENCES artists(artist_key) ON DELETE CASCADE
     );
     """)
+
+    cursor.execute("""
+    INSERT OR IGNORE INTO recency_state (id, decay_days, ref_ms)
+    VALUES (1, ?, ?);
+    """, (RECENCY_DECAY_DAYS, now_ms()))
+
     #Semantic Domain
     
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS emotional_anchors (
         anchor_id TEXT PRIMARY KEY,
         name TEXT NOT NULL UNIQUE,
+        name_norm TEXT,
         created_at TEXT NOT NULL,
         updated_at TEXT NOT NULL
     );
@@ -169,39 +406,564 @@ def create_tables(conn):
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS emotional_anchor_tracks (
         anchor_id TEXT NOT NULL,
-        track_id TEXT NOT NULL,
-        PRIMARY KEY (anchor_id, track_id),
+        track_key INTEGER NOT NULL,
+        PRIMARY KEY (anchor_id, track_key),
         FOREIGN KEY (anchor_id) REFERENCES emotional_anchors(anchor_id) ON DELETE CASCADE,
-        FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE
+        FOREIGN KEY (track_key) REFERENCES tracks(track_key) ON DELETE CASCADE
     );
     """)
     
+    # Full-text catalog (fuzzy name resolution)
+    # name holds normalize_name() output; label keeps the original name.
+    cursor.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+        name,
+        kind UNINDEXED,
+        entity_id UNINDEXED,
+        label UNINDEXED,
+        tokenize = 'trigram'
+    );
+    """)
+
+    # Per-trigram document counts, used to pick selective trigrams
+    cursor.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS catalog_vocab
+    USING fts5vocab(catalog_fts, row);
+    """)
+
     # System state (sync control)
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS system_state (
         id INTEGER PRIMARY KEY CHECK (id = 1),
-        last_sync_at TEXT
+        last_sync_at TEXT,
+        import_offset INTEGER,
+        import_total INTEGER,
+        recently_played_after INTEGER
     );
     """)
 
-    # Indexes
+
+
+def _create_indexes(cursor):
 
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_tracks_added_at ON tracks(added_at);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_track_artists_artist ON track_artists(artist_id);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_track_albums_album ON track_albums(album_id);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_playlist_tracks_playlist ON playlist_tracks(playlist_id);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_playlist_tracks_track ON playlist_tracks(track_id);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_track_artists_artist ON track_artists(artist_key);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_track_albums_album ON track_albums(album_key);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_playlist_tracks_playlist ON playlist_tracks(playlist_key);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_playlist_tracks_track ON playlist_tracks(track_key);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_playlist_entries_track ON playlist_entries(track_id);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_features_energy ON track_audio_features(energy);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_features_valence ON track_audio_features(valence);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_track_metrics_engagement ON track_metrics(engagement_score);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_play_history_track ON play_history(track_id);")
+    # One row per play; also serves lookups by track_key
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_play_history_track_played ON play_history(track_key, played_at);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_play_history_played_at ON play_history(played_at);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_play_history_source ON play_history(source);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_artists_name_norm ON artists(name_norm);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_albums_name_norm ON albums(name_norm);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_anchors_name_norm ON emotional_anchors(name_norm);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_track_recency_score ON track_recency(score);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_artist_recency_score ON artist_recency(score);")
+
+
+# =====================================================
+# MIGRATIONS
+# =====================================================
+
+def migrate_schema(conn):
+    """
+    Apply pending migrations to an existing database.
+    Fresh databases are created directly at SCHEMA_VERSION.
+    """
+    if not _table_exists(conn, "tracks"):
+        return
+
+    version = conn.execute("PRAGMA user_version;").fetchone()[0]
+
+    for target_version, step in MIGRATIONS:
+        if version < target_version:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {target_version};")
+            conn.commit()
 
+
+def _table_exists(conn, table: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;",
+        (table,)
+    ).fetchone()
+    return row is not None
+
+
+def _column_exists(conn, table: str, column: str) -> bool:
+    rows = conn.execute(f"PRAGMA table_info({table});").fetchall()
+    return any(row[1] == column for row in rows)
+
+
+def _migrate_name_norm(conn):
+    conn.create_function("normalize_name", 1, normalize_name, deterministic=True)
+
+    for table in ("artists", "albums", "emotional_anchors"):
+
+        if not _table_exists(conn, table):
+            continue
+
+        if not _column_exists(conn, table, "name_norm"):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN name_norm TEXT;")
+
+        conn.execute(f"UPDATE {table} SET name_norm = normalize_name(name);")
+
+
+def _migrate_catalog_fts(conn):
+    conn.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+        name,
+        kind UNINDEXED,
+        entity_id UNINDEXED,
+        label UNINDEXED,
+        tokenize = 'trigram'
+    );
+    """)
+
+    conn.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS catalog_vocab
+    USING fts5vocab(catalog_fts, row);
+    """)
+
+    rebuild_catalog(conn)
+
+
+def rebuild_catalog(conn):
+    """
+    Repopulate catalog_fts from tracks, artists and albums.
+    """
+    conn.create_function("normalize_name", 1, normalize_name, deterministic=True)
+
+    conn.execute("DELETE FROM catalog_fts;")
+
+    conn.execute("""
+        INSERT INTO catalog_fts (name, kind, entity_id, label)
+        SELECT normalize_name(name), 'track', track_id, name FROM tracks;
+    """)
+
+    conn.execute("""
+        INSERT INTO catalog_fts (name, kind, entity_id, label)
+        SELECT name_norm, 'artist', artist_id, name FROM artists;
+    """)
+
+    conn.execute("""
+        INSERT INTO catalog_fts (name, kind, entity_id, label)
+        SELECT name_norm, 'album', album_id, name FROM albums;
+    """)
+
+
+def _migrate_recency(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS recency_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        decay_days REAL NOT NULL,
+        ref_julian REAL NOT NULL
+    );
+    """)
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS track_recency (
+        track_id TEXT PRIMARY KEY,
+        score REAL NOT NULL,
+        plays INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE
+    );
+    """)
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS artist_recency (
+        artist_id TEXT PRIMARY KEY,
+        score REAL NOT NULL,
+        plays INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (artist_id) REFERENCES artists(artist_id) ON DELETE CASCADE
+    );
+    """)
+
+    # Populated by the surrogate key migration, which rebuilds these
+    # tables on integer keys.
+
+
+def rebuild_recency(conn, decay_days: float = RECENCY_DECAY_DAYS):
+    """
+    Recompute track_recency and artist_recency from play_events (raw
+    and rolled-up plays), with the reference time reset to now.
+    """
+    conn.execute("""
+        INSERT OR REPLACE INTO recency_state (id, decay_days, ref_ms)
+        VALUES (1, ?, ?);
+    """, (decay_days, now_ms()))
+
+    conn.execute("DELETE FROM track_recency;")
+    conn.execute("DELETE FROM artist_recency;")
+
+    conn.execute("""
+        INSERT INTO track_recency (track_key, score, plays)
+        SELECT
+            ph.track_key,
+            SUM(ph.weight * EXP((ph.played_ms - rs.ref_ms) / (rs.decay_days * 86400000.0))),
+            SUM(ph.plays)
+        FROM play_events ph, recency_state rs
+        WHERE rs.id = 1
+        GROUP BY ph.track_key;
+    """)
+
+    conn.execute("""
+        INSERT INTO artist_recency (artist_key, score, plays)
+        SELECT
+            ta.artist_key,
+            SUM(ph.weight * EXP((ph.played_ms - rs.ref_ms) / (rs.decay_days * 86400000.0))),
+            SUM(ph.plays)
+        FROM play_events ph
+        JOIN track_artists ta ON ta.track_key = ph.track_key
+        JOIN recency_state rs ON rs.id = 1
+        GROUP BY ta.artist_key;
+    """)
+
+
+# (table, statement copying its rows out of the renamed <table>_v3)
+_SURROGATE_KEY_COPIES = [
+    ("tracks", """
+        INSERT INTO tracks (track_key, track_id, name, added_at, duration_ms, popularity)
+        SELECT rowid, track_id, name, added_at, duration_ms, popularity
+        FROM tracks_v3;
+    """),
+    ("artists", """
+        INSERT INTO artists (artist_key, artist_id, name, name_norm)
+        SELECT rowid, artist_id, name, name_norm
+        FROM artists_v3;
+    """),
+    ("albums", """
+        INSERT INTO albums (album_key, album_id, name, name_norm, release_date, total_tracks, album_type)
+        SELECT rowid, album_id, name, name_norm, release_date, total_tracks, album_type
+        FROM albums_v3;
+    """),
+    ("playlists", """
+        INSERT INTO playlists (
+            playlist_key, playlist_id, name, description, owner_id,
+            is_collaborative, is_public, total_tracks, snapshot_id, updated_at
+        )
+        SELECT
+            rowid, playlist_id, name, description, owner_id,
+            is_collaborative, is_public, total_tracks, snapshot_id, updated_at
+        FROM playlists_v3;
+    """),
+    ("track_artists", """
+        INSERT OR IGNORE INTO track_artists (track_key, artist_key)
+        SELECT t.track_key, a.artist_key
+        FROM track_artists_v3 x
+        JOIN tracks t ON t.track_id = x.track_id
+        JOIN artists a ON a.artist_id = x.artist_id;
+    """),
+    ("track_albums", """
+        INSERT OR IGNORE INTO track_albums (track_key, album_key)
+        SELECT t.track_key, a.album_key
+        FROM track_albums_v3 x
+        JOIN tracks t ON t.track_id = x.track_id
+        JOIN albums a ON a.album_id = x.album_id;
+    """),
+    ("playlist_tracks", """
+        INSERT OR IGNORE INTO playlist_tracks (playlist_key, track_key, added_at, position)
+        SELECT p.playlist_key, t.track_key, x.added_at, x.position
+        FROM playlist_tracks_v3 x
+        JOIN playlists p ON p.playlist_id = x.playlist_id
+        JOIN tracks t ON t.track_id = x.track_id;
+    """),
+    ("saved_albums", """
+        INSERT INTO saved_albums (album_key, added_at)
+        SELECT a.album_key, x.added_at
+        FROM saved_albums_v3 x
+        JOIN albums a ON a.album_id = x.album_id;
+    """),
+    ("track_audio_features", """
+        INSERT INTO track_audio_features (
+            track_key, danceability, energy, valence, tempo,
+            acousticness, instrumentalness, liveness, speechiness
+        )
+        SELECT
+            t.track_key, x.danceability, x.energy, x.valence, x.tempo,
+            x.acousticness, x.instrumentalness, x.liveness, x.speechiness
+        FROM track_audio_features_v3 x
+        JOIN tracks t ON t.track_id = x.track_id;
+    """),
+    ("track_metrics", """
+        INSERT INTO track_metrics (
+            track_key, playlist_count, added_recency_score,
+            popularity, engagement_score, updated_at
+        )
+        SELECT
+            t.track_key, x.playlist_count, x.added_recency_score,
+            x.popularity, x.engagement_score, x.updated_at
+        FROM track_metrics_v3 x
+        JOIN tracks t ON t.track_id = x.track_id;
+    """),
+    ("playlist_metrics", """
+        INSERT INTO playlist_metrics (
+            playlist_key, avg_energy, avg_valence, dominant_artist,
+            overlap_score, total_tracks, updated_at
+        )
+        SELECT
+            p.playlist_key, x.avg_energy, x.avg_valence, x.dominant_artist,
+            x.overlap_score, x.total_tracks, x.updated_at
+        FROM playlist_metrics_v3 x
+        JOIN playlists p ON p.playlist_id = x.playlist_id;
+    """),
+    ("play_history", """
+        INSERT INTO play_history (id, track_key, played_at, context_type, context_id, source, weight)
+        SELECT x.id, t.track_key, x.played_at, x.context_type, x.context_id, x.source, x.weight
+        FROM play_history_v3 x
+        JOIN tracks t ON t.track_id = x.track_id;
+    """),
+    ("emotional_anchor_tracks", """
+        INSERT OR IGNORE INTO emotional_anchor_tracks (anchor_id, track_key)
+        SELECT x.anchor_id, t.track_key
+        FROM emotional_anchor_tracks_v3 x
+        JOIN tracks t ON t.track_id = x.track_id;
+    """),
+    ("track_recency", """
+        INSERT INTO track_recency (track_key, score, plays)
+        SELECT t.track_key, x.score, x.plays
+        FROM track_recency_v3 x
+        JOIN tracks t ON t.track_id = x.track_id;
+    """),
+    ("artist_recency", """
+        INSERT INTO artist_recency (artist_key, score, plays)
+        SELECT a.artist_key, x.score, x.plays
+        FROM artist_recency_v3 x
+        JOIN artists a ON a.artist_id = x.artist_id;
+    """),
+]
+
+
+def _migrate_surrogate_keys(conn):
+    """
+    Rebuild every Spotify-id keyed table with INTEGER surrogate keys.
+    Entity keys reuse the old implicit rowids.
+    """
     conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF;")
+
+    try:
+        conn.execute("BEGIN;")
+
+        tables = [t for t, _ in _SURROGATE_KEY_COPIES if _table_exists(conn, t)]
+
+        for table in tables:
+            conn.execute(f"ALTER TABLE {table} RENAME TO {table}_v3;")
+
+        # Derived from play history; recreated in the current shape and
+        # refilled by rebuild_recency below
+        conn.execute("DROP TABLE IF EXISTS recency_state;")
+
+        _create_tables(conn.cursor())
+
+        for table, copy in _SURROGATE_KEY_COPIES:
+            if table in tables:
+                conn.execute(copy)
+
+        rebuild_recency(conn)
+
+        for table in reversed(tables):
+            conn.execute(f"DROP TABLE {table}_v3;")
+
+        violations = conn.execute("PRAGMA foreign_key_check;").fetchall()
+
+        if violations:
+            raise sqlite3.IntegrityError(
+                f"Surrogate key migration left {len(violations)} dangling references."
+            )
+
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON;")
+
+
+def _migrate_incremental_vacuum(conn):
+    """
+    Switch an existing database to incremental auto-vacuum so pages
+    freed by play history compaction can be returned to the OS.
+    play_history_daily and play_events come from create_tables.
+    """
+    conn.commit()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+    conn.execute("VACUUM;")
+
+
+def _epoch_ms(column: str) -> str:
+    """
+    SQL converting an ISO-8601 TEXT column to epoch ms. Values that
+    are already numeric are kept.
+    """
+    return f"""
+        CASE WHEN typeof({column}) = 'text'
+            THEN CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)
+            ELSE {column}
+        END
+    """
+
+
+# (table, statement copying its rows out of the renamed <table>_v5)
+_EPOCH_MS_COPIES = [
+    ("tracks", f"""
+        INSERT INTO tracks (track_key, track_id, name, added_at, duration_ms, popularity)
+        SELECT track_key, track_id, name, {_epoch_ms("added_at")}, duration_ms, popularity
+        FROM tracks_v5;
+    """),
+    ("play_history", f"""
+        INSERT INTO play_history (id, track_key, played_at, context_type, context_id, source, weight)
+        SELECT id, track_key, {_epoch_ms("played_at")}, context_type, context_id, source, weight
+        FROM play_history_v5;
+    """),
+    ("play_history_daily", f"""
+        INSERT INTO play_history_daily (track_key, day, plays, weight)
+        SELECT track_key, {_epoch_ms("day")}, plays, weight
+        FROM play_history_daily_v5;
+    """),
+]
+
+
+def _migrate_epoch_ms(conn):
+    """
+    Store tracks.added_at, play_history.played_at and
+    play_history_daily.day as INTEGER epoch ms instead of ISO TEXT.
+    The tables are rebuilt under legacy_alter_table so foreign keys
+    of other tables keep pointing at the new ones.
+    """
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF;")
+    conn.execute("PRAGMA legacy_alter_table = ON;")
+
+    try:
+        conn.execute("BEGIN;")
+
+        # Recreated by _create_tables in the current shape
+        conn.execute("DROP VIEW IF EXISTS play_events;")
+        conn.execute("DROP TABLE IF EXISTS recency_state;")
+
+        tables = [t for t, _ in _EPOCH_MS_COPIES if _table_exists(conn, t)]
+
+        for table in tables:
+            conn.execute(f"ALTER TABLE {table} RENAME TO {table}_v5;")
+
+        _create_tables(conn.cursor())
+
+        for table, copy in _EPOCH_MS_COPIES:
+            if table in tables:
+                conn.execute(copy)
+
+        for table in tables:
+            conn.execute(f"DROP TABLE {table}_v5;")
+
+        rebuild_recency(conn)
+
+        violations = conn.execute("PRAGMA foreign_key_check;").fetchall()
+
+        if violations:
+            raise sqlite3.IntegrityError(
+                f"Epoch timestamp migration left {len(violations)} dangling references."
+            )
+
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF;")
+        conn.execute("PRAGMA foreign_keys = ON;")
+
+
+def _migrate_import_checkpoint(conn):
+    """
+    Checkpoint columns for the resumable first-time library import.
+    """
+    if not _table_exists(conn, "system_state"):
+        return
+
+    for column in ("import_offset", "import_total"):
+        if not _column_exists(conn, "system_state", column):
+            conn.execute(f"ALTER TABLE system_state ADD COLUMN {column} INTEGER;")
+
+
+def _migrate_audio_feature_misses(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS track_audio_features_misses (
+        track_key INTEGER PRIMARY KEY,
+        checked_at INTEGER NOT NULL,
+        FOREIGN KEY (track_key) REFERENCES tracks(track_key) ON DELETE CASCADE
+    );
+    """)
+
+
+def _migrate_unique_plays(conn):
+    """
+    Make (track_key, played_at) unique in play_history, keeping the
+    first copy of plays ingested twice, and add the recently-played
+    cursor to system_state.
+    """
+    removed = conn.execute("""
+        DELETE FROM play_history
+        WHERE id NOT IN (
+            SELECT MIN(id)
+            FROM play_history
+            GROUP BY track_key, played_at
+        );
+    """).rowcount
+
+    conn.execute("DROP INDEX IF EXISTS idx_play_history_track;")
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_play_history_track_played
+        ON play_history(track_key, played_at);
+    """)
+
+    if _table_exists(conn, "system_state") and not _column_exists(
+        conn, "system_state", "recently_played_after"
+    ):
+        conn.execute("ALTER TABLE system_state ADD COLUMN recently_played_after INTEGER;")
+
+    # Materialized recency counted the duplicates
+    if removed:
+        rebuild_recency(conn)
+
+
+def _migrate_playlist_entries(conn):
+    """
+    playlist_entries (created with the other tables) starts empty:
+    forget stored snapshot_ids so the next sync refetches every
+    playlist once and records its entries.
+    """
+    if _table_exists(conn, "playlists"):
+        conn.execute("UPDATE playlists SET snapshot_id = NULL;")
+
+
+MIGRATIONS = [
+    (1, _migrate_name_norm),
+    (2, _migrate_catalog_fts),
+    (3, _migrate_recency),
+    (4, _migrate_surrogate_keys),
+    (5, _migrate_incremental_vacuum),
+    (6, _migrate_epoch_ms),
+    (7, _migrate_import_checkpoint),
+    (8, _migrate_audio_feature_misses),
+    (9, _migrate_unique_plays),
+    (10, _migrate_playlist_entries),
+]
 
 
-def get_latest_added_at(conn):
+def get_latest_added_at(conn) -> int | None:
+    """
+    Most recent tracks.added_at, in epoch ms.
+    """
     cursor = conn.cursor()
     cursor.execute("SELECT MAX(added_at) FROM tracks;")
     result = cursor.fetchone()[0]
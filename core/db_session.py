@@ -1,16 +1,207 @@
-from core.database import get_connection
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from core.database import get_connection, get_read_connection
+from core.query_cache import QueryCache
 
 
 class DatabaseSession:
-    def __init__(self, db_path: str = "music_agent.db"):
-        self._conn = get_connection(db_path)
+    """
+    One writer connection plus a pool of read-only connections.
+
+    Writes are serialized through a re-entrant lock. Reads borrow a
+    pooled connection so they can run while a write is in progress
+    (WAL mode). A thread that currently holds the writer reads through
+    the writer so it sees its own uncommitted changes.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "music_agent.db",
+        read_pool_size: int = 4,
+        optimize_interval_seconds: int = 3600,
+        profiler=None,
+        read_cache_size: int = 1024
+    ):
+        self.db_path = db_path
+        self.read_pool_size = read_pool_size
+        self.optimize_interval_seconds = optimize_interval_seconds
+
+        # Optional core.profiler.QueryProfiler shared by every connection
+        self.profiler = profiler
+
+        self._conn = get_connection(db_path, profiler)
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+
+        self._readers = queue.LifoQueue()
+        self._readers_created = 0
+        self._pool_lock = threading.Lock()
+
+        self._last_optimize = time.monotonic()
+
+        # In-memory library snapshot (core.snapshot), shared by every
+        # Repository on this session and replaced as a whole.
+        self.snapshot = None
+
+        # Data generation, bumped after every commit. Tags the entries
+        # of the read-through cache (core.query_cache).
+        self._generation = 0
+        self.read_cache = QueryCache(read_cache_size) if read_cache_size else None
+
+        # Let SQLite analyze tables that look stale since the last run.
+        self._conn.execute("PRAGMA optimize = 0x10002;")
 
     @property
     def conn(self):
         return self._conn
 
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    # =====================================================
+    # WRITER
+    # =====================================================
+
+    @contextmanager
+    def writer(self):
+        with self._write_lock:
+            self._local.write_depth = self._write_depth() + 1
+            try:
+                yield self._conn
+            finally:
+                self._local.write_depth -= 1
+
+    def _write_depth(self) -> int:
+        return getattr(self._local, "write_depth", 0)
+
+    def holds_writer(self) -> bool:
+        return self._write_depth() > 0
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work on the writer.
+        Nested transactions join the outermost one, and commit() calls
+        made inside are deferred until it exits. Rolls back on error.
+        """
+        with self.writer() as conn:
+            outermost = self._transaction_depth() == 0
+            self._local.transaction_depth = self._transaction_depth() + 1
+
+            try:
+                yield conn
+            except BaseException:
+                if outermost:
+                    conn.rollback()
+                raise
+            finally:
+                self._local.transaction_depth -= 1
+
+            if outermost:
+                self.commit()
+
+    def _transaction_depth(self) -> int:
+        return getattr(self._local, "transaction_depth", 0)
+
+    def in_transaction(self) -> bool:
+        return self._transaction_depth() > 0
+
     def commit(self):
-        self._conn.commit()
+        if self.in_transaction():
+            return
+
+        with self._write_lock:
+            changed = self._conn.in_transaction
+            self._conn.commit()
+
+            # Bumped only once the data is visible to readers
+            if changed:
+                self._generation += 1
+
+        self.maybe_optimize()
+
+    # =====================================================
+    # READERS
+    # =====================================================
+
+    @contextmanager
+    def reader(self):
+        if self.holds_writer() or self.db_path == ":memory:":
+            with self.writer() as conn:
+                yield conn
+            return
+
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def _acquire_reader(self):
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._pool_lock:
+            if self._readers_created < self.read_pool_size:
+                self._readers_created += 1
+                return get_read_connection(self.db_path, self.profiler)
+
+        return self._readers.get()
+
+    # =====================================================
+    # MAINTENANCE
+    # =====================================================
+
+    def maybe_optimize(self):
+        elapsed = time.monotonic() - self._last_optimize
+
+        if elapsed >= self.optimize_interval_seconds:
+            self.optimize()
+
+    def optimize(self):
+        with self._write_lock:
+            self._conn.execute("PRAGMA optimize;")
+            self._last_optimize = time.monotonic()
 
     def close(self):
-        self._conn.close()
\ No newline at end of file
+        self.optimize()
+
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+        self._conn.close()
+
+
+# =====================================================
+# SESSION FACTORY
+# =====================================================
+
+_sessions: dict[str, DatabaseSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_database_session(db_path: str = "music_agent.db", **kwargs) -> DatabaseSession:
+    """
+    Return the shared DatabaseSession for a database file.
+    All callers in the process share one writer and one read pool.
+    """
+    key = db_path if db_path == ":memory:" else os.path.abspath(db_path)
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+
+        if session is None:
+            session = DatabaseSession(db_path, **kwargs)
+            _sessions[key] = session
+
+        return session
@@ -0,0 +1,186 @@
+# core/http_cache.py
+
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+# Seconds a cached read is served without asking Spotify. Past that
+# it is revalidated with If-None-Match when Spotify sent an ETag.
+CACHE_TTLS = [
+    (re.compile(r"^me$"), 3600),
+    (re.compile(r"^me/playlists$"), 15),
+    # Sync trusts items to match the listed snapshot_id: always revalidate
+    (re.compile(r"^playlists/[^/]+/(items|tracks)$"), 0),
+]
+
+# Entries untouched for this long are dropped on open
+MAX_ENTRY_AGE_SECONDS = 7 * 86400
+
+
+def api_path(url: str) -> str | None:
+    """
+    Path of a Web API URL below /v1/, or None for anything else
+    (token refreshes and other hosts).
+    """
+    path = urlsplit(url).path
+
+    if not path.startswith("/v1/"):
+        return None
+
+    return path[len("/v1/"):].rstrip("/")
+
+
+def cache_ttl(url: str) -> int | None:
+    """
+    TTL of a cacheable read, or None when the URL is not cached.
+    """
+    path = api_path(url)
+
+    if path is None:
+        return None
+
+    for pattern, ttl in CACHE_TTLS:
+        if pattern.match(path):
+            return ttl
+
+    return None
+
+
+def invalidated_prefixes(url: str) -> list[str] | None:
+    """
+    Cached paths a write to url can make stale, as path prefixes.
+    An empty string prefix means everything.
+    """
+    path = api_path(url)
+
+    if path is None:
+        return None
+
+    match = re.match(r"^playlists/([^/]+)", path)
+
+    if match:
+        return [f"playlists/{match.group(1)}", "me/playlists"]
+
+    if path == "me/playlists" or re.match(r"^users/[^/]+/playlists$", path):
+        return ["me/playlists"]
+
+    if path.startswith("me/tracks"):
+        return ["me/tracks"]
+
+    return [""]
+
+
+def _cache_key(url: str, scope: str) -> str:
+    return f"{scope} {url}" if scope else url
+
+
+class SpotifyResponseCache:
+    """
+    On-disk cache of Spotify read responses keyed by full URL and a
+    scope naming whose credentials fetched them, so one account never
+    reads another's cached library. Kept in its own SQLite file so
+    HTTP traffic never touches the library database or its caches.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL;")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    url TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    content_type TEXT,
+                    etag TEXT,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_http_cache_path
+                ON http_cache(path);
+            """)
+            cursor.execute(
+                "DELETE FROM http_cache WHERE stored_at < ?;",
+                (time.time() - MAX_ENTRY_AGE_SECONDS,)
+            )
+            self._conn.commit()
+
+    def lookup(self, url: str, scope: str = ""):
+        """
+        (body, content_type, etag, fresh) or None.
+        """
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT body, content_type, etag, expires_at
+                FROM http_cache
+                WHERE url = ?;
+            """, (_cache_key(url, scope),)).fetchone()
+
+        if row is None:
+            return None
+
+        body, content_type, etag, expires_at = row
+        return body, content_type, etag, time.time() < expires_at
+
+    def store(self, url: str, body: bytes, content_type: str | None,
+              etag: str | None, ttl: int, scope: str = ""):
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO http_cache
+                (url, path, body, content_type, etag, stored_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    body = excluded.body,
+                    content_type = excluded.content_type,
+                    etag = excluded.etag,
+                    stored_at = excluded.stored_at,
+                    expires_at = excluded.expires_at;
+            """, (
+                _cache_key(url, scope),
+                api_path(url),
+                body,
+                content_type,
+                etag,
+                now,
+                now + ttl
+            ))
+            self._conn.commit()
+
+    def refresh(self, url: str, ttl: int, scope: str = ""):
+        """
+        Extend an entry Spotify confirmed unchanged (304).
+        """
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute("""
+                UPDATE http_cache
+                SET stored_at = ?, expires_at = ?
+                WHERE url = ?;
+            """, (now, now + ttl, _cache_key(url, scope)))
+            self._conn.commit()
+
+    def invalidate(self, prefixes: list[str]):
+        with self._lock:
+            self._conn.executemany("""
+                DELETE FROM http_cache
+                WHERE path = ?1 OR substr(path, 1, length(?1) + 1) = ?1 || '/' OR ?1 = '';
+            """, [(prefix,) for prefix in prefixes])
+            self._conn.commit()
+
+    def clear(self):
+        self.invalidate([""])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,7 +1,28 @@
 # core/ingestion.py
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
 from core.semantic.anchors import convert_playlist_to_anchor
-from core.database import get_latest_added_at
+from core.database import id_set, normalize_name, to_epoch_ms
+from core.playlists import get_playlist_items
+from core.rate_limit import call_rate_limited, spotify_bucket
+
+
+# Concurrent item-page fetches during playlist sync
+PLAYLIST_FETCH_WORKERS = 8
+PLAYLIST_ITEMS_PAGE_SIZE = 100
+
+SAVED_TRACKS_PAGE_SIZE = 50
+
+# First-time import: concurrent page fetches, pages per committed window
+IMPORT_FETCH_WORKERS = 8
+IMPORT_WINDOW_PAGES = 20
+
+# Ids per saved-tracks contains check
+SAVED_TRACKS_CONTAINS_BATCH = 50
 
 
 # =====================================================
@@ -12,101 +33,330 @@ def sync_new_tracks(sp, repo):
     """
     Synchronize new saved tracks from Spotify into SQLite.
     Only inserts tracks added after latest stored added_at.
+    Each page is written with executemany inside one transaction.
     """
 
-    latest_added_at = get_latest_added_at(repo.conn)
-    cursor = repo.conn.cursor()
+    batches, _ = _collect_new_tracks(sp, repo.get_latest_added_at())
 
-    limit = 50
+    new_tracks_ids = [row[0] for batch in batches for row in batch["tracks"]]
+
+    with repo.transaction() as conn:
+        for batch in batches:
+            _write_track_batch(conn, batch)
+
+        _link_saved_tracks(conn.cursor(), new_tracks_ids)
+
+        # Before the commit, so no reader caches the old snapshot
+        # under the new generation
+        if new_tracks_ids:
+            repo.invalidate_snapshot()
+
+    return {
+        "new_tracks_count": len(new_tracks_ids),
+        "new_tracks_ids": new_tracks_ids
+    }
+
+
+def _collect_new_tracks(sp, latest_added_at):
+    """
+    Page saved tracks newest first until reaching latest_added_at.
+    Returns (one parsed row batch per page, remote saved-track total).
+    """
+
+    limit = SAVED_TRACKS_PAGE_SIZE
     offset = 0
-    new_tracks_count = 0
-    new_tracks_ids = []
+    batches = []
+    total = None
+
+    # Artists and albums already seen during this sync
+    seen_artists = set()
+    seen_albums = set()
 
     while True:
-        results = sp.current_user_saved_tracks(limit=limit, offset=offset)
+        results = call_rate_limited(
+            spotify_bucket,
+            sp.current_user_saved_tracks,
+            limit=limit,
+            offset=offset
+        )
         items = results["items"]
+        total = results.get("total", total)
 
         if not items:
             break
 
-        stop_sync = False
-
-        for item in items:
-            track = item["track"]
-            added_at = item["added_at"]
-
-            if latest_added_at and added_at <= latest_added_at:
-                stop_sync = True
-                break
-
-            track_id = track["id"]
-            new_tracks_ids.append(track_id)
-
-            cursor.execute("""
-                INSERT OR IGNORE INTO tracks
-                (track_id, name, added_at, duration_ms, popularity)
-                VALUES (?, ?, ?, ?, ?);
-            """, (
-                track_id,
-                track["name"],
-                added_at,
-                track["duration_ms"],
-                track.get("popularity")
-            ))
+        batch, stop_sync = _parse_saved_tracks_page(
+            items,
+            latest_added_at,
+            seen_artists,
+            seen_albums
+        )
+
+        batches.append(batch)
+
+        if stop_sync:
+            break
+
+        offset += limit
+
+    return batches, total
+
+
+def _parse_saved_tracks_page(items, latest_added_at, seen_artists, seen_albums):
+    """
+    Split a page of saved tracks into per-table row batches.
+    Artists and albums are deduplicated across the whole sync.
+    Returns (batch, stop_sync).
+    """
+
+    batch = {
+        "tracks": [],
+        "artists": [],
+        "track_artists": [],
+        "albums": [],
+        "track_albums": []
+    }
+
+    for item in items:
+        track = item["track"]
+        added_at = to_epoch_ms(item["added_at"])
+
+        if latest_added_at and added_at <= latest_added_at:
+            return batch, True
 
-            # Artists
-            for artist in track["artists"]:
-                cursor.execute("""
-                    INSERT OR IGNORE INTO artists (artist_id, name)
-                    VALUES (?, ?);
-                """, (
+        track_id = track["id"]
+
+        batch["tracks"].append((
+            track_id,
+            track["name"],
+            added_at,
+            track["duration_ms"],
+            track.get("popularity")
+        ))
+
+        # Artists
+        for artist in track["artists"]:
+            if artist["id"] not in seen_artists:
+                seen_artists.add(artist["id"])
+                batch["artists"].append((
                     artist["id"],
-                    artist["name"]
+                    artist["name"],
+                    normalize_name(artist["name"])
                 ))
 
-                cursor.execute("""
-                    INSERT OR IGNORE INTO track_artists (track_id, artist_id)
-                    VALUES (?, ?);
-                """, (
-                    track_id,
-                    artist["id"]
-                ))
+            batch["track_artists"].append((track_id, artist["id"]))
 
-            # Album
-            album = track["album"]
+        # Album
+        album = track["album"]
 
-            cursor.execute("""
-                INSERT OR IGNORE INTO albums
-                (album_id, name, release_date, total_tracks, album_type)
-                VALUES (?, ?, ?, ?, ?);
-            """, (
+        if album["id"] not in seen_albums:
+            seen_albums.add(album["id"])
+            batch["albums"].append((
                 album["id"],
                 album["name"],
+                normalize_name(album["name"]),
                 album.get("release_date"),
                 album.get("total_tracks"),
                 album.get("album_type")
             ))
 
-            cursor.execute("""
-                INSERT OR IGNORE INTO track_albums (track_id, album_id)
-                VALUES (?, ?);
-            """, (
-                track_id,
-                album["id"]
-            ))
+        batch["track_albums"].append((track_id, album["id"]))
 
-            new_tracks_count += 1
+    return batch, False
 
-        if stop_sync:
-            break
 
-        offset += limit
+def _write_track_batch(conn, batch):
+
+    cursor = conn.cursor()
+
+    # Catalog rows only for entities that are new to the database
+    catalog_rows = _new_catalog_rows(cursor, batch)
+
+    cursor.executemany("""
+        INSERT OR IGNORE INTO tracks
+        (track_id, name, added_at, duration_ms, popularity)
+        VALUES (?, ?, ?, ?, ?);
+    """, batch["tracks"])
+
+    cursor.executemany("""
+        INSERT OR IGNORE INTO artists (artist_id, name, name_norm)
+        VALUES (?, ?, ?);
+    """, batch["artists"])
+
+    cursor.executemany("""
+        INSERT OR IGNORE INTO track_artists (track_key, artist_key)
+        SELECT t.track_key, a.artist_key
+        FROM tracks t, artists a
+        WHERE t.track_id = ? AND a.artist_id = ?;
+    """, batch["track_artists"])
+
+    cursor.executemany("""
+        INSERT OR IGNORE INTO albums
+        (album_id, name, name_norm, release_date, total_tracks, album_type)
+        VALUES (?, ?, ?, ?, ?, ?);
+    """, batch["albums"])
+
+    cursor.executemany("""
+        INSERT OR IGNORE INTO track_albums (track_key, album_key)
+        SELECT t.track_key, a.album_key
+        FROM tracks t, albums a
+        WHERE t.track_id = ? AND a.album_id = ?;
+    """, batch["track_albums"])
+
+    cursor.executemany("""
+        INSERT INTO catalog_fts (name, kind, entity_id, label)
+        VALUES (?, ?, ?, ?);
+    """, catalog_rows)
+
+
+def _new_catalog_rows(cursor, batch):
+
+    rows = []
 
-    repo.commit()
+    sources = [
+        ("track", "tracks", "track_id", [(r[0], r[1]) for r in batch["tracks"]]),
+        ("artist", "artists", "artist_id", [(r[0], r[1]) for r in batch["artists"]]),
+        ("album", "albums", "album_id", [(r[0], r[1]) for r in batch["albums"]]),
+    ]
+
+    for kind, table, column, entities in sources:
+
+        if not entities:
+            continue
+
+        cursor.execute(f"""
+            SELECT {column}
+            FROM {table}
+            WHERE {column} IN (SELECT value FROM json_each(?));
+        """, (id_set(entity_id for entity_id, _ in entities),))
+
+        existing = {r[0] for r in cursor.fetchall()}
+
+        for entity_id, name in entities:
+            if entity_id not in existing:
+                existing.add(entity_id)
+                rows.append((normalize_name(name), kind, entity_id, name))
+
+    return rows
+
+
+# =====================================================
+# INITIAL IMPORT
+# =====================================================
+
+def needs_initial_import(repo) -> bool:
+    """
+    True for an empty library or an interrupted import.
+    """
+    return (
+        repo.get_import_checkpoint() is not None
+        or repo.get_latest_added_at() is None
+    )
+
+
+def import_library(sp, repo, max_workers: int = IMPORT_FETCH_WORKERS,
+                   window_pages: int = IMPORT_WINDOW_PAGES) -> dict:
+    """
+    First-time import of the whole saved-track library.
+
+    The remote total comes from the first page; the remaining pages
+    are fetched concurrently under the shared rate limit, one window
+    ahead of the writer. Each window of pages is committed together
+    with a checkpoint in system_state, so an interrupted import
+    resumes at the first window not yet written.
+    """
+
+    page_size = SAVED_TRACKS_PAGE_SIZE
+
+    first = call_rate_limited(
+        spotify_bucket,
+        sp.current_user_saved_tracks,
+        limit=page_size,
+        offset=0
+    )
+    total = first["total"]
+
+    start = 0
+    checkpoint = repo.get_import_checkpoint()
+
+    if checkpoint is not None:
+        offset, recorded_total = checkpoint
+
+        # Tracks saved since then pushed everything down; they are
+        # picked up later by incremental sync. Redo one page in case
+        # some were removed instead (inserts ignore duplicates).
+        start = max(0, offset + total - (recorded_total or total) - page_size)
+        start -= start % page_size
+
+    repo.set_import_checkpoint(start, total)
+
+    offsets = list(range(start, total, page_size))
+    windows = [
+        offsets[i:i + window_pages]
+        for i in range(0, len(offsets), window_pages)
+    ]
+
+    def fetch(offset):
+        if offset == 0:
+            return first
+
+        return call_rate_limited(
+            spotify_bucket,
+            sp.current_user_saved_tracks,
+            limit=page_size,
+            offset=offset
+        )
+
+    imported = 0
+
+    # Artists and albums already seen during this import
+    seen_artists = set()
+    seen_albums = set()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        pending = [pool.submit(fetch, o) for o in windows[0]] if windows else []
+
+        for i, window in enumerate(windows):
+
+            current = pending
+
+            # Keep the next window downloading while this one is written
+            if i + 1 < len(windows):
+                pending = [pool.submit(fetch, o) for o in windows[i + 1]]
+
+            batches = []
+
+            for future in current:
+                batch, _ = _parse_saved_tracks_page(
+                    future.result()["items"],
+                    None,
+                    seen_artists,
+                    seen_albums
+                )
+                batches.append(batch)
+
+            with repo.transaction() as conn:
+
+                for batch in batches:
+                    _write_track_batch(conn, batch)
+
+                _link_saved_tracks(
+                    conn.cursor(),
+                    [row[0] for batch in batches for row in batch["tracks"]]
+                )
+
+                repo.set_import_checkpoint(window[-1] + page_size, total)
+                repo.invalidate_snapshot()
+
+            imported += sum(len(batch["tracks"]) for batch in batches)
+
+    repo.set_import_checkpoint(None)
 
     return {
-        "new_tracks_count": new_tracks_count,
-        "new_tracks_ids": new_tracks_ids
+        "remote_total": total,
+        "resumed_at": start if checkpoint is not None else None,
+        "imported_tracks": imported
     }
 
 
@@ -114,190 +364,781 @@ def sync_new_tracks(sp, repo):
 # PLAYLIST SYNC
 # =====================================================
 
-def sync_playlists(sp, repo):
+def sync_playlists(sp, repo, max_workers: int = PLAYLIST_FETCH_WORKERS):
     """
     Synchronize user-owned playlists.
     Only tracks existing in library are inserted.
     Handles ANCHOR_ playlists.
-    """
 
-    from core.playlists import get_playlist_items
+    Playlists whose snapshot_id matches the stored one are skipped
+    without fetching their items. Changed playlists are reconciled
+    with a set diff of their tracks instead of a full rewrite.
+
+    Item pages of all changed playlists are fetched concurrently under
+    the shared Spotify rate limit before anything is written; the
+    writer transaction is only held to apply the collected results.
+    """
 
-    cursor = repo.conn.cursor()
     current_user_id = sp.current_user()["id"]
 
-    limit = 50
-    offset = 0
+    listed_ids, owned = _list_playlists(sp, current_user_id)
+
+    anchors, changed, unchanged = _classify_playlists(
+        owned,
+        repo.get_playlist_snapshot_ids()
+    )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        anchor_pending = [
+            (playlist, _submit_item_pages(pool, sp, playlist))
+            for playlist in anchors
+        ]
+
+        pending = [
+            (playlist, _submit_item_pages(pool, sp, playlist))
+            for playlist in changed
+        ]
+
+        anchor_changes = [
+            PlaylistChange(playlist, _collect_playlist_entries(sp, playlist["id"], pages))
+            for playlist, pages in anchor_pending
+        ]
+
+        changes = [
+            PlaylistChange(playlist, _collect_playlist_entries(sp, playlist["id"], pages))
+            for playlist, pages in pending
+        ]
 
-    total_playlists_synced = 0
     total_playlist_tracks_synced = 0
-    anchors_updated = []
+
+    with repo.transaction() as conn:
+
+        cursor = conn.cursor()
+
+        anchors_updated, converted = _apply_anchor_playlists(sp, repo, cursor, anchor_changes)
+
+        for change in changes:
+            total_playlist_tracks_synced += _write_playlist(
+                cursor,
+                change.playlist,
+                change.entries
+            )
+
+        # Anchors that did not convert are stored as playlists
+        if changes or anchor_changes:
+            repo.invalidate_snapshot()
+
+    _unfollow_playlists(sp, converted)
+
+    return {
+        "playlists_synced": len(changes),
+        "playlists_unchanged": unchanged,
+        "playlist_tracks_synced": total_playlist_tracks_synced,
+        "anchors_updated": anchors_updated,
+        "listed_playlist_ids": listed_ids
+    }
+
+
+def _list_playlists(sp, current_user_id):
+    """
+    Page through the user's playlists once.
+    Returns (every listed playlist id, playlists owned by the user).
+    """
+
+    listed_ids = set()
+    owned = []
+
+    limit = 50
+    offset = 0
 
     while True:
-        playlists = sp.current_user_playlists(limit=limit, offset=offset)
-        items = playlists.get("items", [])
+        playlists = call_rate_limited(
+            spotify_bucket,
+            sp.current_user_playlists,
+            limit=limit,
+            offset=offset
+        )
 
-        if not items:
+        for playlist in playlists.get("items", []):
+
+            listed_ids.add(playlist["id"])
+
+            if playlist["owner"]["id"] == current_user_id:
+                owned.append(playlist)
+
+        if not playlists.get("next"):
             break
 
-        for playlist in items:
+        offset += limit
 
-            if playlist["owner"]["id"] != current_user_id:
-                continue
+    return listed_ids, owned
 
-            playlist_id = playlist["id"]
-            name = playlist.get("name")
 
-            # ==========================
-            # ANCHOR DETECTION
-            # ==========================
+def _classify_playlists(owned, stored_snapshots):
+    """
+    Split owned playlists into (changed anchors, changed, unchanged
+    count). A playlist, anchor or not, is unchanged when its
+    snapshot_id matches the stored one.
+    """
 
-            if name and name.startswith("ANCHOR_"):
+    anchors = []
+    changed = []
+    unchanged = 0
 
-                anchor_id = convert_playlist_to_anchor(
-                    repo,
-                    playlist_id,
-                    name
-                )
+    for playlist in owned:
 
-                if anchor_id:
+        name = playlist.get("name")
+        snapshot_id = playlist.get("snapshot_id")
 
-                    anchors_updated.append(anchor_id)
+        if snapshot_id and stored_snapshots.get(playlist["id"]) == snapshot_id:
+            unchanged += 1
 
-                    sp.current_user_unfollow_playlist(playlist_id)
+        elif name and name.startswith("ANCHOR_"):
+            anchors.append(playlist)
 
-                    cursor.execute(
-                        "DELETE FROM playlists WHERE playlist_id = ?;",
-                        (playlist_id,)
-                    )
+        else:
+            changed.append(playlist)
 
-                    repo.commit()
+    return anchors, changed, unchanged
 
-                continue
 
-            # ==========================
-            # NORMAL PLAYLIST SYNC
-            # ==========================
+def _apply_anchor_playlists(sp, repo, cursor, anchors):
+    """
+    Store each changed ANCHOR_ playlist (a PlaylistChange) with its
+    tracks, convert it into an anchor and forget it. One that does not
+    convert (no tracks in library) stays stored with its snapshot_id,
+    so it is skipped until it changes.
+
+    Returns (ids of the anchors updated, playlist ids to unfollow).
+    Unfollowing cannot be rolled back, so the caller does it once the
+    transaction has committed; if it fails, the playlist is listed
+    again next sync and converted and unfollowed again.
+    """
 
-            cursor.execute("""
-                INSERT OR REPLACE INTO playlists (
-                    playlist_id,
-                    name,
-                    description,
-                    owner_id,
-                    is_collaborative,
-                    is_public,
-                    total_tracks,
-                    snapshot_id,
-                    updated_at
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'));
-            """, (
-                playlist_id,
-                name,
-                playlist.get("description"),
-                playlist["owner"]["id"],
-                int(playlist.get("collaborative", False)),
-                int(playlist.get("public", False)),
-                playlist.get("tracks", {}).get("total"),
-                playlist.get("snapshot_id")
-            ))
+    anchors_updated = []
+    converted = []
+
+    for change in anchors:
+
+        playlist = change.playlist
+        playlist_id = playlist["id"]
+
+        _write_playlist(cursor, playlist, change.entries)
+
+        anchor_id = convert_playlist_to_anchor(
+            repo,
+            playlist_id,
+            playlist["name"]
+        )
 
-            total_playlists_synced += 1
+        if anchor_id:
+
+            anchors_updated.append(anchor_id)
+            converted.append(playlist_id)
 
             cursor.execute(
-                "DELETE FROM playlist_tracks WHERE playlist_id = ?;",
+                "DELETE FROM playlists WHERE playlist_id = ?;",
                 (playlist_id,)
             )
 
-            track_offset = 0
-            track_limit = 100
-            position = 0
+    return anchors_updated, converted
 
-            while True:
-                result = get_playlist_items(
-                    sp,
-                    playlist_id,
-                    limit=track_limit,
-                    offset=track_offset
-                )
 
-                batch = result.get("items", [])
+def _unfollow_playlists(sp, playlist_ids):
 
-                if not batch:
-                    break
+    for playlist_id in playlist_ids:
+        call_rate_limited(
+            spotify_bucket,
+            sp.current_user_unfollow_playlist,
+            playlist_id
+        )
 
-                for entry in batch:
 
-                    content = entry.get("item")
+def _write_playlist(cursor, playlist, entries) -> int:
+    """
+    Upsert a changed playlist and diff its tracks against entries.
+    Returns the number of playlist_tracks rows changed.
+    """
+
+    cursor.execute("""
+        INSERT INTO playlists (
+            playlist_id,
+            name,
+            description,
+            owner_id,
+            is_collaborative,
+            is_public,
+            total_tracks,
+            snapshot_id,
+            updated_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+        ON CONFLICT(playlist_id) DO UPDATE SET
+            name = excluded.name,
+            description = excluded.description,
+            owner_id = excluded.owner_id,
+            is_collaborative = excluded.is_collaborative,
+            is_public = excluded.is_public,
+            total_tracks = excluded.total_tracks,
+            snapshot_id = excluded.snapshot_id,
+            updated_at = excluded.updated_at;
+    """, (
+        playlist["id"],
+        playlist.get("name"),
+        playlist.get("description"),
+        playlist["owner"]["id"],
+        int(playlist.get("collaborative", False)),
+        int(playlist.get("public", False)),
+        playlist.get("tracks", {}).get("total"),
+        playlist.get("snapshot_id")
+    ))
+
+    cursor.execute(
+        "SELECT playlist_key FROM playlists WHERE playlist_id = ?;",
+        (playlist["id"],)
+    )
+    playlist_key = cursor.fetchone()[0]
+
+    cursor.execute(
+        "DELETE FROM playlist_entries WHERE playlist_key = ?;",
+        (playlist_key,)
+    )
+    cursor.executemany("""
+        INSERT INTO playlist_entries (playlist_key, position, track_id, added_at)
+        VALUES (?, ?, ?, ?);
+    """, [
+        (playlist_key, position, track_id, added_at)
+        for position, (track_id, added_at) in enumerate(entries)
+    ])
+
+    return _apply_playlist_diff(cursor, playlist_key, entries)
+
+
+def _link_saved_tracks(cursor, track_ids) -> int:
+    """
+    Re-diff stored playlists whose recorded entries include newly
+    saved tracks, so those tracks join playlist_tracks even though
+    the playlists themselves did not change. Returns rows changed.
+    """
 
-                    if not content:
-                        continue
+    if not track_ids:
+        return 0
 
-                    if content.get("type") != "track":
-                        continue
+    cursor.execute("""
+        SELECT DISTINCT playlist_key
+        FROM playlist_entries
+        WHERE track_id IN (SELECT value FROM json_each(?));
+    """, (id_set(track_ids),))
 
-                    track_id = content.get("id")
+    changed = 0
 
-                    if not track_id:
-                        continue
+    for (playlist_key,) in cursor.fetchall():
 
-                    # Only include tracks already in library
-                    cursor.execute(
-                        "SELECT 1 FROM tracks WHERE track_id = ?;",
-                        (track_id,)
-                    )
+        cursor.execute("""
+            SELECT track_id, added_at
+            FROM playlist_entries
+            WHERE playlist_key = ?
+            ORDER BY position;
+        """, (playlist_key,))
 
-                    if not cursor.fetchone():
-                        continue
+        changed += _apply_playlist_diff(cursor, playlist_key, cursor.fetchall())
 
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO playlist_tracks
-                        (playlist_id, track_id, added_at, position)
-                        VALUES (?, ?, ?, ?);
-                    """, (
-                        playlist_id,
-                        track_id,
-                        entry.get("added_at"),
-                        position
-                    ))
+    return changed
 
-                    position += 1
-                    total_playlist_tracks_synced += 1
 
-                track_offset += track_limit
+def _fetch_item_page(sp, playlist_id, offset):
 
-        offset += limit
+    return call_rate_limited(
+        spotify_bucket,
+        get_playlist_items,
+        sp,
+        playlist_id,
+        limit=PLAYLIST_ITEMS_PAGE_SIZE,
+        offset=offset
+    )
 
-    repo.commit()
 
-    return {
-        "playlists_synced": total_playlists_synced,
-        "playlist_tracks_synced": total_playlist_tracks_synced,
-        "anchors_updated": anchors_updated
-    }
+def _submit_item_pages(pool, sp, playlist):
+    """
+    Queue every item page of a playlist, using the listing's track
+    total to know the offsets up front.
+    """
 
-def sync_deleted_playlists(sp, repo):
+    total = playlist.get("tracks", {}).get("total") or 0
 
-    spotify_ids = set()
+    return [
+        pool.submit(_fetch_item_page, sp, playlist["id"], offset)
+        for offset in range(0, max(total, 1), PLAYLIST_ITEMS_PAGE_SIZE)
+    ]
 
-    results = sp.current_user_playlists(limit=50)
 
-    while results:
+def _collect_playlist_entries(sp, playlist_id, pages):
+    """
+    All track entries of a playlist in order, as (track_id, added_at).
+    Pages past the listed total (the playlist grew since listing) are
+    fetched here, serially.
+    """
 
-        for p in results["items"]:
-            spotify_ids.add(p["id"])
+    entries = []
+    offset = 0
+
+    for future in pages:
+        result = future.result()
+        entries.extend(_playlist_page_entries(result))
+        offset += PLAYLIST_ITEMS_PAGE_SIZE
+
+    while result.get("next") and result.get("items"):
+        result = _fetch_item_page(sp, playlist_id, offset)
+        entries.extend(_playlist_page_entries(result))
+        offset += PLAYLIST_ITEMS_PAGE_SIZE
+
+    return entries
+
+
+def _playlist_page_entries(result):
+
+    entries = []
+
+    for entry in result.get("items", []):
+
+        content = entry.get("item")
+
+        if not content:
+            continue
+
+        if content.get("type") != "track":
+            continue
+
+        track_id = content.get("id")
+
+        if not track_id:
+            continue
+
+        entries.append((track_id, entry.get("added_at")))
+
+    return entries
 
-        if results["next"]:
-            results = sp.next(results)
-        else:
-            results = None
+
+def _apply_playlist_diff(cursor, playlist_key, entries) -> int:
+    """
+    Reconcile playlist_tracks with the remote entries: insert new
+    tracks, delete removed ones and move the ones whose position
+    changed. Only tracks already in library are kept, numbered in
+    remote order. Returns the number of rows changed.
+    """
+
+    cursor.execute(
+        "SELECT track_id, track_key FROM tracks WHERE track_id IN (SELECT value FROM json_each(?));",
+        (id_set({track_id for track_id, _ in entries}),)
+    )
+    track_keys = dict(cursor.fetchall())
+
+    remote = {}
+    position = 0
+
+    for track_id, added_at in entries:
+
+        track_key = track_keys.get(track_id)
+
+        if track_key is None:
+            continue
+
+        # A track listed twice keeps its first position
+        if track_key not in remote:
+            remote[track_key] = (added_at, position)
+
+        position += 1
+
+    cursor.execute(
+        "SELECT track_key, added_at, position FROM playlist_tracks WHERE playlist_key = ?;",
+        (playlist_key,)
+    )
+    stored = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    deletes = [
+        (playlist_key, track_key)
+        for track_key in stored.keys() - remote.keys()
+    ]
+    inserts = [
+        (playlist_key, track_key, *remote[track_key])
+        for track_key in remote.keys() - stored.keys()
+    ]
+    updates = [
+        (*remote[track_key], playlist_key, track_key)
+        for track_key in remote.keys() & stored.keys()
+        if remote[track_key] != stored[track_key]
+    ]
+
+    cursor.executemany(
+        "DELETE FROM playlist_tracks WHERE playlist_key = ? AND track_key = ?;",
+        deletes
+    )
+    cursor.executemany("""
+        INSERT INTO playlist_tracks (playlist_key, track_key, added_at, position)
+        VALUES (?, ?, ?, ?);
+    """, inserts)
+    cursor.executemany("""
+        UPDATE playlist_tracks
+        SET added_at = ?, position = ?
+        WHERE playlist_key = ? AND track_key = ?;
+    """, updates)
+
+    return len(deletes) + len(inserts) + len(updates)
+
+
+def sync_deleted_playlists(sp, repo, spotify_ids: set | None = None):
+    """
+    Delete playlists that no longer exist on Spotify.
+    spotify_ids can be the listed_playlist_ids of a sync_playlists run
+    in the same sync, which saves listing the playlists again.
+    """
+
+    if spotify_ids is None:
+        spotify_ids = set()
+
+        results = sp.current_user_playlists(limit=50)
+
+        while results:
+
+            for p in results["items"]:
+                spotify_ids.add(p["id"])
+
+            if results["next"]:
+                results = sp.next(results)
+            else:
+                results = None
 
     db_ids = set(repo.get_all_playlist_ids())
 
     deleted_ids = db_ids - spotify_ids
 
-    for playlist_id in deleted_ids:
-        repo.delete_playlist(playlist_id)
+    with repo.transaction():
+        for playlist_id in deleted_ids:
+            repo.delete_playlist(playlist_id)
+
+    return len(deleted_ids)
+
+
+# =====================================================
+# SYNC PLANNER
+# =====================================================
+
+@dataclass
+class PlaylistChange:
+    playlist: dict
+    # (track_id, added_at) in remote order
+    entries: list
+
+
+@dataclass
+class SyncPlan:
+    """
+    Everything a sync will write, computed from one pass over the
+    remote library. Built by plan_sync, written by apply_sync_plan.
+    """
+    user_id: str
+    track_batches: list = field(default_factory=list)
+    changed_playlists: list[PlaylistChange] = field(default_factory=list)
+    anchor_playlists: list[PlaylistChange] = field(default_factory=list)
+    deleted_playlist_ids: set[str] = field(default_factory=set)
+    unchanged_playlists: int = 0
+
+    # Remote saved-track count, for drift detection after apply
+    saved_tracks_total: int | None = None
+
+    # Cost of planning: Spotify requests made (retries included)
+    api_calls: int = 0
+    planning_seconds: float = 0.0
+
+    @property
+    def new_track_ids(self) -> list[str]:
+        return [row[0] for batch in self.track_batches for row in batch["tracks"]]
+
+    def is_empty(self) -> bool:
+        return not (
+            self.new_track_ids
+            or self.changed_playlists
+            or self.anchor_playlists
+            or self.deleted_playlist_ids
+        )
+
+
+class _CountingClient:
+    """
+    Proxy over the Spotify client that counts method calls.
+    """
+
+    def __init__(self, sp):
+        self._sp = sp
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._sp, name)
+
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            with self._lock:
+                self.calls += 1
+            return attr(*args, **kwargs)
+
+        return counted
+
+
+def plan_sync(sp, repo, user_id: str | None = None,
+              max_workers: int = PLAYLIST_FETCH_WORKERS) -> SyncPlan:
+    """
+    List the remote library once and compute a SyncPlan: new saved
+    tracks, changed, anchor and deleted playlists, with the items of
+    every changed playlist already fetched. Nothing is written.
+
+    Pass the user_id of an earlier plan to skip the current_user call.
+    """
+
+    started = time.perf_counter()
+    client = _CountingClient(sp)
+
+    if user_id is None:
+        user_id = client.current_user()["id"]
+
+    plan = SyncPlan(user_id=user_id)
+
+    plan.track_batches, plan.saved_tracks_total = _collect_new_tracks(
+        client,
+        repo.get_latest_added_at()
+    )
+
+    listed_ids, owned = _list_playlists(client, user_id)
+    stored_snapshots = repo.get_playlist_snapshot_ids()
+
+    anchors, changed, plan.unchanged_playlists = _classify_playlists(
+        owned,
+        stored_snapshots
+    )
+
+    plan.deleted_playlist_ids = stored_snapshots.keys() - listed_ids
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        anchor_pending = [
+            (playlist, _submit_item_pages(pool, client, playlist))
+            for playlist in anchors
+        ]
+
+        pending = [
+            (playlist, _submit_item_pages(pool, client, playlist))
+            for playlist in changed
+        ]
+
+        plan.anchor_playlists = [
+            PlaylistChange(
+                playlist,
+                _collect_playlist_entries(client, playlist["id"], pages)
+            )
+            for playlist, pages in anchor_pending
+        ]
+
+        plan.changed_playlists = [
+            PlaylistChange(
+                playlist,
+                _collect_playlist_entries(client, playlist["id"], pages)
+            )
+            for playlist, pages in pending
+        ]
+
+    plan.api_calls = client.calls
+    plan.planning_seconds = time.perf_counter() - started
+
+    return plan
+
+
+def apply_sync_plan(sp, repo, plan: SyncPlan) -> dict:
+    """
+    Write a SyncPlan in one transaction. Returns what changed.
+    """
+
+    new_tracks_ids = plan.new_track_ids
+    playlist_tracks_synced = 0
+
+    with repo.transaction() as conn:
+
+        cursor = conn.cursor()
+
+        # Tracks first: playlist diffs only keep tracks in library
+        for batch in plan.track_batches:
+            _write_track_batch(conn, batch)
+
+        anchors_updated, converted = _apply_anchor_playlists(
+            sp,
+            repo,
+            cursor,
+            plan.anchor_playlists
+        )
+
+        for change in plan.changed_playlists:
+            playlist_tracks_synced += _write_playlist(
+                cursor,
+                change.playlist,
+                change.entries
+            )
+
+        for playlist_id in plan.deleted_playlist_ids:
+            repo.delete_playlist(playlist_id)
+
+        # Unchanged playlists holding tracks saved in this sync
+        playlist_tracks_synced += _link_saved_tracks(cursor, new_tracks_ids)
+
+        if not plan.is_empty():
+            repo.invalidate_snapshot()
+
+    _unfollow_playlists(sp, converted)
+
+    return {
+        "new_tracks_count": len(new_tracks_ids),
+        "new_tracks_ids": new_tracks_ids,
+        "playlists_synced": len(plan.changed_playlists),
+        "playlist_tracks_synced": playlist_tracks_synced,
+        "anchors_updated": anchors_updated,
+        "deleted_playlists": len(plan.deleted_playlist_ids),
+        "api_calls": plan.api_calls
+    }
+
+
+# =====================================================
+# LIBRARY RECONCILIATION
+# =====================================================
+
+class _PositionsUnusable(Exception):
+    """
+    The remote list is not the local one minus removals.
+    """
+
+
+def reconcile_library(sp, repo, remote_total: int | None = None) -> dict:
+    """
+    Find saved tracks the user has un-saved on Spotify and purge them
+    locally. Incremental sync only ever adds, so these would otherwise
+    stay forever.
+
+    Cheap signals first: when the remote total is not below the local
+    count nothing can be missing (remote_total from a sync plan makes
+    that check free). Otherwise both lists, newest first, are compared
+    in page windows by drift: how many local tracks are gone before a
+    window's first remote item (its local minus remote position). Drift
+    only grows past a removed track and is exact at every window edge,
+    so windows whose edges agree hold no removal and are skipped; the
+    others are bisected down to single pages and diffed. Tracks unknown
+    locally or moved make positions meaningless; every page is diffed
+    then. Each candidate is confirmed with the saved-tracks contains
+    endpoint before it is purged.
+    """
+
+    page_size = SAVED_TRACKS_PAGE_SIZE
+    pages = {}
+
+    def page(window):
+        if window not in pages:
+            pages[window] = call_rate_limited(
+                spotify_bucket,
+                sp.current_user_saved_tracks,
+                limit=page_size,
+                offset=window * page_size
+            )
+        return pages[window]
+
+    if remote_total is None:
+        remote_total = page(0)["total"]
+
+    local = repo.get_track_ids_by_added_at()
+    missing = len(local) - remote_total
+
+    result = {
+        "remote_total": remote_total,
+        "local_total": len(local),
+        "pages_fetched": 0,
+        "removed_track_ids": []
+    }
+
+    if missing <= 0:
+        result["pages_fetched"] = len(pages)
+        return result
+
+    local_index = {track_id: i for i, track_id in enumerate(local)}
+    windows = -(-remote_total // page_size)
+    candidates = set()
+
+    def drift(window):
+        ids = [item["track"]["id"] for item in page(window)["items"]]
+
+        if not ids or any(track_id not in local_index for track_id in ids):
+            raise _PositionsUnusable()
+
+        return local_index[ids[0]] - window * page_size
+
+    def search(lo, hi, d_lo, d_hi):
+        # d_lo / d_hi: drift at the first item of windows lo and hi
+        # (0 before the first item, `missing` past the last)
+        if d_lo == d_hi:
+            return
+
+        if hi - lo == 1:
+            remote_ids = {item["track"]["id"] for item in page(lo)["items"]}
+            start = lo * page_size + d_lo
+            end = min(hi * page_size + d_hi, len(local))
+            candidates.update(set(local[start:end]) - remote_ids)
+            return
+
+        mid = (lo + hi) // 2
+        d_mid = drift(mid)
+
+        # Only removals happened if drift never shrinks
+        if not d_lo <= d_mid <= d_hi:
+            raise _PositionsUnusable()
+
+        search(lo, mid, d_lo, d_mid)
+        search(mid, hi, d_mid, d_hi)
+
+    try:
+        search(0, windows, 0, missing)
+
+    except _PositionsUnusable:
+        # Saved or reordered since the last sync: diff every page
+        remote_ids = set()
+
+        for window in range(windows):
+            remote_ids.update(item["track"]["id"] for item in page(window)["items"])
+
+        candidates = set(local) - remote_ids
+
+    # Tracks seen anywhere remotely are still saved
+    for fetched in pages.values():
+        candidates.difference_update(item["track"]["id"] for item in fetched["items"])
+
+    removed = []
+    candidates = sorted(candidates, key=local_index.get)
+
+    for i in range(0, len(candidates), SAVED_TRACKS_CONTAINS_BATCH):
+        batch = candidates[i:i + SAVED_TRACKS_CONTAINS_BATCH]
+
+        saved = call_rate_limited(
+            spotify_bucket,
+            sp.current_user_saved_tracks_contains,
+            tracks=batch
+        )
+
+        removed.extend(
+            track_id
+            for track_id, is_saved in zip(batch, saved)
+            if not is_saved
+        )
+
+    if removed:
+        repo.purge_tracks(removed)
+
+    result["pages_fetched"] = len(pages)
+    result["removed_track_ids"] = removed
 
-    return len(deleted_ids)
\ No newline at end of file
+    return result
@@ -16,8 +16,22 @@ def main():
 
         if user_input.lower() in ["exit", "quit"]:
             print("Goodbye.")
+            app.session.close()
             break
 
+        if user_input.strip().lower() == "sql stats":
+            print_sql_stats(app)
+            continue
+
+        if user_input.strip().lower() == "sync status":
+            print_sync_status(app)
+            continue
+
+        if user_input.strip().lower() == "sync now":
+            app.session.sync_now()
+            print("\nSync queued.\n")
+            continue
+
         try:
             result = app.session.handle(user_input)
 
@@ -36,5 +50,36 @@ def main():
             print(f"\nSystem error: {e}\n")
 
 
+def print_sql_stats(app):
+
+    if app.profiler is None:
+        print("\nSQL profiling is off. Start with MUSIC_AGENT_SQL_PROFILE=1.\n")
+        return
+
+    print("\nTop SQL statements by total time:\n")
+    print(app.profiler.report(limit=10))
+    print()
+
+
+def print_sync_status(app):
+
+    status = app.session.sync_worker.status()
+
+    print(f"\nSync: {status.phase}{' (another run queued)' if status.pending else ''}")
+    print(f"Runs: {status.runs}")
+
+    if status.last_finished_at:
+        print(f"Last finished: {status.last_finished_at.isoformat(timespec='seconds')} UTC")
+
+    if status.last_error:
+        print(f"Last error: {status.last_error}")
+
+    elif status.last_result:
+        for key, value in status.last_result.items():
+            print(f"  {key}: {value}")
+
+    print()
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
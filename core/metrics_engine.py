@@ -11,7 +11,7 @@ def update_track_metrics(repo, decay_days: float = 30.0) -> int:
     max_recency = max(row[1] for row in play_data)
     max_plays = max(row[2] for row in play_data)
 
-    updated = 0
+    rows = []
 
     for track_id, recency_score, total_plays in play_data:
 
@@ -27,15 +27,11 @@ def update_track_metrics(repo, decay_days: float = 30.0) -> int:
             popularity_norm * 0.1
         )
 
-        repo.upsert_track_metrics(
-            track_id=track_id,
-            recency_score=recency_score,
-            popularity=popularity,
-            engagement_score=engagement_score
-        )
-
-        updated += 1
-
-    repo.commit_batch()
+        rows.append((
+            track_id,
+            recency_score,
+            popularity,
+            engagement_score
+        ))
 
-    return updated
\ No newline at end of file
+    return repo.upsert_track_metrics_many(rows)
\ No newline at end of file
@@ -1,6 +1,3 @@
-import requests
-
-
 # Playlist Discovery
 
 
@@ -94,31 +91,21 @@ def add_tracks_to_playlist(sp, playlist_id: str, track_ids: list):
 
 def remove_tracks_from_playlist(sp, playlist_id, track_ids):
     """
-    Remove track IDs from a playlist.
+    Remove track IDs from a playlist using official /items endpoint.
     """
-    token = sp.auth_manager.get_access_token(as_dict=False)
-
-    url = f"https://api.spotify.com/v1/playlists/{playlist_id}/items"
-
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "items": [
-            {"uri": f"spotify:track:{tid}"} for tid in track_ids
-        ]
-    }
+    track_uris = [f"spotify:track:{tid}" for tid in track_ids]
 
-    response = requests.delete(url, headers=headers, json=payload)
+    result = None
 
-    if response.status_code != 200:
-        raise RuntimeError(
-            f"Failed to remove tracks. Status: {response.status_code}, Response: {response.text}"
+    for i in range(0, len(track_uris), 100):
+        result = sp._delete(
+            f"playlists/{playlist_id}/items",
+            payload={
+                "items": [{"uri": uri} for uri in track_uris[i:i+100]]
+            }
         )
 
-    return response.json()
+    return result
 
 
 def replace_playlist_tracks(sp, playlist_id: str, track_ids: list):
@@ -0,0 +1,295 @@
+# core/profiler.py
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+# Statements worth an EXPLAIN QUERY PLAN
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+# Per-statement samples kept for percentiles
+_SAMPLES_PER_STATEMENT = 1024
+
+
+def statement_shape(sql: str) -> str:
+    """
+    Canonical form of a statement: whitespace collapsed and
+    placeholder lists folded, so every call of one query shares stats.
+    """
+    shape = " ".join(sql.split())
+    return re.sub(r"\?(\s*,\s*\?)+", "?, ...", shape)
+
+
+class StatementStats:
+
+    def __init__(self, shape: str):
+        self.shape = shape
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.plan = None
+        self.samples = deque(maxlen=_SAMPLES_PER_STATEMENT)
+
+    def add(self, seconds: float, rows: int):
+        self.calls += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.rows += rows
+        self.samples.append(seconds)
+
+    def p95_seconds(self) -> float:
+        if not self.samples:
+            return 0.0
+
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def to_dict(self) -> dict:
+        return {
+            "statement": self.shape,
+            "calls": self.calls,
+            "total_ms": self.total_seconds * 1000,
+            "mean_ms": self.total_seconds * 1000 / self.calls if self.calls else 0.0,
+            "p95_ms": self.p95_seconds() * 1000,
+            "max_ms": self.max_seconds * 1000,
+            "rows": self.rows,
+            "plan": self.plan
+        }
+
+
+class QueryProfiler:
+    """
+    Per-statement call counts, timings and row counts for every
+    connection opened with ProfiledConnection.
+
+    Time covers execute plus fetching, so lazy SELECTs are charged
+    fully. Statements slower than slow_ms are appended as JSON lines
+    to slow_log_path.
+    """
+
+    def __init__(self, slow_ms: float = 50.0, slow_log_path: str | None = None):
+        self.slow_ms = slow_ms
+        self.slow_log_path = slow_log_path
+
+        self._stats: dict[str, StatementStats] = {}
+        self._lock = threading.Lock()
+
+    def needs_plan(self, shape: str) -> bool:
+        with self._lock:
+            stats = self._stats.get(shape)
+            return stats is None or stats.plan is None
+
+    def record_plan(self, shape: str, plan: list[str]):
+        with self._lock:
+            self._stats.setdefault(shape, StatementStats(shape)).plan = plan
+
+    def record(self, shape: str, seconds: float, rows: int):
+        with self._lock:
+            self._stats.setdefault(shape, StatementStats(shape)).add(seconds, rows)
+
+        if seconds * 1000 >= self.slow_ms:
+            self._log_slow(shape, seconds, rows)
+
+    def _log_slow(self, shape: str, seconds: float, rows: int):
+        if not self.slow_log_path:
+            return
+
+        entry = {
+            "at": datetime.utcnow().isoformat(),
+            "thread": threading.current_thread().name,
+            "elapsed_ms": round(seconds * 1000, 3),
+            "rows": rows,
+            "statement": shape
+        }
+
+        with self._lock:
+            with open(self.slow_log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    # =====================================================
+    # REPORTING
+    # =====================================================
+
+    def top(self, limit: int = 10, by: str = "total_ms") -> list[dict]:
+        with self._lock:
+            rows = [s.to_dict() for s in self._stats.values()]
+
+        rows.sort(key=lambda r: r[by], reverse=True)
+        return rows[:limit]
+
+    def report(self, limit: int = 10, by: str = "total_ms") -> str:
+        rows = self.top(limit, by)
+
+        if not rows:
+            return "No SQL statements recorded."
+
+        lines = [
+            f"{'calls':>7} {'total ms':>10} {'p95 ms':>8} {'max ms':>8} {'rows':>8}  statement"
+        ]
+
+        for r in rows:
+            lines.append(
+                f"{r['calls']:>7} {r['total_ms']:>10.1f} {r['p95_ms']:>8.2f} "
+                f"{r['max_ms']:>8.2f} {r['rows']:>8}  {r['statement'][:100]}"
+            )
+
+            for step in r["plan"] or []:
+                lines.append(f"{'':>46}  > {step}")
+
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# =====================================================
+# CONNECTION / CURSOR
+# =====================================================
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    Cursor that times each statement until its results are exhausted,
+    the next statement runs or the cursor is closed or dropped, and
+    reports it to the connection's profiler.
+    """
+
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._explain(sql, parameters)
+        return self._timed(sql, super().execute, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+
+        if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters:
+            self._explain(sql, seq_of_parameters[0])
+
+        return self._timed(sql, super().executemany, seq_of_parameters)
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        self._add_rows(0 if row is None else 1)
+
+        if row is None:
+            self._finish()
+
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(super().fetchmany, self.arraysize if size is None else size)
+        self._add_rows(len(rows))
+
+        if len(rows) < (self.arraysize if size is None else size):
+            self._finish()
+
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        self._add_rows(len(rows))
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._fetch(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+
+        self._add_rows(1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # A cursor dropped before its results ran out (a fetchone()
+        # lookup) still counts
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    # -------------------------
+
+    def _timed(self, sql, method, parameters):
+        start = time.perf_counter()
+        try:
+            method(sql, parameters)
+        finally:
+            self._pending = [statement_shape(sql), time.perf_counter() - start, 0]
+
+        # No result set: the statement is complete
+        if self.description is None:
+            self._add_rows(max(self.rowcount, 0))
+            self._finish()
+
+        return self
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._pending is not None:
+                self._pending[1] += time.perf_counter() - start
+
+    def _add_rows(self, n: int):
+        if self._pending is not None:
+            self._pending[2] += n
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+
+        if pending is not None:
+            self.connection.profiler.record(*pending)
+
+    def _explain(self, sql, parameters):
+        shape = statement_shape(sql)
+        profiler = self.connection.profiler
+
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE) or not profiler.needs_plan(shape):
+            return
+
+        try:
+            rows = self.connection.explain(sql, parameters)
+        except sqlite3.Error:
+            return
+
+        profiler.record_plan(shape, [r[3] for r in rows])
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection factory that routes every statement through a
+    ProfiledCursor. Set .profiler after connecting.
+    """
+
+    profiler: QueryProfiler = None
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def explain(self, sql, parameters=()) -> list:
+        cursor = super().cursor()
+        try:
+            return cursor.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        finally:
+            cursor.close()
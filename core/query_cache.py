@@ -0,0 +1,101 @@
+# core/query_cache.py
+
+import copy
+import functools
+import threading
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    Bounded LRU of read results, each tagged with the data generation
+    it was read at. An entry is only served while the generation is
+    unchanged, so one bump invalidates everything at once.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, generation: int):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] != generation:
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key, generation: int, value):
+        with self._lock:
+            self._entries[key] = (generation, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+
+    if isinstance(value, set):
+        return frozenset(value)
+
+    return value
+
+
+def cached_read(method):
+    """
+    Serve a Repository read from the session's QueryCache, keyed by
+    method name and arguments. Callers get their own copy of the
+    result, so mutating it never touches the cache.
+
+    Reads made while holding the writer bypass the cache: they can see
+    uncommitted changes.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        session = self._session
+        cache = session.read_cache
+
+        if cache is None or session.holds_writer():
+            return method(self, *args, **kwargs)
+
+        key = (name, _freeze(args), _freeze(kwargs))
+
+        try:
+            hash(key)
+        except TypeError:
+            return method(self, *args, **kwargs)
+
+        # Read the generation first: a commit landing mid-read bumps it
+        # and the entry is never served.
+        generation = session.generation
+
+        hit, value = cache.get(key, generation)
+
+        if hit:
+            return copy.deepcopy(value)
+
+        value = method(self, *args, **kwargs)
+        cache.put(key, generation, copy.deepcopy(value))
+        return value
+
+    return wrapper
@@ -0,0 +1,120 @@
+# core/rate_limit.py
+
+import threading
+import time
+
+
+# Sustained Spotify Web API request rate shared by concurrent fetchers
+SPOTIFY_REQUESTS_PER_SECOND = 10.0
+SPOTIFY_BURST = 10
+
+# Used when a 429 carries no usable Retry-After header
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+
+# Longest Retry-After waited out. A longer one is raised instead, so a
+# sync fails fast and the next scheduled run tries again.
+MAX_RETRY_AFTER_SECONDS = 60.0
+
+# Set by a transport (core.spotify_transport) on a response it has
+# already retried, so callers here do not retry it again
+TRANSPORT_RETRIED_HEADER = "X-Transport-Retried"
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() blocks until a token is
+    available; pause() stops every caller until a deadline, which is
+    how a Retry-After from any one thread throttles all of them.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+
+                if now < self._resume_at:
+                    wait = self._resume_at - now
+                else:
+                    self._tokens = min(
+                        self.capacity,
+                        self._tokens + (now - self._updated) * self.rate
+                    )
+                    self._updated = now
+
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+
+                    wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+            # Nothing saved up during the pause may burst out after it
+            self._tokens = 0.0
+            self._updated = self._resume_at
+
+
+# Shared by every Spotify fetcher in the process
+spotify_bucket = TokenBucket(SPOTIFY_REQUESTS_PER_SECOND, SPOTIFY_BURST)
+
+
+def retry_after_seconds(error) -> float | None:
+    """
+    Seconds to wait before retrying a rate-limited call, or None when
+    the error is not a 429 or asks for more than
+    MAX_RETRY_AFTER_SECONDS. Reads spotipy's SpotifyException fields.
+    """
+    if getattr(error, "http_status", None) != 429:
+        return None
+
+    headers = getattr(error, "headers", None) or {}
+
+    # The transport already waited out its own retries
+    if headers.get(TRANSPORT_RETRIED_HEADER):
+        return None
+
+    try:
+        seconds = max(float(headers.get("Retry-After")), 0.0)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SECONDS
+
+    if seconds > MAX_RETRY_AFTER_SECONDS:
+        return None
+
+    return seconds
+
+
+def call_rate_limited(bucket: TokenBucket, fn, *args, max_retries: int = 5, **kwargs):
+    """
+    Call fn under the bucket. A 429 pauses the whole bucket for its
+    Retry-After and the call is repeated, up to max_retries times,
+    unless the transport has retried it already.
+    """
+    attempt = 0
+
+    while True:
+        bucket.acquire()
+
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            wait = retry_after_seconds(e)
+
+            if wait is None or attempt >= max_retries:
+                raise
+
+            attempt += 1
+            bucket.pause(wait)
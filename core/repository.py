@@ -1,6 +1,21 @@
 # core/repository.py
 
+import math
 from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Iterable
+
+from core.database import (
+    MS_PER_DAY,
+    get_latest_added_at,
+    id_set,
+    normalize_name,
+    now_ms,
+    rebuild_recency,
+    to_epoch_ms,
+)
+from core.query_cache import cached_read
+from core.snapshot import build_snapshot
 
 
 class Repository:
@@ -8,179 +23,679 @@ class Repository:
         self.conn = db_session.conn
         self._session = db_session
 
+    @property
+    def db_path(self) -> str:
+        return self._session.db_path
+
     def commit(self):
         self._session.commit()
     
     def commit_batch(self):
         self.commit()
 
+    def writer(self):
+        """
+        Hold the single writer connection for a multi-statement write.
+        Reads issued by the same thread go through it as well.
+        """
+        return self._session.writer()
+
+    def transaction(self):
+        """
+        Unit of work: every write inside commits once on exit,
+        or rolls back together if an exception escapes.
+        """
+        return self._session.transaction()
+
+    # =====================================================
+    # SNAPSHOT
+    # =====================================================
+
+    # Builds tried before giving up when writes keep landing mid-build
+    SNAPSHOT_BUILD_ATTEMPTS = 3
+
+    @property
+    def snapshot(self):
+        # A thread in the middle of a write must see its own changes
+        if self._session.holds_writer():
+            return None
+
+        return self._session.snapshot
+
+    def refresh_snapshot(self):
+        """
+        Rebuild the in-memory library snapshot from committed data
+        and swap it in. Reads keep using the old one until the swap.
+
+        The build reads every table inside one read transaction. A
+        commit landing while it runs makes the result stale, so it is
+        only installed when the data generation has not moved; the
+        build is retried a few times, then the snapshot is left unset
+        (reads go to SQLite). Returns the installed snapshot or None.
+        """
+        session = self._session
+
+        for _ in range(self.SNAPSHOT_BUILD_ATTEMPTS):
+            generation = session.generation
+
+            with session.reader() as conn:
+                own_transaction = not conn.in_transaction
+
+                if own_transaction:
+                    conn.execute("BEGIN;")
+
+                try:
+                    snapshot = build_snapshot(conn)
+                finally:
+                    if own_transaction:
+                        conn.rollback()
+
+            # Commits bump the generation under the writer lock
+            with session.writer():
+                if session.generation == generation:
+                    session.snapshot = snapshot
+                    return snapshot
+
+        return None
+
+    def invalidate_snapshot(self):
+        """
+        Drop the snapshot after a write to library tables.
+        Reads go to SQLite until the next refresh_snapshot().
+        """
+        self._session.snapshot = None
+
     # =====================================================
     # TRACKS
     # =====================================================
 
+    @cached_read
     def get_tracks_by_artist(self, artist_name: str) -> list[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT t.track_id
-            FROM tracks t
-            JOIN track_artists ta ON t.track_id = ta.track_id
-            JOIN artists a ON ta.artist_id = a.artist_id
-            WHERE LOWER(a.name) = LOWER(?)
-            ORDER BY t.added_at DESC
-        """, (artist_name,))
-        return [r[0] for r in cursor.fetchall()]
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.get_tracks_by_artist(artist_name)
 
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.track_id
+                FROM tracks t
+                JOIN track_artists ta ON t.track_key = ta.track_key
+                JOIN artists a ON ta.artist_key = a.artist_key
+                WHERE a.name_norm = ?
+                ORDER BY t.added_at DESC
+            """, (normalize_name(artist_name),))
+            return [r[0] for r in cursor.fetchall()]
+
+    @cached_read
     def get_tracks_by_album(self, album_name: str) -> list[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT t.track_id
-            FROM tracks t
-            JOIN track_albums ta ON ta.track_id = t.track_id
-            JOIN albums a ON ta.album_id = a.album_id
-            WHERE LOWER(a.name) = LOWER(?)
-            ORDER BY t.added_at DESC
-        """, (album_name,))
-        return [r[0] for r in cursor.fetchall()]
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.get_tracks_by_album(album_name)
+
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.track_id
+                FROM tracks t
+                JOIN track_albums ta ON ta.track_key = t.track_key
+                JOIN albums a ON ta.album_key = a.album_key
+                WHERE a.name_norm = ?
+                ORDER BY t.added_at DESC
+            """, (normalize_name(album_name),))
+            return [r[0] for r in cursor.fetchall()]
 
+    @cached_read
     def get_recent_tracks(self, limit: int = 20) -> list[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT track_id
-            FROM tracks
-            ORDER BY added_at DESC
-            LIMIT ?
-        """, (limit,))
-        return [r[0] for r in cursor.fetchall()]
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.get_recent_tracks(limit)
+
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT track_id
+                FROM tracks
+                ORDER BY added_at DESC
+                LIMIT ?
+            """, (limit,))
+            return [r[0] for r in cursor.fetchall()]
     
+    @cached_read
     def get_album_tracks_raw(self, album_name: str) -> list[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT t.track_id
-            FROM tracks t
-            JOIN track_albums ta ON ta.track_id = t.track_id
-            JOIN albums a ON a.album_id = ta.album_id
-            WHERE a.name = ?
-        """, (album_name,))
-        return [r[0] for r in cursor.fetchall()]
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.track_id
+                FROM tracks t
+                JOIN track_albums ta ON ta.track_key = t.track_key
+                JOIN albums a ON a.album_key = ta.album_key
+                WHERE a.name = ?
+            """, (album_name,))
+            return [r[0] for r in cursor.fetchall()]
     
+    @cached_read
     def get_artist_tracks_raw(self, artist_name: str) -> list[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT DISTINCT t.track_id
-            FROM tracks t
-            JOIN track_artists ta ON ta.track_id = t.track_id
-            JOIN artists a ON a.artist_id = ta.artist_id
-            WHERE a.name = ?
-        """, (artist_name,))
-        return [r[0] for r in cursor.fetchall()]
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT DISTINCT t.track_id
+                FROM tracks t
+                JOIN track_artists ta ON ta.track_key = t.track_key
+                JOIN artists a ON a.artist_key = ta.artist_key
+                WHERE a.name = ?
+            """, (artist_name,))
+            return [r[0] for r in cursor.fetchall()]
+
+    @cached_read
+    def get_library_track_ids(self):
+        """
+        Set of every track id in library, for bulk membership checks.
+        """
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return set(snapshot.track_index)
+
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT track_id FROM tracks")
+            return {r[0] for r in cursor.fetchall()}
 
     def track_exists(self, track_id: str) -> bool:
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "SELECT 1 FROM tracks WHERE track_id = ?;",
-            (track_id,)
-        )
-        return cursor.fetchone() is not None
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.track_exists(track_id)
+
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT 1 FROM tracks WHERE track_id = ?;",
+                (track_id,)
+            )
+            return cursor.fetchone() is not None
 
+    @cached_read
     def count_tracks_by_artist(self, artist_name: str) -> int:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM tracks t
-            JOIN track_artists ta ON t.track_id = ta.track_id
-            JOIN artists a ON ta.artist_id = a.artist_id
-            WHERE LOWER(a.name) = LOWER(?)
-        """, (artist_name,))
-        return cursor.fetchone()[0]
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.count_tracks_by_artist(artist_name)
+
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*)
+                FROM tracks t
+                JOIN track_artists ta ON t.track_key = ta.track_key
+                JOIN artists a ON ta.artist_key = a.artist_key
+                WHERE a.name_norm = ?
+            """, (normalize_name(artist_name),))
+            return cursor.fetchone()[0]
     
+    @cached_read
     def count_tracks(self) -> int:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM tracks
-        """)
-        return cursor.fetchone()[0]
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.count_tracks()
+
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*)
+                FROM tracks
+            """)
+            return cursor.fetchone()[0]
     
+    @cached_read
     def get_track_name(self, track_id: str) -> str | None:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT name
-            FROM tracks
-            WHERE track_id = ?
-        """, (track_id,))
-        row = cursor.fetchone()
-        return row[0] if row else None
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.get_track_name(track_id)
+
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT name
+                FROM tracks
+                WHERE track_id = ?
+            """, (track_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
     
     def get_all_tracks_with_artists(self):
-        cursor = self.conn.cursor()
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.get_all_tracks_with_artists()
 
-        cursor.execute("""
-            SELECT
-                t.track_id,
-                t.name,
-                a.name
-            FROM tracks t
-            JOIN track_artists ta ON t.track_id = ta.track_id
-            JOIN artists a ON ta.artist_id = a.artist_id
-            ORDER BY t.track_id;
-        """)
+        return [
+            track
+            for chunk in self.iter_tracks_with_artists()
+            for track in chunk
+        ]
 
-        rows = cursor.fetchall()
+    def iter_tracks_with_artists(self, chunk_size: int = 500):
+        """
+        Stream the whole library as lists of up to chunk_size
+        {"track_id", "name", "artists"} records, ordered by track_id.
+        Rows are pulled with fetchmany, so memory stays bounded by
+        one chunk regardless of library size.
+        """
+        snapshot = self.snapshot
+        if snapshot is not None:
+            yield from snapshot.iter_tracks_with_artists(chunk_size)
+            return
 
-        tracks = {}
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
 
-        for track_id, track_name, artist_name in rows:
-            if track_id not in tracks:
-                tracks[track_id] = {
-                    "track_id": track_id,
-                    "name": track_name,
-                    "artists": []
-                }
+            # CROSS JOIN pins tracks as the outer loop, walked in
+            # track_id index order: no sort buffers the whole result
+            # and one track's artist rows arrive contiguously
+            cursor.execute("""
+                SELECT
+                    t.track_id,
+                    t.name,
+                    a.name
+                FROM tracks t
+                CROSS JOIN track_artists ta ON t.track_key = ta.track_key
+                JOIN artists a ON ta.artist_key = a.artist_key
+                ORDER BY t.track_id;
+            """)
 
-            tracks[track_id]["artists"].append(artist_name)
+            chunk = []
+            current = None
 
-        return list(tracks.values())
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+
+                if not rows:
+                    break
+
+                for track_id, track_name, artist_name in rows:
+                    if current is None or current["track_id"] != track_id:
+                        if current is not None:
+                            chunk.append(current)
+
+                            if len(chunk) >= chunk_size:
+                                yield chunk
+                                chunk = []
+
+                        current = {
+                            "track_id": track_id,
+                            "name": track_name,
+                            "artists": []
+                        }
+
+                    current["artists"].append(artist_name)
+
+            if current is not None:
+                chunk.append(current)
+
+            if chunk:
+                yield chunk
     
+    @cached_read
     def get_tracks_with_artists(self, track_ids: list[str]):
 
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.get_tracks_with_artists(track_ids)
+
         if not track_ids:
             return []
 
-        placeholders = ",".join(["?"] * len(track_ids))
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
 
-        cursor = self.conn.cursor()
+            query = """
+                SELECT
+                    t.track_id,
+                    t.name,
+                    a.name
+                FROM tracks t
+                JOIN track_artists ta ON t.track_key = ta.track_key
+                JOIN artists a ON ta.artist_key = a.artist_key
+                WHERE t.track_id IN (SELECT value FROM json_each(?))
+                ORDER BY t.track_id;
+            """
 
-        query = f"""
-            SELECT
-                t.track_id,
-                t.name,
-                a.name
-            FROM tracks t
-            JOIN track_artists ta ON t.track_id = ta.track_id
-            JOIN artists a ON ta.artist_id = a.artist_id
-            WHERE t.track_id IN ({placeholders})
-            ORDER BY t.track_id;
+            cursor.execute(query, (id_set(track_ids),))
+
+            rows = cursor.fetchall()
+
+            tracks = {}
+
+            for track_id, track_name, artist_name in rows:
+
+                if track_id not in tracks:
+                    tracks[track_id] = {
+                        "track_id": track_id,
+                        "name": track_name,
+                        "artists": []
+                    }
+
+                tracks[track_id]["artists"].append(artist_name)
+
+            return list(tracks.values())
+
+    def get_latest_added_at(self) -> int | None:
+        """
+        Most recent tracks.added_at, in epoch ms, through a pooled reader.
         """
+        with self._session.reader() as conn:
+            return get_latest_added_at(conn)
 
-        cursor.execute(query, track_ids)
+    def get_track_ids_by_added_at(self) -> list[str]:
+        """
+        Every track id, newest saved first (Spotify's saved-tracks order).
+        """
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT track_id
+                FROM tracks
+                ORDER BY added_at DESC, track_key DESC
+            """)
+            return [r[0] for r in cursor.fetchall()]
 
-        rows = cursor.fetchall()
+    def purge_tracks(self, track_ids: list[str]) -> int:
+        """
+        Delete tracks that left the library, with their links, plays,
+        metrics and recency (by cascade) and their catalog_fts rows.
+        Artist recency loses their plays; artists and albums left
+        without tracks are deleted too. Returns the tracks deleted.
+        """
+        if not track_ids:
+            return 0
+
+        self.invalidate_snapshot()
+
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT track_key
+                FROM tracks
+                WHERE track_id IN (SELECT value FROM json_each(?))
+            """, (id_set(track_ids),))
+            keys = id_set(r[0] for r in cursor.fetchall())
+
+            cursor.execute("""
+                SELECT DISTINCT artist_key
+                FROM track_artists
+                WHERE track_key IN (SELECT value FROM json_each(?))
+            """, (keys,))
+            artist_keys = id_set(r[0] for r in cursor.fetchall())
+
+            cursor.execute("""
+                SELECT DISTINCT album_key
+                FROM track_albums
+                WHERE track_key IN (SELECT value FROM json_each(?))
+            """, (keys,))
+            album_keys = id_set(r[0] for r in cursor.fetchall())
+
+            cursor.execute("""
+                UPDATE artist_recency
+                SET score = artist_recency.score - d.score,
+                    plays = artist_recency.plays - d.plays
+                FROM (
+                    SELECT ta.artist_key, SUM(tr.score) AS score, SUM(tr.plays) AS plays
+                    FROM track_recency tr
+                    JOIN track_artists ta ON ta.track_key = tr.track_key
+                    WHERE tr.track_key IN (SELECT value FROM json_each(?))
+                    GROUP BY ta.artist_key
+                ) d
+                WHERE artist_recency.artist_key = d.artist_key
+            """, (keys,))
+
+            cursor.execute("""
+                DELETE FROM artist_recency
+                WHERE plays <= 0
+                  AND artist_key IN (SELECT value FROM json_each(?))
+            """, (artist_keys,))
+
+            cursor.execute("""
+                DELETE FROM catalog_fts
+                WHERE kind = 'track'
+                  AND entity_id IN (SELECT value FROM json_each(?))
+            """, (id_set(track_ids),))
+
+            cursor.execute("""
+                DELETE FROM tracks
+                WHERE track_key IN (SELECT value FROM json_each(?))
+            """, (keys,))
+            deleted = cursor.rowcount
+
+            # Artists and albums no longer on any track
+            cursor.execute("""
+                DELETE FROM catalog_fts
+                WHERE kind = 'artist'
+                  AND entity_id IN (
+                      SELECT a.artist_id
+                      FROM artists a
+                      WHERE a.artist_key IN (SELECT value FROM json_each(?))
+                        AND NOT EXISTS (
+                            SELECT 1 FROM track_artists ta WHERE ta.artist_key = a.artist_key
+                        )
+                  )
+            """, (artist_keys,))
+
+            cursor.execute("""
+                DELETE FROM artists
+                WHERE artist_key IN (SELECT value FROM json_each(?))
+                  AND NOT EXISTS (
+                      SELECT 1 FROM track_artists ta WHERE ta.artist_key = artists.artist_key
+                  )
+            """, (artist_keys,))
+
+            cursor.execute("""
+                DELETE FROM catalog_fts
+                WHERE kind = 'album'
+                  AND entity_id IN (
+                      SELECT a.album_id
+                      FROM albums a
+                      WHERE a.album_key IN (SELECT value FROM json_each(?))
+                        AND NOT EXISTS (
+                            SELECT 1 FROM track_albums ta WHERE ta.album_key = a.album_key
+                        )
+                        AND NOT EXISTS (
+                            SELECT 1 FROM saved_albums sa WHERE sa.album_key = a.album_key
+                        )
+                  )
+            """, (album_keys,))
+
+            cursor.execute("""
+                DELETE FROM albums
+                WHERE album_key IN (SELECT value FROM json_each(?))
+                  AND NOT EXISTS (
+                      SELECT 1 FROM track_albums ta WHERE ta.album_key = albums.album_key
+                  )
+                  AND NOT EXISTS (
+                      SELECT 1 FROM saved_albums sa WHERE sa.album_key = albums.album_key
+                  )
+            """, (album_keys,))
+
+            self.commit()
+
+        return deleted
+
+    # =====================================================
+    # AUDIO FEATURES
+    # =====================================================
+
+    def get_track_ids_missing_audio_features(self, retry_misses_before: int) -> list[str]:
+        """
+        Tracks with no audio features row, leaving out recorded misses
+        checked at or after retry_misses_before (epoch ms).
+        """
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.track_id
+                FROM tracks t
+                LEFT JOIN track_audio_features f ON f.track_key = t.track_key
+                LEFT JOIN track_audio_features_misses m ON m.track_key = t.track_key
+                WHERE f.track_key IS NULL
+                  AND (m.track_key IS NULL OR m.checked_at < ?)
+                ORDER BY t.track_key
+            """, (retry_misses_before,))
+            return [r[0] for r in cursor.fetchall()]
+
+    def save_audio_features(self, rows: list[tuple], misses: list[str]):
+        """
+        Bulk-write features and misses. Each row holds the values of
+        AUDIO_FEATURE_COLUMNS followed by the track_id.
+        """
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
+
+            cursor.executemany("""
+                INSERT OR REPLACE INTO track_audio_features (
+                    track_key,
+                    danceability,
+                    energy,
+                    valence,
+                    tempo,
+                    acousticness,
+                    instrumentalness,
+                    liveness,
+                    speechiness
+                )
+                SELECT t.track_key, ?, ?, ?, ?, ?, ?, ?, ?
+                FROM tracks t
+                WHERE t.track_id = ?
+            """, rows)
+
+            cursor.execute("""
+                DELETE FROM track_audio_features_misses
+                WHERE track_key IN (
+                    SELECT track_key FROM tracks
+                    WHERE track_id IN (SELECT value FROM json_each(?))
+                )
+            """, (id_set(r[-1] for r in rows),))
+
+            cursor.execute("""
+                INSERT OR REPLACE INTO track_audio_features_misses (track_key, checked_at)
+                SELECT t.track_key, ?
+                FROM tracks t
+                WHERE t.track_id IN (SELECT value FROM json_each(?))
+            """, (now_ms(), id_set(misses)))
+
+            self.commit()
+
+    # =====================================================
+    # CATALOG (Fuzzy resolution)
+    # =====================================================
+
+    @cached_read
+    def resolve_fuzzy(
+        self,
+        query: str,
+        kinds: tuple[str, ...] = ("track", "artist", "album"),
+        limit: int = 5,
+        min_score: float = 0.6,
+        candidates: int = 50,
+        doc_budget: int = 5000
+    ) -> list[dict]:
+        """
+        Ranked fuzzy lookup over track, artist and album names.
+
+        Candidates come from catalog_fts in two passes: a substring
+        match on the whole query, then (if that is short of results) an
+        OR over the query's most selective trigrams, capped at
+        doc_budget matching rows so common trigrams cannot blow up the
+        bm25 ranking. Candidates are re-scored by string similarity, so
+        typos, missing accents and partial titles still resolve.
+        """
+        normalized = normalize_name(query or "")
+
+        if len(normalized) < 3:
+            return []
+
+        kind_placeholders = ",".join(["?"] * len(kinds))
 
-        tracks = {}
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
 
-        for track_id, track_name, artist_name in rows:
+            rows = self._catalog_candidates(
+                cursor,
+                _fts_phrase(normalized),
+                kinds,
+                kind_placeholders,
+                candidates
+            )
+
+            if len(rows) < limit:
+                trigram_query = self._selective_trigram_query(
+                    cursor,
+                    normalized,
+                    doc_budget
+                )
+
+                if trigram_query:
+                    rows += self._catalog_candidates(
+                        cursor,
+                        trigram_query,
+                        kinds,
+                        kind_placeholders,
+                        candidates
+                    )
+
+        results = {}
+
+        for name, kind, entity_id, label in rows:
 
-            if track_id not in tracks:
-                tracks[track_id] = {
-                    "track_id": track_id,
-                    "name": track_name,
-                    "artists": []
+            score = SequenceMatcher(None, normalized, name).ratio()
+
+            # Partial titles: the query appears verbatim in the name
+            if normalized in name:
+                score = max(score, 0.9)
+
+            if score >= min_score:
+                results[(kind, entity_id)] = {
+                    "kind": kind,
+                    "entity_id": entity_id,
+                    "name": label,
+                    "score": score
                 }
 
-            tracks[track_id]["artists"].append(artist_name)
+        ranked = sorted(results.values(), key=lambda r: r["score"], reverse=True)
+
+        return ranked[:limit]
+
+    def _catalog_candidates(self, cursor, match, kinds, kind_placeholders, candidates):
+        cursor.execute(f"""
+            SELECT name, kind, entity_id, label
+            FROM catalog_fts
+            WHERE catalog_fts MATCH ?
+              AND kind IN ({kind_placeholders})
+            ORDER BY rank
+            LIMIT ?;
+        """, (match, *kinds, candidates))
+        return cursor.fetchall()
+
+    def _selective_trigram_query(self, cursor, normalized, doc_budget):
+        trigrams = list({normalized[i:i + 3] for i in range(len(normalized) - 2)})
+        placeholders = ",".join(["?"] * len(trigrams))
+
+        cursor.execute(f"""
+            SELECT term, doc
+            FROM catalog_vocab
+            WHERE term IN ({placeholders})
+            ORDER BY doc ASC;
+        """, trigrams)
+
+        selected = []
+        total_docs = 0
+
+        for term, doc in cursor.fetchall():
+            if selected and total_docs + doc > doc_budget:
+                break
+
+            selected.append(_fts_phrase(term))
+            total_docs += doc
+
+        return " OR ".join(selected)
 
-        return list(tracks.values())
-    
     # =====================================================
     # BEHAVIOR (Play History)
     # =====================================================
@@ -194,180 +709,498 @@ class Repository:
         source: str,
         weight: float = 1.0
     ):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO play_history (
+        played_at = to_epoch_ms(played_at)
+
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR IGNORE INTO play_history (
+                    track_key,
+                    played_at,
+                    context_type,
+                    context_id,
+                    source,
+                    weight
+                )
+                SELECT track_key, ?2, ?3, ?4, ?5, ?6
+                FROM tracks
+                WHERE track_id = ?1
+            """, (
                 track_id,
                 played_at,
                 context_type,
                 context_id,
                 source,
                 weight
+            ))
+
+            # Already recorded: nothing new to score
+            if cursor.rowcount:
+                self._apply_recency(cursor, [(track_id, played_at, weight)])
+
+            self.commit()
+
+    def insert_play_events(self, events: Iterable[tuple]) -> int:
+        """
+        Bulk insert play events in one transaction.
+        Each event is (track_id, played_at, context_type, context_id, source, weight);
+        played_at is an ISO-8601 string or epoch ms.
+        Events for tracks outside the library are skipped, and so are
+        plays already stored (same track and played_at). Returns the
+        number of events inserted.
+        """
+        events = [
+            (track_id, to_epoch_ms(played_at), *rest)
+            for track_id, played_at, *rest in events
+        ]
+
+        if not events:
+            return 0
+
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT t.track_id, ph.played_at
+                FROM tracks t
+                JOIN play_history ph ON ph.track_key = t.track_key
+                WHERE t.track_id IN (SELECT value FROM json_each(?))
+                  AND ph.played_at BETWEEN ? AND ?
+            """, (
+                id_set({e[0] for e in events}),
+                min(e[1] for e in events),
+                max(e[1] for e in events)
+            ))
+
+            seen = set(cursor.fetchall())
+            new_events = []
+
+            for event in events:
+                if (event[0], event[1]) not in seen:
+                    seen.add((event[0], event[1]))
+                    new_events.append(event)
+
+            cursor.executemany("""
+                INSERT INTO play_history (
+                    track_key,
+                    played_at,
+                    context_type,
+                    context_id,
+                    source,
+                    weight
+                )
+                SELECT track_key, ?2, ?3, ?4, ?5, ?6
+                FROM tracks
+                WHERE track_id = ?1
+            """, new_events)
+
+            inserted = max(cursor.rowcount, 0)
+
+            self._apply_recency(
+                cursor,
+                [(e[0], e[1], e[5]) for e in new_events]
             )
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            track_id,
-            played_at,
-            context_type,
-            context_id,
-            source,
-            weight
-        ))
-        self.commit()
+
+        return inserted
+
+    def rollup_play_history(self, before) -> int:
+        """
+        Fold raw play events older than `before` (ISO date or epoch ms)
+        into play_history_daily and delete them. Returns the number of
+        events folded. Materialized recency already counts them, so it
+        is left untouched.
+        """
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                INSERT INTO play_history_daily (track_key, day, plays, weight)
+                SELECT track_key, played_at - played_at % ?2, COUNT(*), TOTAL(weight)
+                FROM play_history
+                WHERE played_at < ?1
+                GROUP BY 1, 2
+                ON CONFLICT(track_key, day) DO UPDATE SET
+                    plays = plays + excluded.plays,
+                    weight = weight + excluded.weight;
+            """, (to_epoch_ms(before), MS_PER_DAY))
+
+            cursor.execute(
+                "DELETE FROM play_history WHERE played_at < ?;",
+                (to_epoch_ms(before),)
+            )
+
+            return cursor.rowcount
+
+    def get_track_durations_by_artist(self) -> list[tuple]:
+        """
+        (track_key, duration_ms) for every track, grouped by primary
+        artist so neighbouring rows tend to share an artist.
+        """
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.track_key, t.duration_ms
+                FROM tracks t
+                LEFT JOIN (
+                    SELECT track_key, MIN(artist_key) AS artist_key
+                    FROM track_artists
+                    GROUP BY track_key
+                ) ta ON ta.track_key = t.track_key
+                ORDER BY ta.artist_key, t.track_key
+            """)
+            return cursor.fetchall()
+
+    def bulk_insert_plays(self, track_keys, played_at, source: str, weight: float = 1.0) -> int:
+        """
+        Load plays straight into play_history in one transaction,
+        skipping (track_key, played_at) pairs already stored. Track keys
+        are not checked and recency is not updated; call
+        rebuild_recency() once loading is done. Returns rows inserted.
+        """
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT OR IGNORE INTO play_history (track_key, played_at, source, weight)
+                VALUES (?, ?, ?, ?)
+            """, (
+                (track_key, played, source, weight)
+                for track_key, played in zip(track_keys, played_at)
+            ))
+
+            return max(cursor.rowcount, 0)
+
+    def rebuild_recency(self):
+        with self.transaction() as conn:
+            rebuild_recency(conn)
+
+    def incremental_vacuum(self, pages: int = 0):
+        """
+        Release free pages back to the filesystem (all of them when
+        pages is 0). Requires auto_vacuum = INCREMENTAL. Must not be
+        called inside a transaction.
+        """
+        with self._session.writer() as conn:
+            # The pragma frees one page per step and Connection.execute
+            # steps once; executescript runs it to completion.
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+
+    # Rebase the recency reference once stored scores reach e^REBASE.
+    RECENCY_REBASE_EXPONENT = 300
+
+    def _apply_recency(self, cursor, plays: list[tuple]):
+        """
+        Fold new plays into track_recency and artist_recency.
+        Each play is (track_id, played_at epoch ms, weight).
+        """
+        self._maybe_rebase_recency(cursor)
+
+        params = [(weight, played_at, track_id) for track_id, played_at, weight in plays]
+
+        cursor.executemany("""
+            INSERT INTO track_recency (track_key, score, plays)
+            SELECT t.track_key, ?1 * EXP((?2 - rs.ref_ms) / (rs.decay_days * 86400000.0)), 1
+            FROM tracks t
+            JOIN recency_state rs ON rs.id = 1
+            WHERE t.track_id = ?3
+            ON CONFLICT(track_key) DO UPDATE SET
+                score = score + excluded.score,
+                plays = plays + excluded.plays;
+        """, params)
+
+        cursor.executemany("""
+            INSERT INTO artist_recency (artist_key, score, plays)
+            SELECT ta.artist_key, ?1 * EXP((?2 - rs.ref_ms) / (rs.decay_days * 86400000.0)), 1
+            FROM tracks t
+            JOIN track_artists ta ON ta.track_key = t.track_key
+            JOIN recency_state rs ON rs.id = 1
+            WHERE t.track_id = ?3
+            ON CONFLICT(artist_key) DO UPDATE SET
+                score = score + excluded.score,
+                plays = plays + excluded.plays;
+        """, params)
+
+    def _maybe_rebase_recency(self, cursor):
+        cursor.execute("""
+            SELECT ref_ms, decay_days
+            FROM recency_state
+            WHERE id = 1;
+        """)
+        row = cursor.fetchone()
+
+        if not row:
+            return
+
+        now = now_ms()
+
+        exponent = (now - row[0]) / (row[1] * MS_PER_DAY)
+
+        if exponent < self.RECENCY_REBASE_EXPONENT:
+            return
+
+        factor = math.exp(-exponent)
+
+        cursor.execute("UPDATE track_recency SET score = score * ?;", (factor,))
+        cursor.execute("UPDATE artist_recency SET score = score * ?;", (factor,))
+        cursor.execute("""
+            UPDATE recency_state
+            SET ref_ms = ?
+            WHERE id = 1;
+        """, (now,))
+
+    def _materialized_recency(self, cursor, decay_days: float):
+        """
+        Factor turning stored materialized scores into current scores,
+        or None when the tables were built for a different decay.
+        """
+        cursor.execute("""
+            SELECT decay_days, ref_ms
+            FROM recency_state
+            WHERE id = 1;
+        """)
+        row = cursor.fetchone()
+
+        if not row or row[0] != decay_days:
+            return None
+
+        return math.exp((row[1] - now_ms()) / (decay_days * MS_PER_DAY))
 
     def get_recency_scores(self, limit: int, decay_days: float):
-        cursor = self.conn.cursor()
-        cursor.execute(f"""
-            SELECT
-                ph.track_id,
-                SUM(
-                    ph.weight *
-                    EXP(
-                        - (julianday('now') - julianday(ph.played_at)) / {decay_days}
-                    )
-                ) as score
-            FROM play_history ph
-            GROUP BY ph.track_id
-            ORDER BY score DESC
-            LIMIT ?;
-        """, (limit,))
-        return cursor.fetchall()
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            scale = self._materialized_recency(cursor, decay_days)
+
+            if scale is not None:
+                cursor.execute("""
+                    SELECT
+                        t.track_id,
+                        tr.score * ? as score
+                    FROM track_recency tr
+                    JOIN tracks t ON t.track_key = tr.track_key
+                    ORDER BY tr.score DESC
+                    LIMIT ?;
+                """, (scale, limit))
+                return cursor.fetchall()
+
+            cursor.execute(f"""
+                SELECT
+                    t.track_id,
+                    SUM(
+                        ph.weight *
+                        EXP(
+                            - (? - ph.played_ms) / ({decay_days} * 86400000.0)
+                        )
+                    ) as score
+                FROM play_events ph
+                JOIN tracks t ON t.track_key = ph.track_key
+                GROUP BY ph.track_key
+                ORDER BY score DESC
+                LIMIT ?;
+            """, (now_ms(), limit))
+            return cursor.fetchall()
 
     def get_album_recency_scores(self, album_name: str, limit: int, decay_days: float):
-        cursor = self.conn.cursor()
-        cursor.execute(f"""
-            SELECT
-                ph.track_id,
-                SUM(
-                    ph.weight *
-                    EXP(
-                        - (julianday('now') - julianday(ph.played_at)) / {decay_days}
-                    )
-                ) as score
-            FROM play_history ph
-            JOIN track_albums ta ON ta.track_id = ph.track_id
-            JOIN albums a ON a.album_id = ta.album_id
-            WHERE a.name = ?
-            GROUP BY ph.track_id
-            ORDER BY score DESC
-            LIMIT ?;
-        """, (album_name, limit))
-        return cursor.fetchall()
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            scale = self._materialized_recency(cursor, decay_days)
+
+            if scale is not None:
+                cursor.execute("""
+                    SELECT
+                        t.track_id,
+                        tr.score * ? as score
+                    FROM track_recency tr
+                    JOIN tracks t ON t.track_key = tr.track_key
+                    JOIN track_albums ta ON ta.track_key = tr.track_key
+                    JOIN albums a ON a.album_key = ta.album_key
+                    WHERE a.name = ?
+                    ORDER BY tr.score DESC
+                    LIMIT ?;
+                """, (scale, album_name, limit))
+                return cursor.fetchall()
+
+            cursor.execute(f"""
+                SELECT
+                    t.track_id,
+                    SUM(
+                        ph.weight *
+                        EXP(
+                            - (? - ph.played_ms) / ({decay_days} * 86400000.0)
+                        )
+                    ) as score
+                FROM play_events ph
+                JOIN tracks t ON t.track_key = ph.track_key
+                JOIN track_albums ta ON ta.track_key = ph.track_key
+                JOIN albums a ON a.album_key = ta.album_key
+                WHERE a.name = ?
+                GROUP BY ph.track_key
+                ORDER BY score DESC
+                LIMIT ?;
+            """, (now_ms(), album_name, limit))
+            return cursor.fetchall()
 
     def get_artist_recency_scores(self, limit: int, decay_days: float):
-        cursor = self.conn.cursor()
-        cursor.execute(f"""
-            SELECT
-                a.artist_id,
-                SUM(
-                    ph.weight *
-                    EXP(
-                        - (julianday('now') - julianday(ph.played_at)) / {decay_days}
-                    )
-                ) as score
-            FROM play_history ph
-            JOIN track_artists ta ON ta.track_id = ph.track_id
-            JOIN artists a ON a.artist_id = ta.artist_id
-            GROUP BY a.artist_id
-            ORDER BY score DESC
-            LIMIT ?;
-        """, (limit,))
-        return cursor.fetchall()
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            scale = self._materialized_recency(cursor, decay_days)
+
+            if scale is not None:
+                cursor.execute("""
+                    SELECT
+                        a.artist_id,
+                        ar.score * ? as score
+                    FROM artist_recency ar
+                    JOIN artists a ON a.artist_key = ar.artist_key
+                    ORDER BY ar.score DESC
+                    LIMIT ?;
+                """, (scale, limit))
+                return cursor.fetchall()
+
+            cursor.execute(f"""
+                SELECT
+                    a.artist_id,
+                    SUM(
+                        ph.weight *
+                        EXP(
+                            - (? - ph.played_ms) / ({decay_days} * 86400000.0)
+                        )
+                    ) as score
+                FROM play_events ph
+                JOIN track_artists ta ON ta.track_key = ph.track_key
+                JOIN artists a ON a.artist_key = ta.artist_key
+                GROUP BY a.artist_key
+                ORDER BY score DESC
+                LIMIT ?;
+            """, (now_ms(), limit))
+            return cursor.fetchall()
     
+    @cached_read
     def get_album_most_played(self, album_name: str) -> list[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT
-                ph.track_id,
-                COUNT(*) as play_count
-            FROM play_history ph
-            JOIN track_albums ta ON ta.track_id = ph.track_id
-            JOIN albums a ON a.album_id = ta.album_id
-            WHERE a.name = ?
-            GROUP BY ph.track_id
-            ORDER BY play_count DESC
-        """, (album_name,))
-        return [r[0] for r in cursor.fetchall()]
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT
+                    t.track_id,
+                    SUM(ph.plays) as play_count
+                FROM play_events ph
+                JOIN tracks t ON t.track_key = ph.track_key
+                JOIN track_albums ta ON ta.track_key = ph.track_key
+                JOIN albums a ON a.album_key = ta.album_key
+                WHERE a.name = ?
+                GROUP BY ph.track_key
+                ORDER BY play_count DESC
+            """, (album_name,))
+            return [r[0] for r in cursor.fetchall()]
 
     def get_play_history_aggregated(self, decay_days: float):
-        cursor = self.conn.cursor()
-        cursor.execute(f"""
-            SELECT
-                ph.track_id,
-                SUM(
-                    ph.weight *
-                    EXP(
-                        - (julianday('now') - julianday(ph.played_at)) / {decay_days}
-                    )
-                ) as recency_score,
-                COUNT(*) as total_plays
-            FROM play_history ph
-            GROUP BY ph.track_id
-        """)
-        return cursor.fetchall()
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            scale = self._materialized_recency(cursor, decay_days)
+
+            if scale is not None:
+                cursor.execute("""
+                    SELECT
+                        t.track_id,
+                        tr.score * ? as recency_score,
+                        tr.plays as total_plays
+                    FROM track_recency tr
+                    JOIN tracks t ON t.track_key = tr.track_key
+                """, (scale,))
+                return cursor.fetchall()
 
+            cursor.execute(f"""
+                SELECT
+                    t.track_id,
+                    SUM(
+                        ph.weight *
+                        EXP(
+                            - (? - ph.played_ms) / ({decay_days} * 86400000.0)
+                        )
+                    ) as recency_score,
+                    SUM(ph.plays) as total_plays
+                FROM play_events ph
+                JOIN tracks t ON t.track_key = ph.track_key
+                GROUP BY ph.track_key
+            """, (now_ms(),))
+            return cursor.fetchall()
+
+    @cached_read
     def get_track_popularity(self, track_id: str) -> int:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT popularity
-            FROM tracks
-            WHERE track_id = ?
-        """, (track_id,))
-        row = cursor.fetchone()
-        return row[0] if row and row[0] is not None else 0
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT popularity
+                FROM tracks
+                WHERE track_id = ?
+            """, (track_id,))
+            row = cursor.fetchone()
+            return row[0] if row and row[0] is not None else 0
     
+    @cached_read
     def get_most_played_track(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT ph.track_id, COUNT(*) as play_count
-            FROM play_history ph
-            GROUP BY ph.track_id
-            ORDER BY play_count DESC
-            LIMIT 1
-        """)
-        return cursor.fetchone()
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.track_id, SUM(ph.plays) as play_count
+                FROM play_events ph
+                JOIN tracks t ON t.track_key = ph.track_key
+                GROUP BY ph.track_key
+                ORDER BY play_count DESC
+                LIMIT 1
+            """)
+            return cursor.fetchone()
     
+    @cached_read
     def get_recently_played_track_names(self, limit: int = 5):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT t.name
-            FROM play_history ph
-            JOIN tracks t ON ph.track_id = t.track_id
-            ORDER BY ph.played_at DESC
-            LIMIT ?
-        """, (limit,))
-        return [r[0] for r in cursor.fetchall()]
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.name
+                FROM play_history ph
+                JOIN tracks t ON ph.track_key = t.track_key
+                ORDER BY ph.played_at DESC
+                LIMIT ?
+            """, (limit,))
+            return [r[0] for r in cursor.fetchall()]
     
     # =====================================================
     # METRICS
     # =====================================================
 
+    @cached_read
     def get_engagement_score(self, track_id: str) -> float:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT engagement_score
-            FROM track_metrics
-            WHERE track_id = ?
-        """, (track_id,))
-        row = cursor.fetchone()
-        return row[0] if row else 0.0
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT tm.engagement_score
+                FROM track_metrics tm
+                JOIN tracks t ON t.track_key = tm.track_key
+                WHERE t.track_id = ?
+            """, (track_id,))
+            row = cursor.fetchone()
+            return row[0] if row else 0.0
 
+    @cached_read
     def get_engagement_scores_for_tracks(self, track_ids: list[str]):
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.get_engagement_scores_for_tracks(track_ids)
+
         if not track_ids:
             return []
 
-        cursor = self.conn.cursor()
-        placeholders = ",".join(["?"] * len(track_ids))
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
 
-        query = f"""
-            SELECT track_id, engagement_score
-            FROM track_metrics
-            WHERE track_id IN ({placeholders})
-            ORDER BY engagement_score DESC;
-        """
+            query = """
+                SELECT t.track_id, tm.engagement_score
+                FROM track_metrics tm
+                JOIN tracks t ON t.track_key = tm.track_key
+                WHERE t.track_id IN (SELECT value FROM json_each(?))
+                ORDER BY tm.engagement_score DESC;
+            """
 
-        cursor.execute(query, track_ids)
-        return cursor.fetchall()
+            cursor.execute(query, (id_set(track_ids),))
+            return cursor.fetchall()
 
     def upsert_track_metrics(
         self,
@@ -376,44 +1209,96 @@ class Repository:
         popularity: int,
         engagement_score: float
     ):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO track_metrics (
+        self.invalidate_snapshot()
+
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO track_metrics (
+                    track_key,
+                    playlist_count,
+                    added_recency_score,
+                    popularity,
+                    engagement_score,
+                    updated_at
+                )
+                SELECT track_key, ?2, ?3, ?4, ?5, ?6
+                FROM tracks
+                WHERE track_id = ?1
+                ON CONFLICT(track_key) DO UPDATE SET
+                    added_recency_score = excluded.added_recency_score,
+                    popularity = excluded.popularity,
+                    engagement_score = excluded.engagement_score,
+                    updated_at = excluded.updated_at
+            """, (
                 track_id,
-                playlist_count,
-                added_recency_score,
+                0,
+                recency_score,
                 popularity,
                 engagement_score,
-                updated_at
-            )
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(track_id) DO UPDATE SET
-                added_recency_score = excluded.added_recency_score,
-                popularity = excluded.popularity,
-                engagement_score = excluded.engagement_score,
-                updated_at = excluded.updated_at
-        """, (
-            track_id,
-            0,
-            recency_score,
-            popularity,
-            engagement_score,
-            datetime.utcnow().isoformat()
-        ))
+                datetime.utcnow().isoformat()
+            ))
+
+    def upsert_track_metrics_many(self, rows: Iterable[tuple]) -> int:
+        """
+        Bulk version of upsert_track_metrics.
+        Each row is (track_id, recency_score, popularity, engagement_score).
+        """
+        now = datetime.utcnow().isoformat()
+
+        params = [
+            (track_id, 0, recency_score, popularity, engagement_score, now)
+            for track_id, recency_score, popularity, engagement_score in rows
+        ]
+
+        if not params:
+            return 0
+
+        self.invalidate_snapshot()
+
+        with self.transaction() as conn:
+            conn.executemany("""
+                INSERT INTO track_metrics (
+                    track_key,
+                    playlist_count,
+                    added_recency_score,
+                    popularity,
+                    engagement_score,
+                    updated_at
+                )
+                SELECT track_key, ?2, ?3, ?4, ?5, ?6
+                FROM tracks
+                WHERE track_id = ?1
+                ON CONFLICT(track_key) DO UPDATE SET
+                    added_recency_score = excluded.added_recency_score,
+                    popularity = excluded.popularity,
+                    engagement_score = excluded.engagement_score,
+                    updated_at = excluded.updated_at
+            """, params)
+
+        return len(params)
 
     # =====================================================
     # PLAYLISTS
     # =====================================================
 
+    @cached_read
     def get_playlist_tracks(self, playlist_id: str) -> list[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT track_id
-            FROM playlist_tracks
-            WHERE playlist_id = ?
-            ORDER BY position ASC
-        """, (playlist_id,))
-        return [r[0] for r in cursor.fetchall()]
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.get_playlist_tracks(playlist_id)
+
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.track_id
+                FROM playlist_tracks pt
+                JOIN playlists p ON p.playlist_key = pt.playlist_key
+                JOIN tracks t ON t.track_key = pt.track_key
+                WHERE p.playlist_id = ?
+                ORDER BY pt.position ASC
+            """, (playlist_id,))
+            return [r[0] for r in cursor.fetchall()]
 
     def add_track_to_playlist(
         self,
@@ -421,172 +1306,308 @@ class Repository:
         track_id: str,
         position: int
     ):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO playlist_tracks (playlist_id, track_id, position)
-            VALUES (?, ?, ?)
-        """, (playlist_id, track_id, position))
-        self.commit()
+        self.invalidate_snapshot()
+
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO playlist_tracks (playlist_key, track_key, position)
+                SELECT p.playlist_key, t.track_key, ?3
+                FROM playlists p, tracks t
+                WHERE p.playlist_id = ?1 AND t.track_id = ?2
+            """, (playlist_id, track_id, position))
+            self.commit()
 
+    @cached_read
     def get_all_playlists(self) -> list[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT name
-            FROM playlists
-            ORDER BY name ASC
-        """)
-        return [r[0] for r in cursor.fetchall()]
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.get_all_playlists()
+
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT name
+                FROM playlists
+                ORDER BY name ASC
+            """)
+            return [r[0] for r in cursor.fetchall()]
 
+    @cached_read
     def get_all_playlist_ids(self) -> list[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT playlist_id
-            FROM playlists
-        """)
-        return [r[0] for r in cursor.fetchall()]
-    
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.get_all_playlist_ids()
+
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT playlist_id
+                FROM playlists
+            """)
+            return [r[0] for r in cursor.fetchall()]
+
+    def get_playlist_snapshot_ids(self) -> dict:
+        """
+        {playlist_id: snapshot_id} of every stored playlist.
+        """
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT playlist_id, snapshot_id
+                FROM playlists
+            """)
+            return dict(cursor.fetchall())
+
+    @cached_read
     def count_playlists(self) -> int:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM playlists
-        """)
-        return cursor.fetchone()[0]
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.count_playlists()
 
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*)
+                FROM playlists
+            """)
+            return cursor.fetchone()[0]
+
+    @cached_read
     def count_artist_tracks_in_playlists(self, artist_name: str) -> int:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(DISTINCT pt.track_id)
-            FROM playlist_tracks pt
-            JOIN track_artists ta ON pt.track_id = ta.track_id
-            JOIN artists a ON ta.artist_id = a.artist_id
-            WHERE LOWER(a.name) = LOWER(?)
-        """, (artist_name,))
-        return cursor.fetchone()[0]
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.count_artist_tracks_in_playlists(artist_name)
+
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(DISTINCT pt.track_key)
+                FROM playlist_tracks pt
+                JOIN track_artists ta ON pt.track_key = ta.track_key
+                JOIN artists a ON ta.artist_key = a.artist_key
+                WHERE a.name_norm = ?
+            """, (normalize_name(artist_name),))
+            return cursor.fetchone()[0]
     
     def delete_playlist(self, playlist_id: str):
-        cursor = self.conn.cursor()
+        self.invalidate_snapshot()
 
-        # Remove tracks linked to playlist
-        cursor.execute(
-            "DELETE FROM playlist_tracks WHERE playlist_id = ?",
-            (playlist_id,)
-        )
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
 
-        # Remove playlist itself
-        cursor.execute(
-            "DELETE FROM playlists WHERE playlist_id = ?",
-            (playlist_id,)
-        )
+            # Remove tracks linked to playlist
+            cursor.execute("""
+                DELETE FROM playlist_tracks
+                WHERE playlist_key = (
+                    SELECT playlist_key FROM playlists WHERE playlist_id = ?
+                )
+            """, (playlist_id,))
 
-        self.commit()
+            # Remove playlist itself
+            cursor.execute(
+                "DELETE FROM playlists WHERE playlist_id = ?",
+                (playlist_id,)
+            )
+
+            self.commit()
         
     # =====================================================
     # SEMANTIC (Emotional Anchors)
     # =====================================================
 
+    @cached_read
     def get_anchor_by_name(self, name: str):
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT anchor_id, name, created_at, updated_at
+                FROM emotional_anchors
+                WHERE name_norm = ?
+                LIMIT 1;
+            """, (normalize_name(name),))
 
-        cursor = self.conn.cursor()
-
-        cursor.execute("""
-            SELECT anchor_id, name, created_at, updated_at
-            FROM emotional_anchors
-        """)
-
-        rows = cursor.fetchall()
+            row = cursor.fetchone()
 
-        for row in rows:
-            if row[1].lower() == name.lower():
-                return {
-                    "anchor_id": row[0],
-                    "name": row[1],
-                    "created_at": row[2],
-                    "updated_at": row[3]
-                }
+            if not row:
+                return None
 
-        return None
+            return {
+                "anchor_id": row[0],
+                "name": row[1],
+                "created_at": row[2],
+                "updated_at": row[3]
+            }
 
     def create_anchor(self, anchor_id: str, name: str, created_at: str, updated_at: str):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO emotional_anchors (anchor_id, name, created_at, updated_at)
-            VALUES (?, ?, ?, ?);
-        """, (anchor_id, name, created_at, updated_at))
-        self.commit()
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO emotional_anchors (anchor_id, name, name_norm, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?);
+            """, (anchor_id, name, normalize_name(name), created_at, updated_at))
+            self.commit()
 
     def delete_anchor(self, anchor_id: str):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            DELETE FROM emotional_anchors
-            WHERE anchor_id = ?;
-        """, (anchor_id,))
-        self.commit()
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM emotional_anchors
+                WHERE anchor_id = ?;
+            """, (anchor_id,))
+            self.commit()
 
     def add_track_to_anchor(self, anchor_id: str, track_id: str):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO emotional_anchor_tracks (anchor_id, track_id)
-            VALUES (?, ?);
-        """, (anchor_id, track_id))
-        self.commit()
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO emotional_anchor_tracks (anchor_id, track_key)
+                SELECT ?1, track_key
+                FROM tracks
+                WHERE track_id = ?2;
+            """, (anchor_id, track_id))
+            self.commit()
+
+    def add_tracks_to_anchor(self, anchor_id: str, track_ids: list[str]) -> int:
+        if not track_ids:
+            return 0
 
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            # Tracks already on the anchor are skipped, not counted
+            cursor.execute("""
+                INSERT OR IGNORE INTO emotional_anchor_tracks (anchor_id, track_key)
+                SELECT ?1, t.track_key
+                FROM json_each(?2) ids
+                JOIN tracks t ON t.track_id = ids.value;
+            """, (anchor_id, id_set(track_ids)))
+
+            return cursor.rowcount
+
+    @cached_read
     def get_anchor_tracks(self, anchor_id: str) -> list[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT track_id
-            FROM emotional_anchor_tracks
-            WHERE anchor_id = ?;
-        """, (anchor_id,))
-        return [r[0] for r in cursor.fetchall()]
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.track_id
+                FROM emotional_anchor_tracks eat
+                JOIN tracks t ON t.track_key = eat.track_key
+                WHERE eat.anchor_id = ?;
+            """, (anchor_id,))
+            return [r[0] for r in cursor.fetchall()]
 
+    @cached_read
     def get_anchor_name(self, anchor_id: str) -> str | None:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT name
-            FROM emotional_anchors
-            WHERE anchor_id = ?;
-        """, (anchor_id,))
-        row = cursor.fetchone()
-        return row[0] if row else None
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT name
+                FROM emotional_anchors
+                WHERE anchor_id = ?;
+            """, (anchor_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
     
+    @cached_read
     def get_all_anchors(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT anchor_id, name
-            FROM emotional_anchors;
-        """)
-        rows = cursor.fetchall()
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT anchor_id, name
+                FROM emotional_anchors;
+            """)
+            rows = cursor.fetchall()
         
-        return [
-            {
-                "anchor_id": row[0],
-                "name": row[1]
-            }
-            for row in rows
-        ]
+            return [
+                {
+                    "anchor_id": row[0],
+                    "name": row[1]
+                }
+                for row in rows
+            ]
     
 # =====================================================
 # SYSTEM STATE
 # =====================================================
 
+    @cached_read
     def get_last_sync(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT last_sync_at
-            FROM system_state
-            WHERE id = 1;
-        """)
-        row = cursor.fetchone()
-        return row[0] if row else None
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT last_sync_at
+                FROM system_state
+                WHERE id = 1;
+            """)
+            row = cursor.fetchone()
+            return row[0] if row else None
 
 
     def set_last_sync(self, timestamp: str):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO system_state (id, last_sync_at)
-            VALUES (1, ?)
-            ON CONFLICT(id) DO UPDATE SET
-                last_sync_at = excluded.last_sync_at;
-        """, (timestamp,))
-        self.commit()
\ No newline at end of file
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO system_state (id, last_sync_at)
+                VALUES (1, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    last_sync_at = excluded.last_sync_at;
+            """, (timestamp,))
+            self.commit()
+
+    def get_recently_played_after(self) -> int | None:
+        """
+        Epoch ms of the newest recently-played item already ingested.
+        """
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT recently_played_after
+                FROM system_state
+                WHERE id = 1;
+            """)
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def set_recently_played_after(self, after: int):
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO system_state (id, recently_played_after)
+                VALUES (1, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    recently_played_after = excluded.recently_played_after;
+            """, (after,))
+            self.commit()
+
+    def get_import_checkpoint(self):
+        """
+        (next offset, remote total when recorded) of an unfinished
+        first-time import, or None.
+        """
+        with self._session.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT import_offset, import_total
+                FROM system_state
+                WHERE id = 1 AND import_offset IS NOT NULL;
+            """)
+            return cursor.fetchone()
+
+    def set_import_checkpoint(self, offset: int | None, total: int | None = None):
+        """
+        Record import progress; None clears it (import finished).
+        """
+        with self._session.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO system_state (id, import_offset, import_total)
+                VALUES (1, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    import_offset = excluded.import_offset,
+                    import_total = excluded.import_total;
+            """, (offset, total))
+            self.commit()
+
+
+def _fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
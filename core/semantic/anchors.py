@@ -28,24 +28,25 @@ def convert_playlist_to_anchor(repo, playlist_id: str, playlist_name: str):
     if not track_ids:
         return None
 
-    # Remove existing anchor with the same name
-    existing = repo.get_anchor_by_name(anchor_name)
-    if existing:
-        repo.delete_anchor(existing["anchor_id"])
-
-    # Create new anchor
-    anchor_id = str(uuid.uuid4())
-    now = datetime.utcnow().isoformat()
-
-    repo.create_anchor(
-        anchor_id=anchor_id,
-        name=anchor_name,
-        created_at=now,
-        updated_at=now
-    )
-
-    # Associate tracks with anchor
-    for track_id in track_ids:
-        repo.add_track_to_anchor(anchor_id, track_id)
+    with repo.transaction():
+
+        # Remove existing anchor with the same name
+        existing = repo.get_anchor_by_name(anchor_name)
+        if existing:
+            repo.delete_anchor(existing["anchor_id"])
+
+        # Create new anchor
+        anchor_id = str(uuid.uuid4())
+        now = datetime.utcnow().isoformat()
+
+        repo.create_anchor(
+            anchor_id=anchor_id,
+            name=anchor_name,
+            created_at=now,
+            updated_at=now
+        )
+
+        # Associate tracks with anchor
+        repo.add_tracks_to_anchor(anchor_id, track_ids)
 
     return anchor_id
\ No newline at end of file
@@ -79,6 +79,11 @@ class PineconeIndexer:
             filter=filter
         )
 
+    def delete_by_ids(self, ids: List[str], batch_size: int = 1000) -> None:
+
+        for i in range(0, len(ids), batch_size):
+            self.index.delete(ids=ids[i:i + batch_size])
+
     def fetch_by_ids(self, ids: List[str]) -> Dict[str, Any]:
 
         if not ids:
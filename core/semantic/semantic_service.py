@@ -27,15 +27,11 @@ class SemanticService:
 
     def index_all_tracks(self, batch_size: int = 100) -> int:
 
-        tracks = self.repo.get_all_tracks_with_artists()
-
-        if not tracks:
-            return 0
-
         total_indexed = 0
 
-        for i in range(0, len(tracks), batch_size):
-            batch = tracks[i:i + batch_size]
+        # Streamed in batch_size chunks so a full reindex never holds
+        # the whole library in memory
+        for batch in self.repo.iter_tracks_with_artists(chunk_size=batch_size):
 
             texts = []
             vector_payload = []
@@ -111,6 +107,17 @@ class SemanticService:
 
         return total_indexed
 
+    def remove_tracks(self, track_ids: List[str]) -> int:
+
+        if not track_ids:
+            return 0
+
+        self.pinecone_indexer.delete_by_ids(
+            [f"track_{track_id}" for track_id in track_ids]
+        )
+
+        return len(track_ids)
+
     def recalculate_anchor(self, anchor_id: str) -> bool:
 
         track_ids = self.repo.get_anchor_tracks(anchor_id)
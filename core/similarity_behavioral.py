@@ -47,15 +47,17 @@ def _co_occurrence_score(conn, track_id: str) -> List[Tuple[str, float]]:
     cursor = conn.cursor()
 
     cursor.execute("""
-        SELECT ph2.track_id, COUNT(*) as score
-        FROM play_history ph1
+        SELECT t2.track_id, COUNT(*) as score
+        FROM tracks t1
+        JOIN play_history ph1 ON ph1.track_key = t1.track_key
         JOIN play_history ph2
-            ON ABS(strftime('%s', ph1.played_at) - strftime('%s', ph2.played_at)) <= 3600
-        WHERE ph1.track_id = ?
-          AND ph2.track_id != ?
-        GROUP BY ph2.track_id
+            ON ph2.played_at BETWEEN ph1.played_at - 3600000 AND ph1.played_at + 3600000
+        JOIN tracks t2 ON t2.track_key = ph2.track_key
+        WHERE t1.track_id = ?
+          AND ph2.track_key != t1.track_key
+        GROUP BY ph2.track_key
         ORDER BY score DESC
-    """, (track_id, track_id))
+    """, (track_id,))
 
     return cursor.fetchall()
 
@@ -68,15 +70,17 @@ def _artist_overlap_score(conn, track_id: str) -> List[Tuple[str, float]]:
     cursor = conn.cursor()
 
     cursor.execute("""
-        SELECT ta2.track_id, COUNT(*) as score
-        FROM track_artists ta1
+        SELECT t2.track_id, COUNT(*) as score
+        FROM tracks t1
+        JOIN track_artists ta1 ON ta1.track_key = t1.track_key
         JOIN track_artists ta2
-            ON ta1.artist_id = ta2.artist_id
-        WHERE ta1.track_id = ?
-          AND ta2.track_id != ?
-        GROUP BY ta2.track_id
+            ON ta1.artist_key = ta2.artist_key
+        JOIN tracks t2 ON t2.track_key = ta2.track_key
+        WHERE t1.track_id = ?
+          AND ta2.track_key != t1.track_key
+        GROUP BY ta2.track_key
         ORDER BY score DESC
-    """, (track_id, track_id))
+    """, (track_id,))
 
     return cursor.fetchall()
 
@@ -89,9 +93,10 @@ def _engagement_proximity_score(conn, track_id: str) -> List[Tuple[str, float]]:
     cursor = conn.cursor()
 
     cursor.execute("""
-        SELECT engagement_score
-        FROM track_metrics
-        WHERE track_id = ?
+        SELECT tm.track_key, tm.engagement_score
+        FROM track_metrics tm
+        JOIN tracks t ON t.track_key = tm.track_key
+        WHERE t.track_id = ?
     """, (track_id,))
 
     row = cursor.fetchone()
@@ -99,15 +104,16 @@ def _engagement_proximity_score(conn, track_id: str) -> List[Tuple[str, float]]:
     if not row:
         return []
 
-    target_score = row[0]
+    target_key, target_score = row
 
     cursor.execute("""
-        SELECT track_id,
-               1.0 / (1.0 + ABS(engagement_score - ?)) as score
-        FROM track_metrics
-        WHERE track_id != ?
+        SELECT t.track_id,
+               1.0 / (1.0 + ABS(tm.engagement_score - ?)) as score
+        FROM track_metrics tm
+        JOIN tracks t ON t.track_key = tm.track_key
+        WHERE tm.track_key != ?
         ORDER BY score DESC
         LIMIT 50
-    """, (target_score, track_id))
+    """, (target_score, target_key))
 
     return cursor.fetchall()
\ No newline at end of file
@@ -0,0 +1,333 @@
+# core/snapshot.py
+
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from core.database import normalize_name
+
+
+@dataclass(frozen=True)
+class CSR:
+    """
+    Compressed sparse row adjacency: the neighbours of row r are
+    indices[indptr[r]:indptr[r + 1]].
+    """
+
+    indptr: np.ndarray
+    indices: np.ndarray
+
+    def row(self, r: int) -> np.ndarray:
+        return self.indices[self.indptr[r]:self.indptr[r + 1]]
+
+    def rows(self, rs) -> np.ndarray:
+        if len(rs) == 0:
+            return np.empty(0, dtype=self.indices.dtype)
+
+        return np.concatenate([self.row(r) for r in rs])
+
+    @classmethod
+    def build(cls, rows: np.ndarray, cols: np.ndarray, n_rows: int, order_key: np.ndarray | None = None):
+        """
+        Build from (row, col) pairs. Within a row, neighbours are
+        sorted by order_key[col] when given, otherwise kept in input order.
+        """
+        if order_key is not None and len(cols):
+            order = np.lexsort((order_key[cols], rows))
+        else:
+            order = np.argsort(rows, kind="stable")
+
+        counts = np.bincount(rows, minlength=n_rows)
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+
+        return cls(indptr=indptr, indices=cols[order].astype(np.int32))
+
+
+@dataclass(frozen=True)
+class LibrarySnapshot:
+    """
+    Immutable, columnar copy of the library for read-heavy composition.
+
+    Tracks, artists, albums and playlists are interned to dense integer
+    ids (their position in the *_ids arrays). Links are CSR adjacency
+    lists, so resolving an artist, album or playlist is array slicing.
+    Built from SQLite by build_snapshot() and replaced as a whole.
+    """
+
+    built_at: str
+
+    # Tracks
+    track_ids: np.ndarray            # object[str]
+    track_names: np.ndarray          # object[str]
+    track_index: dict
+    recent_order: np.ndarray         # track ints, added_at DESC
+    recent_rank: np.ndarray          # position of each track in recent_order
+    engagement: np.ndarray           # float64, NaN when no metrics row
+
+    # Artists / albums
+    artist_names: np.ndarray
+    artists_by_norm: dict            # name_norm -> list[artist int]
+    album_names: np.ndarray
+    albums_by_norm: dict
+
+    artist_tracks: CSR               # artist -> tracks (added_at DESC)
+    track_artists: CSR               # track -> artists
+    album_tracks: CSR                # album -> tracks (added_at DESC)
+
+    # Playlists
+    playlist_ids: np.ndarray
+    playlist_names: np.ndarray
+    playlist_index: dict
+    playlist_tracks: CSR             # playlist -> tracks (position ASC)
+    in_any_playlist: np.ndarray      # bool per track
+
+    # =====================================================
+    # TRACKS
+    # =====================================================
+
+    def _name_tracks(self, by_norm: dict, adjacency: CSR, name: str) -> np.ndarray:
+        rows = by_norm.get(normalize_name(name), [])
+        return adjacency.rows(rows)
+
+    def _to_ids(self, track_ints: np.ndarray) -> list[str]:
+        return self.track_ids[track_ints].tolist()
+
+    def _by_recency(self, track_ints: np.ndarray) -> np.ndarray:
+        return track_ints[np.argsort(self.recent_rank[track_ints], kind="stable")]
+
+    def get_tracks_by_artist(self, artist_name: str) -> list[str]:
+        tracks = self._name_tracks(self.artists_by_norm, self.artist_tracks, artist_name)
+        return self._to_ids(self._by_recency(tracks))
+
+    def get_tracks_by_album(self, album_name: str) -> list[str]:
+        tracks = self._name_tracks(self.albums_by_norm, self.album_tracks, album_name)
+        return self._to_ids(self._by_recency(tracks))
+
+    def count_tracks_by_artist(self, artist_name: str) -> int:
+        return len(self._name_tracks(self.artists_by_norm, self.artist_tracks, artist_name))
+
+    def get_recent_tracks(self, limit: int = 20) -> list[str]:
+        return self._to_ids(self.recent_order[:limit])
+
+    def track_exists(self, track_id: str) -> bool:
+        return track_id in self.track_index
+
+    def count_tracks(self) -> int:
+        return len(self.track_ids)
+
+    def get_track_name(self, track_id: str) -> str | None:
+        t = self.track_index.get(track_id)
+        return None if t is None else self.track_names[t]
+
+    def get_tracks_with_artists(self, track_ids: list[str]):
+        ints = {self.track_index[tid] for tid in track_ids if tid in self.track_index}
+        return self._with_artists(sorted(ints, key=lambda t: self.track_ids[t]))
+
+    def get_all_tracks_with_artists(self):
+        order = np.argsort(self.track_ids, kind="stable")
+        return self._with_artists(order)
+
+    def iter_tracks_with_artists(self, chunk_size: int = 500):
+        order = np.argsort(self.track_ids, kind="stable")
+
+        for start in range(0, len(order), chunk_size):
+            chunk = self._with_artists(order[start:start + chunk_size])
+
+            if chunk:
+                yield chunk
+
+    def _with_artists(self, track_ints):
+        tracks = []
+
+        for t in track_ints:
+            artists = self.track_artists.row(t)
+
+            # Same inner-join semantics as the SQL path
+            if not len(artists):
+                continue
+
+            tracks.append({
+                "track_id": self.track_ids[t],
+                "name": self.track_names[t],
+                "artists": self.artist_names[artists].tolist()
+            })
+
+        return tracks
+
+    # =====================================================
+    # METRICS
+    # =====================================================
+
+    def get_engagement_scores_for_tracks(self, track_ids: list[str]):
+        ints = np.fromiter(
+            {self.track_index[tid] for tid in track_ids if tid in self.track_index},
+            dtype=np.int64
+        )
+
+        scores = self.engagement[ints]
+        ints = ints[~np.isnan(scores)]
+        ints = ints[np.argsort(-self.engagement[ints], kind="stable")]
+
+        return [
+            (self.track_ids[t], float(self.engagement[t]))
+            for t in ints
+        ]
+
+    # =====================================================
+    # PLAYLISTS
+    # =====================================================
+
+    def get_playlist_tracks(self, playlist_id: str) -> list[str]:
+        p = self.playlist_index.get(playlist_id)
+
+        if p is None:
+            return []
+
+        return self._to_ids(self.playlist_tracks.row(p))
+
+    def get_all_playlists(self) -> list[str]:
+        return sorted(self.playlist_names.tolist())
+
+    def get_all_playlist_ids(self) -> list[str]:
+        return self.playlist_ids.tolist()
+
+    def count_playlists(self) -> int:
+        return len(self.playlist_ids)
+
+    def count_artist_tracks_in_playlists(self, artist_name: str) -> int:
+        tracks = self._name_tracks(self.artists_by_norm, self.artist_tracks, artist_name)
+        return len(np.unique(tracks[self.in_any_playlist[tracks]]))
+
+
+# =====================================================
+# BUILD
+# =====================================================
+
+def build_snapshot(conn) -> LibrarySnapshot:
+    """
+    Load the library from SQLite into a LibrarySnapshot.
+    """
+
+    cursor = conn.cursor()
+
+    # Tracks
+    cursor.execute("SELECT track_key, track_id, name, added_at FROM tracks;")
+    track_rows = cursor.fetchall()
+
+    track_keys = {r[0]: i for i, r in enumerate(track_rows)}
+    track_ids = _object_array(r[1] for r in track_rows)
+    track_names = _object_array(r[2] for r in track_rows)
+    track_index = {tid: i for i, tid in enumerate(track_ids)}
+
+    added_at = np.array([r[3] for r in track_rows], dtype=np.int64)
+    recent_order = np.argsort(added_at, kind="stable")[::-1].astype(np.int32)
+    recent_rank = np.empty(len(track_ids), dtype=np.int32)
+    recent_rank[recent_order] = np.arange(len(track_ids), dtype=np.int32)
+
+    engagement = np.full(len(track_ids), np.nan)
+    cursor.execute("SELECT track_key, engagement_score FROM track_metrics;")
+    for track_key, score in cursor.fetchall():
+        t = track_keys.get(track_key)
+        if t is not None and score is not None:
+            engagement[t] = score
+
+    # Artists / albums
+    artist_names, artists_by_norm, artist_keys = _load_entities(
+        cursor, "SELECT artist_key, name, name_norm FROM artists;"
+    )
+    album_names, albums_by_norm, album_keys = _load_entities(
+        cursor, "SELECT album_key, name, name_norm FROM albums;"
+    )
+
+    ta_tracks, ta_artists = _load_links(
+        cursor,
+        "SELECT track_key, artist_key FROM track_artists;",
+        track_keys,
+        artist_keys
+    )
+    tb_tracks, tb_albums = _load_links(
+        cursor,
+        "SELECT track_key, album_key FROM track_albums;",
+        track_keys,
+        album_keys
+    )
+
+    # Playlists
+    cursor.execute("SELECT playlist_key, playlist_id, name FROM playlists;")
+    playlist_rows = cursor.fetchall()
+
+    playlist_keys = {r[0]: i for i, r in enumerate(playlist_rows)}
+    playlist_ids = _object_array(r[1] for r in playlist_rows)
+    playlist_names = _object_array(r[2] for r in playlist_rows)
+    playlist_index = {pid: i for i, pid in enumerate(playlist_ids)}
+
+    pt_playlists, pt_tracks = _load_links(
+        cursor,
+        "SELECT playlist_key, track_key FROM playlist_tracks ORDER BY playlist_key, position ASC;",
+        playlist_keys,
+        track_keys
+    )
+
+    in_any_playlist = np.zeros(len(track_ids), dtype=bool)
+    in_any_playlist[pt_tracks] = True
+
+    return LibrarySnapshot(
+        built_at=datetime.utcnow().isoformat(),
+        track_ids=track_ids,
+        track_names=track_names,
+        track_index=track_index,
+        recent_order=recent_order,
+        recent_rank=recent_rank,
+        engagement=engagement,
+        artist_names=artist_names,
+        artists_by_norm=artists_by_norm,
+        album_names=album_names,
+        albums_by_norm=albums_by_norm,
+        artist_tracks=CSR.build(ta_artists, ta_tracks, len(artist_names), recent_rank),
+        track_artists=CSR.build(ta_tracks, ta_artists, len(track_ids)),
+        album_tracks=CSR.build(tb_albums, tb_tracks, len(album_names), recent_rank),
+        playlist_ids=playlist_ids,
+        playlist_names=playlist_names,
+        playlist_index=playlist_index,
+        playlist_tracks=CSR.build(pt_playlists, pt_tracks, len(playlist_ids)),
+        in_any_playlist=in_any_playlist
+    )
+
+
+def _object_array(values) -> np.ndarray:
+    values = list(values)
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _load_entities(cursor, query: str):
+    cursor.execute(query)
+    rows = cursor.fetchall()
+
+    names = _object_array(r[1] for r in rows)
+    keys = {r[0]: i for i, r in enumerate(rows)}
+
+    by_norm = {}
+    for i, row in enumerate(rows):
+        by_norm.setdefault(row[2], []).append(i)
+
+    return names, by_norm, keys
+
+
+def _load_links(cursor, query: str, left_keys: dict, right_keys: dict):
+    cursor.execute(query)
+
+    left, right = [], []
+
+    for a, b in cursor.fetchall():
+        i = left_keys.get(a)
+        j = right_keys.get(b)
+
+        if i is not None and j is not None:
+            left.append(i)
+            right.append(j)
+
+    return np.array(left, dtype=np.int64), np.array(right, dtype=np.int64)
@@ -0,0 +1,243 @@
+# core/spotify_transport.py
+
+import hashlib
+import random
+import re
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.http_cache import cache_ttl, invalidated_prefixes
+from core.rate_limit import (
+    MAX_RETRY_AFTER_SECONDS,
+    TRANSPORT_RETRIED_HEADER,
+    spotify_bucket,
+)
+
+
+# Responses worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Methods safe to resend after the server may have acted on them
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+
+ENDPOINT_TIMEOUTS = [
+    # Large pages
+    (re.compile(r"/v1/me/tracks"), (3.05, 20)),
+    (re.compile(r"/v1/playlists/[^/]+/(items|tracks)"), (3.05, 20)),
+    (re.compile(r"/v1/audio-features"), (3.05, 20)),
+    # Token refresh blocks every other call
+    (re.compile(r"accounts\.spotify\.com"), (3.05, 5)),
+]
+
+
+def endpoint_timeout(url: str):
+
+    for pattern, timeout in ENDPOINT_TIMEOUTS:
+        if pattern.search(url):
+            return timeout
+
+    return DEFAULT_TIMEOUT
+
+
+class SpotifySession(requests.Session):
+    """
+    Shared HTTP transport for the Spotify client and its auth manager.
+
+    Keeps a pool of keep-alive connections, applies per-endpoint
+    timeouts and retries rate-limited and failed calls with jittered
+    exponential backoff. A Retry-After on a 429 is honoured and also
+    pauses the shared rate limiter, so concurrent fetchers back off
+    together; one longer than max_retry_after is not waited out. When
+    retries run out or the wait is too long, the last response is
+    returned, marked as retried, and spotipy raises as usual;
+    call_rate_limited then re-raises without retrying it again.
+
+    With a response_cache, cacheable reads are served from disk while
+    fresh and revalidated with If-None-Match after; any write to the
+    Web API drops the cached reads it can make stale. Entries are
+    scoped to the access token that fetched them.
+    """
+
+    def __init__(self, max_retries: int = 5, backoff_base: float = 0.5,
+                 backoff_cap: float = 30.0, pool_size: int = 16, bucket=spotify_bucket,
+                 response_cache=None, max_retry_after: float = MAX_RETRY_AFTER_SECONDS):
+        super().__init__()
+
+        self.response_cache = response_cache
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.bucket = bucket
+
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+
+        method = method.upper()
+
+        if self.response_cache is None or args:
+            return self._send(method, url, *args, **kwargs)
+
+        if method == "GET":
+            ttl = cache_ttl(url)
+
+            if ttl is not None:
+                return self._cached_get(url, ttl, **kwargs)
+
+            return self._send(method, url, **kwargs)
+
+        try:
+            return self._send(method, url, **kwargs)
+        finally:
+            prefixes = invalidated_prefixes(url)
+
+            if prefixes:
+                self.response_cache.invalidate(prefixes)
+
+    def _cached_get(self, url, ttl, **kwargs):
+
+        key = requests.Request("GET", url, params=kwargs.get("params")).prepare().url
+        scope = self._auth_scope(kwargs.get("headers"))
+        entry = self.response_cache.lookup(key, scope)
+
+        if entry is not None:
+            body, content_type, etag, fresh = entry
+
+            if fresh:
+                return _cached_response(key, body, content_type)
+
+            if etag:
+                kwargs["headers"] = {**(kwargs.get("headers") or {}), "If-None-Match": etag}
+
+        response = self._send("GET", url, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.response_cache.refresh(key, ttl, scope)
+            response.close()
+            return _cached_response(key, body, content_type)
+
+        if response.status_code == 200:
+            etag = response.headers.get("ETag")
+
+            # Without a TTL or an ETag the entry could never be used
+            if ttl > 0 or etag:
+                self.response_cache.store(
+                    key,
+                    response.content,
+                    response.headers.get("Content-Type"),
+                    etag,
+                    ttl,
+                    scope
+                )
+
+        return response
+
+    def _auth_scope(self, headers) -> str:
+        """
+        Short digest of the request's credentials: a cached read is
+        only served back to the token that fetched it.
+        """
+        auth = (headers or {}).get("Authorization") or self.headers.get("Authorization")
+
+        if not auth:
+            return ""
+
+        return hashlib.sha256(auth.encode("utf-8")).hexdigest()[:16]
+
+    def _send(self, method, url, *args, **kwargs):
+
+        # spotipy passes one global timeout; ours is per endpoint
+        kwargs["timeout"] = endpoint_timeout(url)
+
+        idempotent = method in IDEMPOTENT_METHODS
+        attempt = 0
+
+        while True:
+            try:
+                response = super().request(method, url, *args, **kwargs)
+
+            except requests.exceptions.ConnectionError as e:
+                # A refused or dropped connect never reached the server
+                retryable = idempotent or isinstance(e, requests.exceptions.ConnectTimeout)
+
+                if not retryable or attempt >= self.max_retries:
+                    raise
+
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            except requests.exceptions.Timeout:
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            status = response.status_code
+            wait = self._retry_after(response) if status in RETRY_STATUSES else None
+
+            # A 429 was rejected outright; other failures only retry
+            # when resending cannot apply a change twice
+            if (
+                status not in RETRY_STATUSES
+                or (status != 429 and not idempotent)
+                or attempt >= self.max_retries
+                or (wait is not None and wait > self.max_retry_after)
+            ):
+                # Retries end here: call_rate_limited must not add its own
+                if attempt or wait is not None:
+                    response.headers[TRANSPORT_RETRIED_HEADER] = str(attempt)
+
+                return response
+
+            if wait is None:
+                wait = self._backoff(attempt)
+
+            if status == 429 and self.bucket is not None:
+                self.bucket.pause(wait)
+
+            response.close()
+            time.sleep(wait)
+            attempt += 1
+
+    def _backoff(self, attempt: int) -> float:
+        ceiling = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+        return random.uniform(ceiling / 2, ceiling)
+
+    def _retry_after(self, response) -> float | None:
+        value = response.headers.get("Retry-After")
+
+        try:
+            seconds = max(float(value), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+        # Spread the retries of concurrent callers
+        return seconds + random.uniform(0, 0.1 * seconds + 0.05)
+
+
+def _cached_response(url, body, content_type):
+    """
+    A 200 response rebuilt from a cache entry.
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.url = url
+    response.encoding = "utf-8"
+    response._content = body
+
+    if content_type:
+        response.headers["Content-Type"] = content_type
+
+    return response
@@ -0,0 +1,189 @@
+# core/synthetic_history.py
+
+import numpy as np
+
+from core.database import MS_PER_DAY, now_ms
+
+
+# Plays generated and written per transaction
+SYNTHETIC_CHUNK_PLAYS = 200_000
+
+# Exponent of the Zipf law over track popularity ranks
+ZIPF_EXPONENT = 1.1
+
+# Mean tracks per listening session (geometric)
+MEAN_SESSION_PLAYS = 12
+
+# Share of a session's plays drawn near its seed track (same artist
+# and neighbours) rather than from overall popularity
+SESSION_FOCUS = 0.6
+
+# Half-width, in tracks, of the neighbourhood around the session seed
+SESSION_NEIGHBOURHOOD = 15
+
+# Chance a play is skipped partway through
+SKIP_PROBABILITY = 0.2
+
+# Seconds between the end of one play and the next
+PLAY_GAP_SECONDS = (0, 20)
+
+# Used when a track has no duration
+DEFAULT_DURATION_MS = 210_000
+
+# Relative chance a session starts in each UTC hour: quiet overnight,
+# a morning commute bump and an evening peak
+HOURLY_SESSION_WEIGHTS = (
+    0.6, 0.3, 0.15, 0.1, 0.1, 0.2, 0.6, 1.4,
+    2.0, 1.5, 1.1, 1.1, 1.4, 1.3, 1.1, 1.2,
+    1.5, 2.0, 2.3, 2.4, 2.3, 2.0, 1.6, 1.1,
+)
+
+# Extra sessions on Saturdays and Sundays
+WEEKEND_FACTOR = 1.3
+
+
+def generate_play_history(
+    track_keys,
+    durations_ms,
+    plays: int,
+    years: float = 3.0,
+    seed: int = 0,
+    end_ms: int | None = None,
+    chunk_plays: int = SYNTHETIC_CHUNK_PLAYS,
+):
+    """
+    Synthetic listening history over the given tracks, as
+    (track_keys, played_at_ms) array pairs of about chunk_plays each.
+
+    Plays come in sessions: a session starts at an hour drawn from
+    HOURLY_SESSION_WEIGHTS, runs for a geometric number of tracks, and
+    each track follows the previous one after its (possibly skipped)
+    duration. Track choice mixes a Zipfian popularity law with the
+    neighbourhood of a per-session seed track, so tracks listed next to
+    each other co-occur. The same seed and end_ms give the same history.
+    """
+    rng = np.random.default_rng(seed)
+
+    track_keys = np.asarray(track_keys, dtype=np.int64)
+    durations = np.asarray(
+        [d or DEFAULT_DURATION_MS for d in durations_ms],
+        dtype=np.int64
+    )
+    n_tracks = len(track_keys)
+
+    if n_tracks == 0 or plays <= 0:
+        return
+
+    # Popularity rank of each track, independent of its position
+    ranks = rng.permutation(n_tracks)
+    popularity = 1.0 / (ranks + 1.0) ** ZIPF_EXPONENT
+    popularity /= popularity.sum()
+
+    end_ms = now_ms() if end_ms is None else end_ms
+    n_days = max(int(years * 365), 1)
+    first_day = (end_ms - n_days * MS_PER_DAY) // MS_PER_DAY * MS_PER_DAY
+
+    # Session start weight of every hour in the span
+    hours = np.tile(np.asarray(HOURLY_SESSION_WEIGHTS), n_days)
+    weekday = (first_day // MS_PER_DAY + 3 + np.arange(n_days)) % 7
+    hours *= np.repeat(np.where(weekday >= 5, WEEKEND_FACTOR, 1.0), 24)
+    hours /= hours.sum()
+
+    remaining = plays
+
+    while remaining > 0:
+
+        n_sessions = max(-(-min(remaining, chunk_plays) // MEAN_SESSION_PLAYS), 1)
+
+        lengths = rng.geometric(1.0 / MEAN_SESSION_PLAYS, n_sessions)
+        lengths = lengths[np.cumsum(lengths) - lengths < remaining]
+        lengths[-1] -= max(lengths.sum() - remaining, 0)
+        n_sessions = len(lengths)
+        n_plays = int(lengths.sum())
+
+        starts = (
+            first_day
+            + rng.choice(len(hours), n_sessions, p=hours) * 3_600_000
+            + rng.integers(0, 3_600_000, n_sessions)
+        )
+
+        session = np.repeat(np.arange(n_sessions), lengths)
+        first = np.cumsum(lengths) - lengths
+
+        # Track choice: seed neighbourhood or overall popularity
+        seeds = rng.choice(n_tracks, n_sessions, p=popularity)
+        nearby = np.clip(
+            seeds[session] + rng.integers(-SESSION_NEIGHBOURHOOD, SESSION_NEIGHBOURHOOD + 1, n_plays),
+            0,
+            n_tracks - 1
+        )
+        popular = rng.choice(n_tracks, n_plays, p=popularity)
+        picked = np.where(rng.random(n_plays) < SESSION_FOCUS, nearby, popular)
+
+        # Time spent on each play, then offsets within its session
+        listened = durations[picked].astype(np.float64)
+        skipped = rng.random(n_plays) < SKIP_PROBABILITY
+        listened[skipped] *= rng.uniform(0.05, 0.5, int(skipped.sum()))
+        step = listened.astype(np.int64) + rng.integers(*PLAY_GAP_SECONDS, n_plays) * 1000
+
+        elapsed = np.cumsum(step) - step
+        offsets = elapsed - elapsed[first][session]
+
+        played_at = starts[session] + offsets
+        keys = track_keys[picked]
+
+        # Sessions running past the end are cut there; the next chunk
+        # makes up the difference
+        keep = played_at <= end_ms
+        keys, played_at = keys[keep], played_at[keep]
+
+        # Index order makes the inserts append-mostly
+        order = np.lexsort((played_at, keys))
+
+        yield keys[order], played_at[order]
+
+        remaining -= len(keys)
+
+
+def load_synthetic_history(
+    repo,
+    plays: int = 1_000_000,
+    years: float = 3.0,
+    seed: int = 0,
+    end_ms: int | None = None,
+    chunk_plays: int = SYNTHETIC_CHUNK_PLAYS,
+) -> int:
+    """
+    Generate `plays` synthetic plays over the library, ending at
+    end_ms (default now), and bulk-load them into play_history, one
+    transaction per chunk, then rebuild recency once. For load tests
+    of the recency and co-occurrence queries; the rows are tagged
+    source = 'synthetic'. Pass end_ms as well as seed to reproduce a
+    history exactly. Returns the number of plays inserted.
+    """
+    tracks = repo.get_track_durations_by_artist()
+
+    if not tracks:
+        return 0
+
+    track_keys, durations = zip(*tracks)
+    inserted = 0
+
+    for keys, played_at in generate_play_history(
+        track_keys,
+        durations,
+        plays,
+        years=years,
+        seed=seed,
+        end_ms=end_ms,
+        chunk_plays=chunk_plays
+    ):
+        inserted += repo.bulk_insert_plays(
+            keys.tolist(),
+            played_at.tolist(),
+            source="synthetic"
+        )
+
+    repo.rebuild_recency()
+
+    return inserted
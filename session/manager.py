@@ -1,21 +1,41 @@
 from datetime import datetime, timedelta
-from core.ingestion import sync_new_tracks, sync_playlists, sync_deleted_playlists
+from core.ingestion import (
+    apply_sync_plan,
+    import_library,
+    needs_initial_import,
+    plan_sync,
+    reconcile_library,
+)
+from core.audio_features import ingest_audio_features
+from core.behavior import compact_play_history
 from core.database import get_latest_added_at
 from session.context import SessionContext, SessionPhase
+from session.sync_worker import acquire_sync_worker, release_sync_worker
 from core.graph.state import MusicState
 
 
 class SessionManager:
 
-    def __init__(self, graph, llm, repo, sp, semantic_service, timeout_seconds: int = 60):
+    def __init__(self, graph, llm, repo, sp, semantic_service, timeout_seconds: int = 60,
+                 audio_features_source=None):
         self.graph = graph
         self.llm = llm
         self.repo = repo
         self.sp = sp
         self.context = SessionContext()
         self.semantic_service = semantic_service
+        self.audio_features_source = audio_features_source
         self.timeout = timedelta(seconds=timeout_seconds)
         self.sync_cooldown_seconds = 300  # 5 minutes
+        self._spotify_user_id = None
+
+        # Shared with every other SessionManager on this database
+        self.sync_worker = acquire_sync_worker(
+            self.repo.db_path,
+            self._run_sync,
+            interval_seconds=self.sync_cooldown_seconds
+        )
+        self._closed = False
 
     # =====================================================
     # PUBLIC ENTRY
@@ -53,96 +73,173 @@ class SessionManager:
     # =====================================================
     # SYNC CONTROL
     # =====================================================
+
+    # Sync runs on the background worker; handle() never waits for it
+    # and reads whatever state was last committed.
+
     def _maybe_sync(self):
-        now = datetime.utcnow()
+        if self.sync_worker.running:
+            return
 
         last_sync_str = self.repo.get_last_sync()
 
-        # First time ever → force sync
+        # First time ever → sync now
         if not last_sync_str:
-            self._run_sync(now)
+            self.sync_worker.trigger()
             return
 
         last_sync = datetime.fromisoformat(last_sync_str)
-        elapsed = (now - last_sync).total_seconds()
+        elapsed = (datetime.utcnow() - last_sync).total_seconds()
 
         if elapsed > self.sync_cooldown_seconds:
-            self._run_sync(now)
+            self.sync_worker.trigger()
 
-    def _run_sync(self, now):
+    def sync_now(self):
+        """
+        Queue a sync regardless of the cooldown.
+        """
+        self.sync_worker.trigger()
 
-        print("Checking for updates...")
+    def close(self):
+        if self._closed:
+            return
 
-        # =============================
-        # TRACK SYNC
-        # =============================
+        self._closed = True
+        release_sync_worker(self.repo.db_path)
 
-        new_tracks = sync_new_tracks(
-            self.sp,
-            self.repo
-        )
+    def _run_sync(self, report) -> dict:
 
-        new_tracks_count = new_tracks["new_tracks_count"]
-        new_tracks_ids = new_tracks["new_tracks_ids"]
+        now = datetime.utcnow()
 
-        # =============================
-        # PLAYLIST SYNC
-        # =============================
+        # A new library is imported in committed, resumable windows
+        # first; the plan then only sees what arrived since.
+        imported = 0
 
-        playlist_result = sync_playlists(
+        if needs_initial_import(self.repo):
+            report("importing")
+            imported = import_library(self.sp, self.repo)["imported_tracks"]
+
+        # One listing pass over the remote library, then one unit of
+        # work for the whole database sync so other sessions keep
+        # reading committed data instead of partial writes.
+        report("planning")
+
+        plan = plan_sync(
             self.sp,
-            self.repo
+            self.repo,
+            user_id=self._spotify_user_id
         )
-        
-        deleted_playlists = sync_deleted_playlists(
+
+        self._spotify_user_id = plan.user_id
+
+        report("applying")
+
+        result = apply_sync_plan(self.sp, self.repo, plan)
+
+        new_tracks_count = result["new_tracks_count"]
+        new_tracks_ids = result["new_tracks_ids"]
+        deleted_playlists = result["deleted_playlists"]
+
+        # Tracks un-saved on Spotify. Costs nothing unless the remote
+        # total from the plan is below the local count.
+        report("reconciling")
+
+        removed_tracks_ids = reconcile_library(
             self.sp,
-            self.repo
-        )
+            self.repo,
+            remote_total=plan.saved_tracks_total
+        )["removed_track_ids"]
+
+        # Audio features for tracks still without them. Enrichment only:
+        # a failing source never fails the sync.
+        audio_features = None
+
+        if self.audio_features_source is not None:
+            report("audio features")
+
+            try:
+                audio_features = ingest_audio_features(
+                    self.repo,
+                    self.audio_features_source
+                )
+            except Exception as e:
+                audio_features = {"error": f"{type(e).__name__}: {e}"}
+
+        # Swap in a fresh in-memory snapshot of the committed library
+        self.repo.refresh_snapshot()
 
-        playlist_tracks_synced = playlist_result["playlist_tracks_synced"]
-        anchors_updated = playlist_result["anchors_updated"]
+        # Keep raw play history bounded
+        report("compacting")
+        compact_play_history(self.repo)
+
+        playlist_tracks_synced = result["playlist_tracks_synced"]
+        anchors_updated = result["anchors_updated"]
+
+        indexed = 0
 
         # =============================
         # DATABASE CHANGE CHECK
         # =============================
 
-        if new_tracks_count > 0 or playlist_tracks_synced > 0 or deleted_playlists >0:
-
-            print("Changes detected. Database synchronized.")
+        if (
+            imported > 0
+            or new_tracks_count > 0
+            or playlist_tracks_synced > 0
+            or deleted_playlists > 0
+            or removed_tracks_ids
+        ):
 
             # =============================
             # SEMANTIC LAYER UPDATE
             # =============================
 
-            print("Updating semantic index...")
+            report("indexing")
+
+            # --- Full indexing after an import (also covers tracks
+            # written by an earlier, interrupted run)
+            if imported:
+
+                indexed = self.semantic_service.index_all_tracks()
 
             # --- Incremental track indexing
-            if new_tracks_ids:
+            elif new_tracks_ids:
 
                 indexed = self.semantic_service.index_tracks(
                     new_tracks_ids
                 )
 
-                print(f"Indexed {indexed} new tracks.")
+            # --- Drop vectors of un-saved tracks
+            if removed_tracks_ids:
+
+                self.semantic_service.remove_tracks(
+                    removed_tracks_ids
+                )
 
             # --- Anchor recalculation
             for anchor_id in anchors_updated:
 
                 self.semantic_service.recalculate_anchor(
                     anchor_id
-                                                        
                 )
 
-        else:
-
-            print("No changes detected.")
-
         # =============================
         # UPDATE SYNC STATE
         # =============================
 
         self.repo.set_last_sync(now.isoformat())
-    
+
+        return {
+            "imported_tracks": imported,
+            "new_tracks": new_tracks_count,
+            "removed_tracks": len(removed_tracks_ids),
+            "playlists_synced": result["playlists_synced"],
+            "playlist_tracks_synced": playlist_tracks_synced,
+            "deleted_playlists": deleted_playlists,
+            "anchors_updated": len(anchors_updated),
+            "indexed_tracks": indexed,
+            "api_calls": result["api_calls"],
+            "audio_features": audio_features
+        }
 
     # =====================================================
     # STATE BUILDING
@@ -0,0 +1,197 @@
+import os
+import threading
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass
+class SyncStatus:
+    # idle, or the phase the running sync last reported
+    phase: str = "idle"
+    pending: bool = False
+    runs: int = 0
+
+    last_started_at: Optional[datetime] = None
+    last_finished_at: Optional[datetime] = None
+    last_result: Optional[Dict[str, Any]] = None
+    last_error: Optional[str] = None
+
+
+class SyncWorker:
+    """
+    Runs library syncs on a background thread.
+
+    run_sync(report) does the work and calls report(phase) as it
+    progresses. The worker syncs every interval_seconds on its own and
+    whenever trigger() is called; triggers that arrive while a sync is
+    running collapse into a single follow-up run.
+    """
+
+    def __init__(self, run_sync: Callable, interval_seconds: float = 300):
+        self.run_sync = run_sync
+        self.interval_seconds = interval_seconds
+
+        self._status = SyncStatus()
+        self._cond = threading.Condition()
+        self._requested = False
+        self._stopping = False
+        self._thread = None
+
+    # =====================================================
+    # CONTROL
+    # =====================================================
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._loop,
+                name="sync-worker",
+                daemon=True
+            )
+            self._thread.start()
+
+    def trigger(self):
+        """
+        Ask for a sync without waiting for it.
+        """
+        with self._cond:
+            self._requested = True
+            self._status.pending = True
+            self._cond.notify_all()
+
+    def stop(self, timeout: float | None = None):
+        """
+        Stop the worker after the sync in progress, if any.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+
+        if thread is not None:
+            thread.join(timeout)
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """
+        Block until no sync is running or pending.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._status.phase == "idle" and not self._requested,
+                timeout
+            )
+
+    @property
+    def running(self) -> bool:
+        with self._cond:
+            return self._status.phase != "idle"
+
+    def status(self) -> SyncStatus:
+        with self._cond:
+            return replace(self._status)
+
+    # =====================================================
+    # WORKER THREAD
+    # =====================================================
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._requested and not self._stopping:
+                    self._cond.wait(self.interval_seconds)
+
+                if self._stopping:
+                    return
+
+                # A timeout is a scheduled run
+                self._requested = False
+                self._status.pending = False
+                self._status.phase = "starting"
+                self._status.last_started_at = datetime.utcnow()
+
+            self._run_once()
+
+    def _run_once(self):
+        result = None
+        error = None
+
+        try:
+            result = self.run_sync(self._report)
+        except Exception as e:
+            # Reported through status(), never printed over the prompt
+            error = f"{type(e).__name__}: {e}"
+
+        with self._cond:
+            self._status.phase = "idle"
+            self._status.runs += 1
+            self._status.last_finished_at = datetime.utcnow()
+            self._status.last_result = result
+            self._status.last_error = error
+            self._cond.notify_all()
+
+    def _report(self, phase: str):
+        with self._cond:
+            self._status.phase = phase
+
+
+# =====================================================
+# PROCESS-WIDE WORKERS
+# =====================================================
+
+# One worker per database file, shared by every SessionManager in the
+# process (app.py builds one per Streamlit session)
+_workers: dict[str, SyncWorker] = {}
+_worker_users: dict[str, int] = {}
+_workers_lock = threading.Lock()
+
+
+def _worker_key(db_path: str) -> str:
+    return db_path if db_path == ":memory:" else os.path.abspath(db_path)
+
+
+def acquire_sync_worker(
+    db_path: str,
+    run_sync: Callable,
+    interval_seconds: float = 300
+) -> SyncWorker:
+    """
+    Return the running worker for a database file, starting it with
+    run_sync on first use. Pair every call with release_sync_worker().
+    """
+    key = _worker_key(db_path)
+
+    with _workers_lock:
+        worker = _workers.get(key)
+
+        if worker is None:
+            worker = SyncWorker(run_sync, interval_seconds=interval_seconds)
+            worker.start()
+            _workers[key] = worker
+
+        _worker_users[key] = _worker_users.get(key, 0) + 1
+        return worker
+
+
+def release_sync_worker(db_path: str, timeout: float | None = None):
+    """
+    Drop one user of the database's worker; the last one stops it.
+    """
+    key = _worker_key(db_path)
+
+    with _workers_lock:
+        users = _worker_users.get(key, 0) - 1
+
+        if users > 0:
+            _worker_users[key] = users
+            return
+
+        _worker_users.pop(key, None)
+        worker = _workers.pop(key, None)
+
+    if worker is not None:
+        worker.stop(timeout)
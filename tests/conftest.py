@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.database import create_tables
+from core.db_session import DatabaseSession
+from core.rate_limit import spotify_bucket
+from core.repository import Repository
+
+
+@pytest.fixture(autouse=True)
+def unthrottled(monkeypatch):
+    # Fakes answer instantly; the shared limiter would only slow tests
+    monkeypatch.setattr(spotify_bucket, "rate", 1e9)
+    monkeypatch.setattr(spotify_bucket, "capacity", 1e9)
+
+
+@pytest.fixture
+def session(tmp_path):
+    session = DatabaseSession(str(tmp_path / "library.db"))
+    create_tables(session.conn)
+    return session
+
+
+@pytest.fixture
+def repo(session):
+    return Repository(session)
+
+
+def saved_item(i: int, base=datetime(2026, 1, 1)) -> dict:
+    """
+    A saved-tracks item; higher i is saved earlier.
+    """
+    return {
+        "added_at": (base - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "track": {
+            "id": f"t{i:05d}",
+            "name": f"Song {i}",
+            "duration_ms": 200_000,
+            "popularity": i % 100,
+            "artists": [{"id": f"ar{i % 7}", "name": f"Artist {i % 7}"}],
+            "album": {
+                "id": f"al{i % 11}",
+                "name": f"Album {i % 11}",
+                "release_date": "2020",
+                "total_tracks": 10,
+                "album_type": "album",
+            },
+        },
+    }
+
+
+class FakeSpotify:
+    """
+    In-memory stand-in for the spotipy client, covering the calls
+    sync makes. Saved tracks are newest first, like the Web API.
+    """
+
+    def __init__(self, n_tracks: int = 0, user_id: str = "me"):
+        self.user_id = user_id
+        self.saved = [saved_item(i) for i in range(n_tracks)]
+        # playlist_id -> {"name", "snapshot_id", "track_ids"}
+        self.playlists = {}
+        self.unfollowed = []
+        self.calls = []
+
+    # Saved tracks
+
+    def current_user_saved_tracks(self, limit=20, offset=0):
+        self.calls.append(("saved", offset))
+        return {
+            "items": self.saved[offset:offset + limit],
+            "total": len(self.saved),
+            "next": "next" if offset + limit < len(self.saved) else None,
+        }
+
+    def current_user_saved_tracks_contains(self, tracks):
+        saved = {item["track"]["id"] for item in self.saved}
+        return [track_id in saved for track_id in tracks]
+
+    def unsave(self, *positions):
+        removed = [self.saved[p]["track"]["id"] for p in positions]
+        self.saved = [
+            item for p, item in enumerate(self.saved)
+            if p not in set(positions)
+        ]
+        return removed
+
+    # Playlists
+
+    def current_user(self):
+        return {"id": self.user_id}
+
+    def add_playlist(self, playlist_id, name, track_ids, snapshot_id="s1"):
+        self.playlists[playlist_id] = {
+            "name": name,
+            "snapshot_id": snapshot_id,
+            "track_ids": list(track_ids),
+        }
+
+    def current_user_playlists(self, limit=50, offset=0):
+        self.calls.append(("playlists", offset))
+        listed = list(self.playlists.items())
+
+        return {
+            "items": [
+                {
+                    "id": playlist_id,
+                    "name": p["name"],
+                    "snapshot_id": p["snapshot_id"],
+                    "owner": {"id": self.user_id},
+                    "tracks": {"total": len(p["track_ids"])},
+                }
+                for playlist_id, p in listed[offset:offset + limit]
+            ],
+            "next": "next" if offset + limit < len(listed) else None,
+        }
+
+    def _get(self, url, limit=100, offset=0):
+        playlist_id = url.split("/")[1]
+        self.calls.append(("items", playlist_id, offset))
+        track_ids = self.playlists[playlist_id]["track_ids"]
+
+        return {
+            "items": [
+                {
+                    "added_at": "2026-01-01T00:00:00Z",
+                    "item": {"type": "track", "id": track_id},
+                }
+                for track_id in track_ids[offset:offset + limit]
+            ],
+            "next": "next" if offset + limit < len(track_ids) else None,
+        }
+
+    def current_user_unfollow_playlist(self, playlist_id):
+        self.unfollowed.append(playlist_id)
+        self.playlists.pop(playlist_id, None)
+
+    def next(self, results):
+        return None
+
+
+@pytest.fixture
+def fake_spotify():
+    return FakeSpotify
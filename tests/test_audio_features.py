@@ -0,0 +1,85 @@
+import pytest
+
+from core.audio_features import (
+    AUDIO_FEATURES_FAILURE_BACKOFF_SECONDS,
+    AudioFeaturesSource,
+    ingest_audio_features,
+)
+
+
+class ScriptedSource(AudioFeaturesSource):
+    batch_size = 2
+
+    def __init__(self, features=None, error=None):
+        self.features = features or {}
+        self.error = error
+        self.requested = []
+
+    def fetch(self, track_ids):
+        self.requested.extend(track_ids)
+
+        if self.error is not None:
+            raise self.error
+
+        return {track_id: self.features.get(track_id) for track_id in track_ids}
+
+
+@pytest.fixture
+def library(session, repo):
+    session.conn.executemany("""
+        INSERT INTO tracks (track_id, name, added_at)
+        VALUES (?, ?, ?)
+    """, [(f"t{i}", f"Song {i}", i) for i in range(5)])
+    session.commit()
+    return repo
+
+
+def test_source_without_fetch_cannot_be_created():
+    with pytest.raises(TypeError):
+        AudioFeaturesSource()
+
+
+def test_misses_are_not_requested_again(library):
+    source = ScriptedSource({"t0": {"energy": 0.5}, "t3": {"energy": 0.1}})
+
+    result = ingest_audio_features(library, source, max_workers=2)
+
+    assert result == {"requested": 5, "stored": 2, "missed": 3}
+
+    source.requested.clear()
+    result = ingest_audio_features(library, source, max_workers=2)
+
+    assert result == {"requested": 0, "stored": 0, "missed": 0}
+    assert source.requested == []
+
+
+def test_failing_source_backs_off_and_doubles(library, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("core.audio_features.time.monotonic", lambda: clock[0])
+    source = ScriptedSource(error=RuntimeError("403 Forbidden"))
+
+    with pytest.raises(RuntimeError):
+        ingest_audio_features(library, source, max_workers=1)
+
+    assert source.failures == 1
+    assert source.retry_at == 1000.0 + AUDIO_FEATURES_FAILURE_BACKOFF_SECONDS
+
+    # Skipped while backing off, without touching the source
+    source.requested.clear()
+    assert ingest_audio_features(library, source)["skipped"] is True
+    assert source.requested == []
+
+    clock[0] = source.retry_at
+    with pytest.raises(RuntimeError):
+        ingest_audio_features(library, source, max_workers=1)
+
+    assert source.failures == 2
+    assert source.retry_at == clock[0] + 2 * AUDIO_FEATURES_FAILURE_BACKOFF_SECONDS
+
+    # A good run clears the backoff
+    clock[0] = source.retry_at
+    source.error = None
+    ingest_audio_features(library, source)
+
+    assert source.failures == 0
+    assert source.available()
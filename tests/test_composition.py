@@ -0,0 +1,36 @@
+import pytest
+
+from core.composition import build_strategic_playlist
+
+
+class RecencyRepo:
+    def __init__(self, n_tracks):
+        self.track_ids = [f"t{i}" for i in range(n_tracks)]
+        self.limits = []
+
+    def get_recency_scores(self, limit=-1, decay_days=30.0):
+        self.limits.append(limit)
+        rows = [(track_id, 1.0) for track_id in self.track_ids]
+        return rows if limit < 0 else rows[:limit]
+
+
+def _top_played(repo, limit):
+    return build_strategic_playlist(repo, None, {
+        "sources": [{"type": "top_played", "filters": {"limit": limit}}],
+        "constraints": {},
+    })
+
+
+@pytest.mark.parametrize("limit", [None, 0, -3, "10"])
+def test_top_played_without_a_usable_limit_returns_every_row(limit):
+    repo = RecencyRepo(25)
+
+    assert sorted(_top_played(repo, limit)) == sorted(repo.track_ids)
+    assert repo.limits == [-1]
+
+
+def test_top_played_limit_is_applied_in_sql():
+    repo = RecencyRepo(25)
+
+    assert len(_top_played(repo, 10)) == 10
+    assert repo.limits == [10]
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from core.db_session import get_database_session
+
+
+def _count(conn):
+    return conn.execute("SELECT COUNT(*) FROM tracks;").fetchone()[0]
+
+
+def _insert(conn, track_id):
+    conn.execute(
+        "INSERT INTO tracks (track_id, name, added_at) VALUES (?, ?, 1);",
+        (track_id, track_id)
+    )
+
+
+def test_database_runs_in_wal_mode(session):
+    assert session.conn.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+
+
+def test_nested_transactions_commit_once_at_the_outermost(session):
+    generation = session.generation
+
+    with session.transaction() as conn:
+        _insert(conn, "t1")
+
+        with session.transaction():
+            _insert(conn, "t2")
+            session.commit()
+
+        assert session.generation == generation
+
+    assert session.generation == generation + 1
+
+    with session.reader() as conn:
+        assert _count(conn) == 2
+
+
+def test_failed_transaction_rolls_back_everything(session):
+    with pytest.raises(RuntimeError):
+        with session.transaction() as conn:
+            _insert(conn, "t1")
+
+            with session.transaction():
+                _insert(conn, "t2")
+
+            raise RuntimeError("boom")
+
+    with session.reader() as conn:
+        assert _count(conn) == 0
+
+
+def test_readers_on_other_threads_see_only_committed_rows(session):
+    seen = []
+
+    def read():
+        with session.reader() as conn:
+            seen.append(_count(conn))
+
+    with session.transaction() as conn:
+        _insert(conn, "t1")
+
+        # Runs while the writer is held and the row uncommitted
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join(5)
+
+        with session.reader() as own:
+            seen.append(_count(own))
+
+    assert seen == [0, 1]
+
+
+def test_sessions_are_shared_per_database_file(tmp_path):
+    path = tmp_path / "shared.db"
+
+    first = get_database_session(str(path))
+    second = get_database_session(str(tmp_path / "." / "shared.db"))
+
+    try:
+        assert first is second
+    finally:
+        first.close()
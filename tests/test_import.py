@@ -0,0 +1,84 @@
+import pytest
+
+from core.ingestion import import_library, needs_initial_import, sync_new_tracks
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _fail_at(sp, failing_offset):
+    fetch = sp.current_user_saved_tracks
+
+    def current_user_saved_tracks(limit=20, offset=0):
+        if offset == failing_offset:
+            raise Interrupted(offset)
+        return fetch(limit=limit, offset=offset)
+
+    sp.current_user_saved_tracks = current_user_saved_tracks
+
+
+def _fetched_offsets(sp):
+    return sorted(offset for call, offset in sp.calls if call == "saved")
+
+
+def _library_ids(repo):
+    repo.invalidate_snapshot()
+    return repo.get_library_track_ids()
+
+
+def test_new_library_is_imported_in_full(repo, fake_spotify):
+    sp = fake_spotify(480)
+
+    assert needs_initial_import(repo)
+
+    result = import_library(sp, repo, window_pages=3)
+
+    assert result == {"remote_total": 480, "resumed_at": None, "imported_tracks": 480}
+    assert len(_library_ids(repo)) == 480
+    assert not needs_initial_import(repo)
+
+
+def test_interrupted_import_resumes_after_last_window(repo, fake_spotify):
+    sp = fake_spotify(480)
+    fetch = sp.current_user_saved_tracks
+    _fail_at(sp, 350)
+
+    # Windows of 3 pages: 0-149 and 150-299 commit, 300-449 fails
+    with pytest.raises(Interrupted):
+        import_library(sp, repo, window_pages=3)
+
+    assert repo.get_import_checkpoint() == (300, 480)
+    assert len(_library_ids(repo)) == 300
+    assert needs_initial_import(repo)
+
+    sp.current_user_saved_tracks = fetch
+    sp.calls.clear()
+
+    result = import_library(sp, repo, window_pages=3)
+
+    # One page before the checkpoint is read again in case tracks
+    # were removed meanwhile
+    assert result["resumed_at"] == 250
+    assert _fetched_offsets(sp) == [0, 250, 300, 350, 400, 450]
+    assert len(_library_ids(repo)) == 480
+    assert repo.get_import_checkpoint() is None
+
+
+def test_tracks_saved_during_an_interruption_are_not_lost(repo, fake_spotify):
+    sp = fake_spotify(480)
+    newest = [sp.saved.pop(0) for _ in range(30)]
+    fetch = sp.current_user_saved_tracks
+    _fail_at(sp, 300)
+
+    with pytest.raises(Interrupted):
+        import_library(sp, repo, window_pages=3)
+
+    # Saved at the top of the library before the import resumes
+    sp.saved[:0] = newest
+    sp.current_user_saved_tracks = fetch
+
+    import_library(sp, repo, window_pages=3)
+    sync_new_tracks(sp, repo)
+
+    assert _library_ids(repo) == {item["track"]["id"] for item in sp.saved}
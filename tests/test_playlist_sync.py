@@ -0,0 +1,130 @@
+import pytest
+
+from core.ingestion import apply_sync_plan, plan_sync, sync_new_tracks, sync_playlists
+
+
+def _playlist_tracks(repo, playlist_id):
+    return set(repo.get_playlist_tracks(playlist_id))
+
+
+def test_track_saved_later_is_linked_to_unchanged_playlist(repo, fake_spotify):
+    sp = fake_spotify(10)
+    later = sp.saved.pop(0)
+
+    sp.add_playlist("p1", "Mix", ["t00001", "t00000", "t00002"])
+
+    sync_new_tracks(sp, repo)
+    sync_playlists(sp, repo)
+
+    assert _playlist_tracks(repo, "p1") == {"t00001", "t00002"}
+
+    # Saved after the playlist was synced; the playlist is unchanged
+    sp.saved.insert(0, later)
+    sync_new_tracks(sp, repo)
+    result = sync_playlists(sp, repo)
+
+    assert result["playlists_synced"] == 0
+    assert _playlist_tracks(repo, "p1") == {"t00000", "t00001", "t00002"}
+
+
+def test_changed_playlist_is_diffed(repo, fake_spotify):
+    sp = fake_spotify(10)
+    sp.add_playlist("p1", "Mix", ["t00001", "t00002", "t00003"])
+
+    sync_new_tracks(sp, repo)
+    sync_playlists(sp, repo)
+
+    sp.add_playlist("p1", "Mix", ["t00003", "t00004"], snapshot_id="s2")
+    result = sync_playlists(sp, repo)
+
+    assert result["playlists_synced"] == 1
+    assert repo.get_playlist_tracks("p1") == ["t00003", "t00004"]
+
+
+def test_unchanged_playlists_are_not_fetched(repo, fake_spotify):
+    sp = fake_spotify(10)
+    sp.add_playlist("p1", "Mix", ["t00001"])
+
+    sync_new_tracks(sp, repo)
+    sync_playlists(sp, repo)
+
+    sp.calls.clear()
+    sync_playlists(sp, repo)
+
+    assert not [call for call in sp.calls if call[0] == "items"]
+
+
+def test_plan_links_track_saved_later(repo, fake_spotify):
+    sp = fake_spotify(10)
+    later = sp.saved.pop(0)
+    sp.add_playlist("p1", "Mix", ["t00001", "t00000"])
+
+    apply_sync_plan(sp, repo, plan_sync(sp, repo))
+
+    sp.saved.insert(0, later)
+    plan = plan_sync(sp, repo)
+    result = apply_sync_plan(sp, repo, plan)
+
+    assert plan.changed_playlists == []
+    assert result["playlist_tracks_synced"] > 0
+    assert _playlist_tracks(repo, "p1") == {"t00000", "t00001"}
+
+
+def test_plan_is_empty_with_unconvertible_anchor(repo, fake_spotify):
+    sp = fake_spotify(10)
+    sp.add_playlist("a1", "ANCHOR_empty", ["not-in-library"])
+
+    apply_sync_plan(sp, repo, plan_sync(sp, repo))
+
+    assert sp.unfollowed == []
+    assert plan_sync(sp, repo).is_empty()
+
+
+def test_anchor_unfollowed_only_after_commit(repo, fake_spotify, monkeypatch):
+    sp = fake_spotify(10)
+    sp.add_playlist("a1", "ANCHOR_calm", ["t00001", "t00002"])
+    sp.add_playlist("p1", "Mix", ["t00003"])
+
+    plan = plan_sync(sp, repo)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("write failed")
+
+    # Fails after the anchor was converted, inside the same transaction
+    monkeypatch.setattr(repo, "delete_playlist", fail)
+    plan.deleted_playlist_ids = {"gone"}
+
+    with pytest.raises(RuntimeError):
+        apply_sync_plan(sp, repo, plan)
+
+    assert sp.unfollowed == []
+    assert repo.get_anchor_by_name("calm") is None
+
+    del repo.delete_playlist
+    result = apply_sync_plan(sp, repo, plan_sync(sp, repo))
+
+    assert len(result["anchors_updated"]) == 1
+    assert sp.unfollowed == ["a1"]
+
+
+def test_items_are_fetched_without_holding_the_writer(repo, fake_spotify):
+    sp = fake_spotify(10)
+    sp.add_playlist("p1", "Mix", ["t00001"])
+    sp.add_playlist("p2", "More", ["t00002"])
+    sync_new_tracks(sp, repo)
+
+    writer_free = []
+    fetch = sp._get
+
+    def checked_get(*args, **kwargs):
+        lock = repo._session._write_lock
+        free = lock.acquire(blocking=False)
+        if free:
+            lock.release()
+        writer_free.append(free)
+        return fetch(*args, **kwargs)
+
+    sp._get = checked_get
+    sync_playlists(sp, repo)
+
+    assert writer_free and all(writer_free)
@@ -0,0 +1,55 @@
+from core.database import create_tables
+from core.db_session import DatabaseSession
+from core.profiler import QueryProfiler
+from core.repository import Repository
+
+
+def _calls(profiler, fragment):
+    return sum(
+        row["calls"]
+        for row in profiler.top(limit=1000)
+        if fragment in row["statement"]
+    )
+
+
+def test_single_row_lookups_are_recorded(tmp_path):
+    profiler = QueryProfiler()
+    session = DatabaseSession(
+        str(tmp_path / "library.db"),
+        profiler=profiler,
+        read_cache_size=0
+    )
+    create_tables(session.conn)
+
+    session.conn.execute(
+        "INSERT INTO tracks (track_id, name, added_at) VALUES ('t1', 'One', 1);"
+    )
+    session.commit()
+
+    repo = Repository(session)
+    profiler.reset()
+
+    for _ in range(5):
+        repo.count_tracks()
+        repo.track_exists("t1")
+        repo.get_track_name("t1")
+
+    assert _calls(profiler, "SELECT COUNT(*) FROM tracks") == 5
+    assert _calls(profiler, "SELECT 1 FROM tracks WHERE track_id = ?") == 5
+    assert _calls(profiler, "SELECT name FROM tracks WHERE track_id = ?") == 5
+
+
+def test_rows_and_calls_of_fetchall(tmp_path):
+    profiler = QueryProfiler()
+    session = DatabaseSession(str(tmp_path / "library.db"), profiler=profiler)
+    create_tables(session.conn)
+    profiler.reset()
+
+    cursor = session.conn.cursor()
+    cursor.execute("SELECT value FROM json_each('[1, 2, 3]')")
+    cursor.fetchall()
+
+    [row] = [r for r in profiler.top() if "json_each" in r["statement"]]
+
+    assert row["calls"] == 1
+    assert row["rows"] == 3
@@ -0,0 +1,70 @@
+from core.query_cache import QueryCache
+
+
+def _anchor(session, repo, track_ids):
+    session.conn.executemany("""
+        INSERT INTO tracks (track_id, name, added_at)
+        VALUES (?, ?, ?)
+    """, [(track_id, track_id, 1) for track_id in track_ids])
+    session.commit()
+
+    repo.create_anchor("a1", "Calm", "2026-01-01", "2026-01-01")
+    repo.add_tracks_to_anchor("a1", track_ids[:1])
+
+
+def test_repeated_read_is_a_hit(session, repo):
+    _anchor(session, repo, ["t1", "t2"])
+    cache = session.read_cache
+
+    assert repo.get_anchor_tracks("a1") == ["t1"]
+    hits = cache.hits
+
+    assert repo.get_anchor_tracks("a1") == ["t1"]
+    assert cache.hits == hits + 1
+
+
+def test_commit_invalidates_cached_reads(session, repo):
+    _anchor(session, repo, ["t1", "t2"])
+
+    assert repo.get_anchor_tracks("a1") == ["t1"]
+
+    repo.add_tracks_to_anchor("a1", ["t2"])
+
+    assert sorted(repo.get_anchor_tracks("a1")) == ["t1", "t2"]
+
+
+def test_callers_cannot_mutate_the_cached_value(session, repo):
+    _anchor(session, repo, ["t1", "t2"])
+
+    repo.get_anchor_tracks("a1").append("bogus")
+
+    assert repo.get_anchor_tracks("a1") == ["t1"]
+
+
+def test_reads_inside_a_transaction_see_uncommitted_writes(session, repo):
+    _anchor(session, repo, ["t1", "t2"])
+    assert repo.get_anchor_tracks("a1") == ["t1"]
+
+    with repo.transaction():
+        repo.add_tracks_to_anchor("a1", ["t2"])
+        assert sorted(repo.get_anchor_tracks("a1")) == ["t1", "t2"]
+
+
+def test_entries_from_an_older_generation_are_misses():
+    cache = QueryCache(maxsize=2)
+    cache.put("a", 1, "old")
+
+    assert cache.get("a", 1) == (True, "old")
+    assert cache.get("a", 2) == (False, None)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryCache(maxsize=2)
+    cache.put("a", 0, 1)
+    cache.put("b", 0, 2)
+    cache.get("a", 0)
+    cache.put("c", 0, 3)
+
+    assert cache.get("b", 0) == (False, None)
+    assert cache.get("a", 0) == (True, 1)
+    assert cache.get("c", 0) == (True, 3)
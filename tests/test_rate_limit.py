@@ -0,0 +1,44 @@
+import pytest
+
+from core.rate_limit import TokenBucket, call_rate_limited, retry_after_seconds
+
+
+class RateLimited(Exception):
+    http_status = 429
+
+    def __init__(self, headers):
+        super().__init__("rate limited")
+        self.headers = headers
+
+
+def test_rate_limited_call_is_retried_after_its_wait():
+    bucket = TokenBucket(1e9, 1_000_000)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RateLimited({"Retry-After": "0"})
+        return "ok"
+
+    assert call_rate_limited(bucket, fetch) == "ok"
+    assert len(calls) == 3
+
+
+def test_long_retry_after_is_raised_without_waiting():
+    bucket = TokenBucket(1e9, 1_000_000)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        raise RateLimited({"Retry-After": "86400"})
+
+    with pytest.raises(RateLimited):
+        call_rate_limited(bucket, fetch)
+
+    assert len(calls) == 1
+
+
+def test_transport_retried_response_is_not_retried_again():
+    error = RateLimited({"Retry-After": "1", "X-Transport-Retried": "5"})
+    assert retry_after_seconds(error) is None
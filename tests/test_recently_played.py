@@ -0,0 +1,100 @@
+from core.behavior import ingest_recently_played
+from core.database import SCHEMA_VERSION, create_tables, rebuild_recency, to_epoch_ms
+from core.ingestion import sync_new_tracks
+
+
+class RecentlyPlayed:
+    """
+    current_user_recently_played over a fixed list of
+    (track_id, played_at) plays, honouring `after` like the Web API.
+    """
+
+    def __init__(self, plays):
+        self.plays = plays
+        self.afters = []
+
+    def current_user_recently_played(self, limit=50, after=None):
+        self.afters.append(after)
+
+        items = [
+            {"track": {"id": track_id}, "played_at": played_at, "context": None}
+            for track_id, played_at in self.plays
+            if after is None or to_epoch_ms(played_at) > after
+        ]
+        return {"items": items[:limit]}
+
+
+def _library(repo, fake_spotify, n_tracks=5):
+    sync_new_tracks(fake_spotify(n_tracks), repo)
+
+
+def _play_count(session):
+    return session.conn.execute("SELECT COUNT(*) FROM play_history;").fetchone()[0]
+
+
+def test_plays_are_ingested_once(session, repo, fake_spotify):
+    _library(repo, fake_spotify)
+    sp = RecentlyPlayed([
+        ("t00000", "2026-01-01T10:00:00.000Z"),
+        ("t00001", "2026-01-01T10:04:00.000Z"),
+        ("not-saved", "2026-01-01T10:08:00.000Z"),
+    ])
+
+    assert ingest_recently_played(sp, repo) == 2
+    assert ingest_recently_played(sp, repo) == 0
+    assert _play_count(session) == 2
+
+    # The second call only asks for plays after the newest seen
+    assert sp.afters[-1] == to_epoch_ms("2026-01-01T10:08:00.000Z")
+
+
+def test_play_already_stored_is_not_inserted_again(session, repo, fake_spotify):
+    _library(repo, fake_spotify)
+    sp = RecentlyPlayed([("t00000", "2026-01-01T10:00:00.000Z")])
+
+    assert ingest_recently_played(sp, repo) == 1
+
+    # Cursor lost: the same play comes back
+    repo.set_recently_played_after(None)
+    sp.plays.append(("t00001", "2026-01-01T10:04:00.000Z"))
+
+    assert ingest_recently_played(sp, repo) == 1
+    assert _play_count(session) == 2
+
+
+def test_v9_migration_drops_duplicate_plays(session, repo, fake_spotify):
+    _library(repo, fake_spotify)
+    conn = session.conn
+
+    # Back to a version 8 schema with a play ingested twice
+    conn.execute("DROP INDEX idx_play_history_track_played;")
+    conn.execute("CREATE INDEX idx_play_history_track ON play_history(track_key);")
+    conn.execute("ALTER TABLE system_state DROP COLUMN recently_played_after;")
+    conn.executemany("""
+        INSERT INTO play_history (track_key, played_at, source)
+        SELECT track_key, ?, 'spotify_recent' FROM tracks WHERE track_id = ?;
+    """, [(1_000, "t00000"), (1_000, "t00000"), (2_000, "t00001")])
+    rebuild_recency(conn)
+    conn.execute("PRAGMA user_version = 8;")
+    conn.commit()
+
+    create_tables(conn)
+
+    assert conn.execute("PRAGMA user_version;").fetchone()[0] == SCHEMA_VERSION
+    assert _play_count(session) == 2
+
+    indexes = {row[1]: row[2] for row in conn.execute("PRAGMA index_list(play_history);")}
+    assert indexes["idx_play_history_track_played"] == 1
+    assert "idx_play_history_track" not in indexes
+
+    # Recency no longer counts the duplicate
+    plays = conn.execute("""
+        SELECT r.plays
+        FROM track_recency r
+        JOIN tracks t ON t.track_key = r.track_key
+        WHERE t.track_id = 't00000';
+    """).fetchone()[0]
+    assert plays == 1
+
+    repo.set_recently_played_after(5)
+    assert repo.get_recently_played_after() == 5
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from core.ingestion import import_library, reconcile_library
+
+
+def _library(repo, fake_spotify, n_tracks):
+    sp = fake_spotify(n_tracks)
+    import_library(sp, repo)
+    return sp
+
+
+def test_nothing_removed_fetches_no_pages(repo, fake_spotify):
+    sp = _library(repo, fake_spotify, 120)
+
+    result = reconcile_library(sp, repo, remote_total=120)
+
+    assert result["removed_track_ids"] == []
+    assert result["pages_fetched"] == 0
+
+
+@pytest.mark.parametrize("positions", [
+    (0,),
+    (55,),
+    (119,),
+    (49, 50),
+    (55, 60),
+])
+def test_single_and_clustered_removals(repo, fake_spotify, positions):
+    sp = _library(repo, fake_spotify, 120)
+    removed = sp.unsave(*positions)
+
+    result = reconcile_library(sp, repo)
+
+    assert sorted(result["removed_track_ids"]) == sorted(removed)
+    assert repo.count_tracks() == 120 - len(positions)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_scattered_removals(repo, fake_spotify, seed):
+    rnd = random.Random(seed)
+    n_tracks = rnd.randrange(60, 2500)
+    sp = _library(repo, fake_spotify, n_tracks)
+
+    positions = rnd.sample(range(n_tracks), rnd.randrange(1, 12))
+    removed = sp.unsave(*positions)
+
+    result = reconcile_library(sp, repo)
+
+    assert sorted(result["removed_track_ids"]) == sorted(removed)
+
+
+def test_unsynced_remote_track_falls_back_to_full_diff(repo, fake_spotify):
+    sp = _library(repo, fake_spotify, 300)
+    removed = sp.unsave(10, 11, 250)
+
+    # Saved remotely after the last sync, so unknown locally
+    newer = fake_spotify(1).saved[0]
+    newer["track"]["id"] = "new"
+    sp.saved.insert(120, newer)
+
+    result = reconcile_library(sp, repo)
+
+    assert sorted(result["removed_track_ids"]) == sorted(removed)
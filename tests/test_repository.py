@@ -0,0 +1,44 @@
+from core.database import create_tables
+from core.db_session import DatabaseSession
+from core.repository import Repository
+
+
+def _repo(tmp_path):
+    session = DatabaseSession(str(tmp_path / "library.db"))
+    create_tables(session.conn)
+
+    session.conn.executemany("""
+        INSERT INTO tracks (track_id, name, added_at)
+        VALUES (?, ?, ?)
+    """, [("t1", "One", 1), ("t2", "Two", 2)])
+    session.commit()
+
+    return Repository(session)
+
+
+def test_library_track_ids_from_cached_snapshot(tmp_path):
+    repo = _repo(tmp_path)
+    repo.refresh_snapshot()
+
+    assert repo.snapshot is not None
+    assert repo._session.read_cache is not None
+
+    # Second call is served from the read cache
+    assert repo.get_library_track_ids() == {"t1", "t2"}
+    assert repo.get_library_track_ids() == {"t1", "t2"}
+
+
+def test_library_track_ids_without_snapshot(tmp_path):
+    repo = _repo(tmp_path)
+
+    assert repo.snapshot is None
+    assert repo.get_library_track_ids() == {"t1", "t2"}
+
+
+def test_adding_tracks_already_on_an_anchor_skips_them(tmp_path):
+    repo = _repo(tmp_path)
+    repo.create_anchor("a1", "Calm", "2026-01-01", "2026-01-01")
+
+    assert repo.add_tracks_to_anchor("a1", ["t1"]) == 1
+    assert repo.add_tracks_to_anchor("a1", ["t1", "t2", "t2", "unknown"]) == 1
+    assert sorted(repo.get_anchor_tracks("a1")) == ["t1", "t2"]
@@ -0,0 +1,70 @@
+import core.repository
+from core.snapshot import build_snapshot
+
+
+def _add_track(repo, track_id):
+    with repo.transaction() as conn:
+        conn.execute(
+            "INSERT INTO tracks (track_id, name, added_at) VALUES (?, ?, 1);",
+            (track_id, track_id)
+        )
+        repo.invalidate_snapshot()
+
+
+def test_commit_during_build_is_not_overwritten(repo, monkeypatch):
+    _add_track(repo, "t1")
+    builds = []
+
+    def build_racing_a_write(conn):
+        snapshot = build_snapshot(conn)
+
+        # A write commits after the build read the tables
+        if not builds:
+            _add_track(repo, "t2")
+
+        builds.append(snapshot)
+        return snapshot
+
+    monkeypatch.setattr(core.repository, "build_snapshot", build_racing_a_write)
+
+    snapshot = repo.refresh_snapshot()
+
+    assert len(builds) == 2
+    assert snapshot.track_exists("t2")
+    assert repo.snapshot is snapshot
+
+
+def test_snapshot_left_unset_when_writes_keep_landing(repo, monkeypatch):
+    _add_track(repo, "t1")
+    written = []
+
+    def build_racing_writes(conn):
+        snapshot = build_snapshot(conn)
+        written.append(f"w{len(written)}")
+        _add_track(repo, written[-1])
+        return snapshot
+
+    monkeypatch.setattr(core.repository, "build_snapshot", build_racing_writes)
+
+    assert repo.refresh_snapshot() is None
+    assert repo.snapshot is None
+    assert repo.track_exists(written[-1])
+
+
+def test_build_reads_one_consistent_state(repo, monkeypatch):
+    _add_track(repo, "t1")
+    seen = []
+
+    def build_with_write_between_reads(conn):
+        before = conn.execute("SELECT COUNT(*) FROM tracks;").fetchone()[0]
+        if not seen:
+            _add_track(repo, "t2")
+        after = conn.execute("SELECT COUNT(*) FROM tracks;").fetchone()[0]
+        seen.append((before, after))
+        return build_snapshot(conn)
+
+    monkeypatch.setattr(core.repository, "build_snapshot", build_with_write_between_reads)
+
+    repo.refresh_snapshot()
+
+    assert seen[0] == (1, 1)
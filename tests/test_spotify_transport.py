@@ -0,0 +1,138 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.http_cache import SpotifyResponseCache
+from core.spotify_transport import SpotifySession
+
+
+class FakeApi:
+    """
+    Local HTTP server answering with respond(path, headers) ->
+    (status, headers, body) and recording every request.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.respond = lambda path, headers: (200, {}, {})
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                api.requests.append((self.path, dict(self.headers)))
+                status, headers, body = api.respond(self.path, self.headers)
+                payload = b"" if status == 304 else json.dumps(body).encode()
+
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        self.base = f"http://127.0.0.1:{self._server.server_port}/v1/"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def api():
+    api = FakeApi()
+    yield api
+    api.close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SpotifyResponseCache(str(tmp_path / "http_cache.db"))
+    yield cache
+    cache.close()
+
+
+def _get(session, url, token="token-a"):
+    return session.get(url, headers={"Authorization": f"Bearer {token}"})
+
+
+def test_fresh_read_is_served_from_cache(api, cache):
+    api.respond = lambda path, headers: (200, {}, {"id": "me"})
+    session = SpotifySession(bucket=None, response_cache=cache)
+
+    assert _get(session, api.base + "me").json() == {"id": "me"}
+    assert _get(session, api.base + "me").json() == {"id": "me"}
+    assert len(api.requests) == 1
+
+
+def test_cached_read_is_not_served_to_another_token(api, cache):
+    api.respond = lambda path, headers: (
+        200, {}, {"id": headers["Authorization"].split()[-1]}
+    )
+    session = SpotifySession(bucket=None, response_cache=cache)
+
+    assert _get(session, api.base + "me", "token-a").json() == {"id": "token-a"}
+    assert _get(session, api.base + "me", "token-b").json() == {"id": "token-b"}
+    assert _get(session, api.base + "me", "token-a").json() == {"id": "token-a"}
+    assert len(api.requests) == 2
+
+
+def test_stale_read_is_revalidated_with_its_etag(api, cache):
+    def respond(path, headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"'}, None
+        return 200, {"ETag": '"v1"'}, {"items": ["a"]}
+
+    api.respond = respond
+    session = SpotifySession(bucket=None, response_cache=cache)
+    url = api.base + "playlists/p1/items"
+
+    assert _get(session, url).json() == {"items": ["a"]}
+    assert _get(session, url).json() == {"items": ["a"]}
+
+    assert len(api.requests) == 2
+    assert "If-None-Match" not in api.requests[0][1]
+    assert api.requests[1][1]["If-None-Match"] == '"v1"'
+
+
+def test_failed_reads_are_retried(api):
+    statuses = iter([503, 429, 200])
+    api.respond = lambda path, headers: (next(statuses), {"Retry-After": "0"}, {})
+    session = SpotifySession(bucket=None, backoff_base=0.01)
+
+    response = _get(session, api.base + "me")
+
+    assert response.status_code == 200
+    assert len(api.requests) == 3
+
+
+def test_exhausted_retries_return_the_last_response_marked(api):
+    api.respond = lambda path, headers: (503, {}, {})
+    session = SpotifySession(bucket=None, max_retries=2, backoff_base=0.01)
+
+    response = _get(session, api.base + "me")
+
+    assert response.status_code == 503
+    assert response.headers["X-Transport-Retried"] == "2"
+    assert len(api.requests) == 3
+
+
+def test_long_retry_after_is_returned_instead_of_slept(api):
+    api.respond = lambda path, headers: (429, {"Retry-After": "3600"}, {})
+    session = SpotifySession(bucket=None, max_retry_after=1)
+
+    response = _get(session, api.base + "me")
+
+    assert response.status_code == 429
+    assert response.headers["X-Transport-Retried"] == "0"
+    assert len(api.requests) == 1
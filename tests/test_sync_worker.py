@@ -0,0 +1,62 @@
+from session.manager import SessionManager
+from session.sync_worker import SyncWorker
+
+
+def _manager(repo):
+    return SessionManager(
+        graph=None,
+        llm=None,
+        repo=repo,
+        sp=None,
+        semantic_service=None
+    )
+
+
+def test_managers_on_one_database_share_one_worker(repo):
+    first = _manager(repo)
+    second = _manager(repo)
+
+    try:
+        assert first.sync_worker is second.sync_worker
+        thread = first.sync_worker._thread
+
+        first.close()
+        first.close()
+        assert thread.is_alive()
+    finally:
+        second.close()
+
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_worker_is_started_again_after_last_close(repo):
+    first = _manager(repo)
+    first.close()
+
+    second = _manager(repo)
+    try:
+        assert second.sync_worker is not first.sync_worker
+        assert second.sync_worker._thread.is_alive()
+    finally:
+        second.close()
+
+
+def test_failed_sync_is_reported_in_status():
+    def run_sync(report):
+        report("planning")
+        raise RuntimeError("offline")
+
+    worker = SyncWorker(run_sync, interval_seconds=3600)
+    worker.start()
+
+    try:
+        worker.trigger()
+        assert worker.wait_idle(5)
+
+        status = worker.status()
+        assert status.runs == 1
+        assert status.phase == "idle"
+        assert status.last_error == "RuntimeError: offline"
+    finally:
+        worker.stop(5)
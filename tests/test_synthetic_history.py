@@ -0,0 +1,74 @@
+import numpy as np
+
+from core.database import MS_PER_DAY
+from core.ingestion import sync_new_tracks
+from core.synthetic_history import generate_play_history, load_synthetic_history
+
+
+END_MS = 1_780_000_000_000
+
+
+def _history(plays=20_000, seed=7, **kwargs):
+    keys = list(range(1, 301))
+    chunks = list(generate_play_history(
+        keys,
+        [180_000] * len(keys),
+        plays,
+        years=1.0,
+        seed=seed,
+        end_ms=END_MS,
+        **kwargs
+    ))
+    return (
+        np.concatenate([k for k, _ in chunks]),
+        np.concatenate([p for _, p in chunks]),
+        chunks,
+    )
+
+
+def test_same_seed_and_end_give_the_same_history():
+    keys_a, played_a, _ = _history()
+    keys_b, played_b, _ = _history()
+    keys_c, _, _ = _history(seed=8)
+
+    assert np.array_equal(keys_a, keys_b)
+    assert np.array_equal(played_a, played_b)
+    assert not np.array_equal(keys_a, keys_c)
+
+
+def test_history_has_the_requested_plays_inside_the_span():
+    keys, played_at, chunks = _history(chunk_plays=3_000)
+
+    assert len(keys) == 20_000
+    assert len(chunks) > 1
+    assert set(keys.tolist()) <= set(range(1, 301))
+    assert played_at.max() <= END_MS
+    assert played_at.min() >= END_MS - 366 * MS_PER_DAY
+
+
+def test_plays_follow_the_daily_cycle_and_popularity():
+    keys, played_at, _ = _history(plays=50_000)
+
+    hours = np.bincount((played_at // 3_600_000) % 24, minlength=24)
+    assert hours[19] > 5 * hours[3]
+
+    # Zipfian: a few tracks take a large share of plays
+    counts = np.sort(np.bincount(keys))[::-1]
+    assert counts[:30].sum() > 0.3 * len(keys)
+
+
+def test_loaded_history_is_tagged_and_counted(session, repo, fake_spotify):
+    sync_new_tracks(fake_spotify(40), repo)
+
+    inserted = load_synthetic_history(repo, plays=2_000, seed=1, end_ms=END_MS)
+
+    rows = session.conn.execute("""
+        SELECT source, COUNT(*) FROM play_history GROUP BY source;
+    """).fetchall()
+    assert rows == [("synthetic", inserted)]
+    assert inserted > 1_900
+
+    recency_plays = session.conn.execute(
+        "SELECT SUM(plays) FROM track_recency;"
+    ).fetchone()[0]
+    assert recency_plays == inserted